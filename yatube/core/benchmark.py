@@ -0,0 +1,85 @@
+"""Замеры view через тестовый клиент и сравнение с базовой линией.
+
+Результат замера одного view - словарь с перцентилями задержки (мс),
+числом SQL-запросов и размером ответа. Базовые линии хранятся в JSON:
+{набор данных: {view: результат}}.
+"""
+import json
+import math
+import time
+from typing import Dict, List
+
+from .querybudget import QueryRecorder
+
+PERCENTILES = (50, 95, 99)
+LATENCY_METRIC = 'p95_ms'
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def measure(request, requests: int = 50, warmup: int = 5) -> Dict[str, float]:
+    """Вызывает request() warmup + requests раз и сводит замеры.
+
+    request - функция без аргументов, возвращающая ответ тестового
+    клиента, например lambda: client.get(url).
+    """
+    for _ in range(warmup):
+        request()
+    timings, queries, sizes = [], [], []
+    for _ in range(requests):
+        with QueryRecorder() as recorder:
+            start = time.perf_counter()
+            response = request()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(recorder.queries))
+        sizes.append(len(response.content))
+    result = {
+        f'p{q}_ms': round(percentile(timings, q), 3) for q in PERCENTILES
+    }
+    result['queries'] = max(queries)
+    result['bytes'] = max(sizes)
+    result['status'] = response.status_code
+    return result
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Регрессии относительно baseline: задержка выросла больше чем на
+    tolerance или запросов стало больше.
+    """
+    regressions = []
+    for dataset, views in results.items():
+        for view, result in views.items():
+            base = baseline.get(dataset, {}).get(view)
+            if base is None:
+                continue
+            limit = base[LATENCY_METRIC] * (1 + tolerance)
+            if result[LATENCY_METRIC] > limit:
+                regressions.append(
+                    f'{dataset}/{view}: {LATENCY_METRIC} '
+                    f'{result[LATENCY_METRIC]:.1f} > {limit:.1f}'
+                )
+            if result['queries'] > base['queries']:
+                regressions.append(
+                    f'{dataset}/{view}: запросов '
+                    f'{result["queries"]} > {base["queries"]}'
+                )
+    return regressions
+
+
+def load(path: str) -> Dict:
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save(path: str, results: Dict) -> None:
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2, sort_keys=True)
+        file.write('\n')
@@ -0,0 +1,252 @@
+"""Общий для всех процессов кэш в файле SQLite.
+
+LocMemCache у каждого воркера свой: фрагменты считаются N раз, а
+инвалидация не доходит до соседних процессов. SQLiteCache хранит записи
+в одном файле в режиме WAL, поэтому читатели не блокируют писателя и
+кэш не требует отдельного сервиса.
+
+Вытеснение: просроченные записи не читаются и удаляются при чистке,
+при превышении MAX_ENTRIES удаляются давно не читанные (приближенный
+LRU: время доступа обновляется не чаще раза в ACCESS_RESOLUTION секунд,
+чтобы чтение почти никогда не требовало записи).
+
+Целые числа хранятся как INTEGER, поэтому incr/decr атомарны на уровне
+SQL и работают между процессами (UPDATE ... RETURNING, SQLite 3.35+;
+add - через UPSERT, SQLite 3.24+). На более старой SQLite бэкенд не
+создается.
+
+LOCATION - путь к файлу или URI SQLite, например
+'file:name?mode=memory&cache=shared' для общего кэша в памяти процесса.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+ACCESS_RESOLUTION = 10.0
+CULL_EVERY = 100
+BUSY_TIMEOUT_MS = 5000
+# RETURNING в incr
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_expires_idx ON cache (expires)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed_idx ON cache (accessed)',
+)
+NOT_EXPIRED = '(expires IS NULL OR expires > ?)'
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise ImproperlyConfigured(
+                'SQLiteCache требует SQLite {}+, установлена {}'.format(
+                    '.'.join(map(str, MIN_SQLITE_VERSION)),
+                    sqlite3.sqlite_version
+                )
+            )
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Соединение на поток; после fork открывается заново."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        is_uri = self._path.startswith('file:')
+        directory = os.path.dirname(self._path)
+        if directory and not is_uri:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            uri=is_uri
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def _dump(value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(value):
+        return value if isinstance(value, int) else pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        """Абсолютное время истечения, None - без срока."""
+        return self.get_backend_timeout(timeout)
+
+    def _mark_accessed(self, accessed_at):
+        """Обновляет время доступа записей, читанных давно."""
+        now = time.time()
+        stale = [
+            (now, key) for key, accessed in accessed_at.items()
+            if accessed < now - ACCESS_RESOLUTION
+        ]
+        if stale:
+            self._connection().executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', stale
+            )
+
+    def _write(self, sql, params):
+        cursor = self._connection().execute(sql, params)
+        self._writes += 1
+        if self._writes % CULL_EVERY == 0:
+            self._cull()
+        return cursor
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self._write(
+            'INSERT INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (key, self._dump(value), self._expires(timeout), now, now)
+        )
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._connection().execute(
+            f'SELECT value, accessed FROM cache WHERE key = ? '
+            f'AND {NOT_EXPIRED}',
+            (key, now)
+        ).fetchone()
+        if row is None:
+            return default
+        self._mark_accessed({key: row[1]})
+        return self._load(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._connection().execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({placeholders}) AND {NOT_EXPIRED}',
+            (*keys, time.time())
+        ).fetchall()
+        self._mark_accessed({key: accessed for key, _, accessed in rows})
+        return {keys[key]: self._load(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._write(
+            'REPLACE INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)',
+            (key, self._dump(value), self._expires(timeout), time.time())
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires, now = self._expires(timeout), time.time()
+        rows = [
+            (self._key(key, version), self._dump(value), expires, now)
+            for key, value in data.items()
+        ]
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(
+                'REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                rows
+            )
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        cursor = self._write(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {NOT_EXPIRED}',
+            (self._expires(timeout), key, time.time())
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарное увеличение; ValueError, если ключа нет или не int."""
+        key = self._key(key, version)
+        rows = self._connection().execute(
+            f'UPDATE cache SET value = value + ? WHERE key = ? '
+            f"AND typeof(value) = 'integer' AND {NOT_EXPIRED} "
+            f'RETURNING value',
+            (delta, key, time.time())
+        ).fetchall()
+        if not rows:
+            raise ValueError("Key '%s' not found" % key)
+        return rows[0][0]
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_many(self, keys, version=None):
+        self._connection().executemany(
+            'DELETE FROM cache WHERE key = ?',
+            [(self._key(key, version),) for key in keys]
+        )
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection().execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {NOT_EXPIRED}',
+            (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def _cull(self):
+        """Удаляет просроченные записи, затем самые давно читанные."""
+        connection = self._connection()
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (time.time(),)
+        )
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            self.clear()
+            return
+        excess = count - self._max_entries
+        excess += self._max_entries // self._cull_frequency
+        connection.execute(
+            'DELETE FROM cache WHERE key IN '
+            '(SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (excess,)
+        )
+
+    def close(self, **kwargs):
+        """Соединения живут весь процесс: открывать их дорого."""
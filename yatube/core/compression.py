@@ -0,0 +1,73 @@
+"""Сжатие ответов gzip и brotli.
+
+Статика сжимается при сборке с максимальным уровнем, HTML - на каждый
+ответ, поэтому для него уровни ниже: почти тот же размер на
+повторяющейся разметке лент при заметно меньшем времени CPU.
+"""
+import gzip
+import zlib
+from typing import Optional
+
+import brotli
+
+# Порядок предпочтения, если клиент принимает обе кодировки
+ENCODINGS = ('br', 'gzip')
+STATIC_LEVELS = {'br': 11, 'gzip': 9}
+DYNAMIC_LEVELS = {'br': 5, 'gzip': 6}
+
+
+def accepted_encodings(header: str) -> frozenset:
+    """Кодировки из Accept-Encoding, кроме явно запрещенных q=0."""
+    accepted = set()
+    for part in header.split(','):
+        encoding, _, params = part.strip().partition(';')
+        params = params.replace(' ', '')
+        if params in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(encoding.strip().lower())
+    return frozenset(accepted)
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    accepted = accepted_encodings(header)
+    for encoding in ENCODINGS:
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def compress(encoding: str, data: bytes, levels=DYNAMIC_LEVELS) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=levels['br'])
+    return gzip.compress(data, compresslevel=levels['gzip'], mtime=0)
+
+
+class GzipStream:
+    def __init__(self, level: int = DYNAMIC_LEVELS['gzip']):
+        # wbits=31 - заголовок и контрольная сумма gzip, а не zlib
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        """Сжатые байты куска; Z_SYNC_FLUSH отдает их клиенту сразу."""
+        return (
+            self.compressor.compress(data)
+            + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        )
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+
+class BrotliStream:
+    def __init__(self, quality: int = DYNAMIC_LEVELS['br']):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+def stream_compressor(encoding: str):
+    return BrotliStream() if encoding == 'br' else GzipStream()
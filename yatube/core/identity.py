@@ -0,0 +1,191 @@
+"""Карта идентичности на время запроса.
+
+Views, миксины и шаблонные теги берут объекты через карту запроса,
+поэтому каждый User, Group и Post загружается за запрос не больше
+одного раза и существует в одном экземпляре. Связанные объекты многих
+записей догружаются одним IN-запросом на поле через load_related.
+
+Экземпляр из карты отдается только тому, кому хватает загруженного в
+нем: полей (only/defer) и связей select_related. Иначе объект читается
+заново, а в карте остается экземпляр с более полным набором.
+"""
+from typing import Dict, Iterable
+
+from django.db.models.constants import LOOKUP_SEP
+from django.shortcuts import get_object_or_404
+
+ATTRIBUTE = '_identity_map'
+PK_LOOKUPS = ('pk', 'id')
+
+
+def _model(obj_or_model):
+    return obj_or_model._meta.concrete_model
+
+
+def _covers(obj, other, seen=None) -> bool:
+    """В obj загружено все, что в other: поля и связи из кэша."""
+    seen = set() if seen is None else seen
+    if obj is other or (id(obj), id(other)) in seen:
+        return True
+    seen.add((id(obj), id(other)))
+    if not obj.get_deferred_fields() <= other.get_deferred_fields():
+        return False
+    cache = obj._state.fields_cache
+    for name, value in other._state.fields_cache.items():
+        if name not in cache:
+            return False
+        if value is None:
+            continue
+        if cache[name] is None or not _covers(cache[name], value, seen):
+            return False
+    return True
+
+
+def _has_related(obj, related: dict) -> bool:
+    cache = obj._state.fields_cache
+    for name, nested in related.items():
+        if name not in cache:
+            return False
+        value = cache[name]
+        if value is not None and not _has_related(value, nested):
+            return False
+    return True
+
+
+def _satisfies(obj, queryset) -> bool:
+    """В obj загружено все, что загрузил бы queryset."""
+    query = queryset.query
+    if query.select_related is True:
+        return False
+    names, defer = query.deferred_loading
+    if any(LOOKUP_SEP in name for name in names):
+        return False
+    deferred = obj.get_deferred_fields()
+    if deferred:
+        opts = obj._meta
+        attnames = {opts.get_field(name).attname for name in names}
+        if defer:
+            needed = {field.attname for field in opts.concrete_fields}
+            needed -= attnames
+        else:
+            needed = attnames | {opts.pk.attname}
+        if deferred & needed:
+            return False
+    return _has_related(obj, query.select_related or {})
+
+
+class IdentityMap:
+    def __init__(self):
+        self._objects = {}
+        self._keys = {}
+        self._absent = set()
+
+    @classmethod
+    def for_request(cls, request) -> 'IdentityMap':
+        identity_map = getattr(request, ATTRIBUTE, None)
+        if identity_map is None:
+            identity_map = cls()
+            setattr(request, ATTRIBUTE, identity_map)
+        return identity_map
+
+    def __len__(self):
+        return len(self._objects)
+
+    def add(self, obj):
+        """Регистрирует объект; возвращает экземпляр для использования.
+
+        Прежний экземпляр возвращается, если в нем загружено все, что
+        в obj. Иначе в карту попадает obj, если он полнее прежнего, а
+        экземпляры с несравнимыми наборами полей не смешиваются.
+        """
+        key = (_model(obj), obj.pk)
+        current = self._objects.get(key)
+        if current is not None and _covers(current, obj):
+            return current
+        if current is None or _covers(obj, current):
+            self._objects[key] = obj
+        return obj
+
+    def cached(self, model, pk):
+        return self._objects.get((_model(model), pk))
+
+    def get(self, queryset, **lookup):
+        """Объект по одному уникальному полю, при промахе - 404."""
+        (field, value), = lookup.items()
+        model = _model(queryset.model)
+        if field in PK_LOOKUPS:
+            obj = self.cached(model, queryset.model._meta.pk.to_python(value))
+        else:
+            obj = self.cached(model, self._keys.get((model, field, value)))
+        if obj is not None and _satisfies(obj, queryset):
+            return obj
+        obj = self.add(get_object_or_404(queryset, **lookup))
+        if field not in PK_LOOKUPS:
+            self._keys[(model, field, value)] = obj.pk
+        return obj
+
+    def load_many(self, queryset, pks: Iterable) -> Dict:
+        """{pk: объект} для pks; недостающие в карте - одним запросом.
+
+        pk, которых нет в queryset, в результат не попадают; отсутствующие
+        в таблице повторно не запрашиваются.
+        """
+        model = _model(queryset.model)
+        pks = list(dict.fromkeys(pks))
+        loaded = {}
+        for pk in pks:
+            obj = self.cached(model, pk)
+            if obj is not None and _satisfies(obj, queryset):
+                loaded[pk] = obj
+        missing = [
+            pk for pk in pks
+            if pk not in loaded and (model, pk) not in self._absent
+        ]
+        if missing:
+            for obj in queryset.filter(pk__in=missing):
+                loaded[obj.pk] = self.add(obj)
+            if not queryset.query.where:
+                self._absent.update(
+                    (model, pk) for pk in missing if pk not in loaded
+                )
+        return {pk: loaded[pk] for pk in pks if pk in loaded}
+
+    def load_related(self, objects: Iterable, *fields: str) -> None:
+        """Подставляет связанные объекты fields: один IN-запрос на поле.
+
+        Объекты из карты не запрашиваются, уже загруженные связи
+        (select_related) заменяются экземплярами карты.
+        """
+        objects = list(objects)
+        if not objects:
+            return
+        self.share(objects, *fields)
+        for name in fields:
+            field = objects[0]._meta.get_field(name)
+            pending = [obj for obj in objects if not field.is_cached(obj)]
+            loaded = self.load_many(
+                field.related_model._default_manager.all(),
+                (
+                    getattr(obj, field.attname) for obj in pending
+                    if getattr(obj, field.attname) is not None
+                )
+            )
+            for obj in pending:
+                field.set_cached_value(
+                    obj, loaded.get(getattr(obj, field.attname))
+                )
+
+    def share(self, objects: Iterable, *fields: str) -> None:
+        """Заменяет уже загруженные связанные объекты экземплярами карты.
+
+        Новых запросов не делает: поля, не загруженные select_related,
+        пропускаются.
+        """
+        for obj in objects:
+            for name in fields:
+                field = obj._meta.get_field(name)
+                if not field.is_cached(obj):
+                    continue
+                related = field.get_cached_value(obj)
+                if related is not None:
+                    field.set_cached_value(obj, self.add(related))
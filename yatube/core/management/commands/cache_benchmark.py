@@ -0,0 +1,103 @@
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.core.management.commands.createcachetable import (
+    Command as CreateCacheTable
+)
+from django.db import DEFAULT_DB_ALIAS, connections, reset_queries
+
+from core.cache import SQLiteCache
+
+DB_TABLE = 'cache_benchmark'
+
+
+def _directory_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path) for name in names
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает задержку попаданий и память кэшей: LocMem, файлового, '
+        'в базе данных и core.cache.SQLiteCache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=2000)
+        parser.add_argument('--reads', type=int, default=20000)
+        parser.add_argument(
+            '--value-size',
+            type=int,
+            default=4096,
+            help='Размер значения в байтах (примерно как фрагмент HTML).'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix='cache-benchmark-')
+        params = {'OPTIONS': {'MAX_ENTRIES': options['entries'] * 2}}
+        sqlite_path = os.path.join(directory, 'cache.sqlite3')
+        file_path = os.path.join(directory, 'files')
+        backends = (
+            ('locmem', lambda: LocMemCache('benchmark', params), None),
+            ('filebased', lambda: FileBasedCache(file_path, params),
+             file_path),
+            ('db', lambda: DatabaseCache(DB_TABLE, params), None),
+            ('sqlite', lambda: SQLiteCache(sqlite_path, params),
+             sqlite_path),
+        )
+        create_table = CreateCacheTable()
+        create_table.verbosity = 0
+        create_table.create_table(DEFAULT_DB_ALIAS, DB_TABLE, False)
+        self.stdout.write(
+            f'{"backend":<10} {"p50 мкс":>9} {"p99 мкс":>9} '
+            f'{"get/с":>9} {"heap КБ":>9} {"disk КБ":>9}'
+        )
+        try:
+            for name, factory, path in backends:
+                self.report(name, factory, path, options)
+        finally:
+            with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+                cursor.execute(f'DROP TABLE {DB_TABLE}')
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def report(self, name, factory, path, options):
+        rng = random.Random(options['seed'])
+        value = 'x' * options['value_size']
+        keys = [f'fragment:{number}' for number in range(options['entries'])]
+
+        tracemalloc.start()
+        cache = factory()
+        for key in keys:
+            cache.set(key, value, None)
+        reset_queries()
+        heap, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings = []
+        for key in rng.choices(keys, k=options['reads']):
+            start = time.perf_counter_ns()
+            cache.get(key)
+            timings.append(time.perf_counter_ns() - start)
+        timings.sort()
+        p50 = statistics.median(timings) / 1000
+        p99 = timings[int(len(timings) * 0.99) - 1] / 1000
+        per_second = len(timings) / (sum(timings) / 1e9)
+        disk = _directory_size(path) if path else 0
+        self.stdout.write(
+            f'{name:<10} {p50:>9.1f} {p99:>9.1f} {per_second:>9.0f} '
+            f'{heap // 1024:>9} {disk // 1024:>9}'
+        )
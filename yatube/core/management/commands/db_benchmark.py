@@ -0,0 +1,194 @@
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.benchmark import percentile
+from core.sqlite import PRAGMAS, pragma_statements
+
+CONNECT_TIMEOUT = 5.0
+SCHEMA = (
+    'CREATE TABLE post ('
+    ' id INTEGER PRIMARY KEY,'
+    ' text TEXT NOT NULL,'
+    ' comments_count INTEGER NOT NULL DEFAULT 0'
+    ')',
+    'CREATE TABLE comment ('
+    ' id INTEGER PRIMARY KEY,'
+    ' post_id INTEGER NOT NULL REFERENCES post (id),'
+    ' text TEXT NOT NULL,'
+    ' created REAL NOT NULL'
+    ')',
+    'CREATE INDEX comment_post_idx ON comment (post_id, id)',
+)
+READ_SQL = (
+    'SELECT id, text, created FROM comment WHERE post_id = ? '
+    'ORDER BY id DESC LIMIT 20'
+)
+# Профили: PRAGMA соединения и живет ли соединение дольше запроса
+PROFILES = {
+    'default': ({}, False),
+    'tuned': (PRAGMAS, True),
+}
+
+
+class Worker(threading.Thread):
+    """Поток-"воркер": запросы одного вида до истечения deadline."""
+
+    def __init__(self, path, pragmas, persistent, deadline, operation,
+                 posts, seed):
+        super().__init__(daemon=True)
+        self.path = path
+        self.pragmas = pragmas
+        self.persistent = persistent
+        self.deadline = deadline
+        self.operation = operation
+        self.posts = posts
+        self.rng = random.Random(seed)
+        self.timings = []
+        self.errors = 0
+
+    def connect(self):
+        connection = sqlite3.connect(
+            self.path, timeout=CONNECT_TIMEOUT, isolation_level=None,
+            check_same_thread=False
+        )
+        for statement in pragma_statements(self.pragmas):
+            connection.execute(statement)
+        return connection
+
+    def read(self, connection, post_id):
+        connection.execute(
+            'SELECT comments_count FROM post WHERE id = ?', (post_id,)
+        ).fetchone()
+        connection.execute(READ_SQL, (post_id,)).fetchall()
+
+    def write(self, connection, post_id):
+        # Как AddComment: комментарий и счетчик - два автокоммита
+        connection.execute(
+            'INSERT INTO comment (post_id, text, created) VALUES (?, ?, ?)',
+            (post_id, 'Комментарий ' * 20, time.time())
+        )
+        connection.execute(
+            'UPDATE post SET comments_count = comments_count + 1 '
+            'WHERE id = ?', (post_id,)
+        )
+
+    def run(self):
+        operation = getattr(self, self.operation)
+        connection = self.connect() if self.persistent else None
+        while time.perf_counter() < self.deadline:
+            post_id = self.rng.randint(1, self.posts)
+            start = time.perf_counter()
+            try:
+                # Без постоянных соединений - новое на каждый "запрос"
+                current = connection or self.connect()
+                try:
+                    operation(current, post_id)
+                finally:
+                    if current is not connection:
+                        current.close()
+            except sqlite3.OperationalError:
+                self.errors += 1
+                continue
+            self.timings.append(time.perf_counter() - start)
+        if connection is not None:
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Параллельные чтения и записи комментариев в SQLite: настройки '
+        'по умолчанию против PRAGMA из core.sqlite с постоянными '
+        'соединениями. Печатает пропускную способность, p95 и ошибки '
+        '"database is locked".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--duration', type=float, default=5.0,
+            help='Секунд на профиль.'
+        )
+        parser.add_argument('--posts', type=int, default=200)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument(
+            '--profile', choices=list(PROFILES), action='append',
+            help='По умолчанию - все профили.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"profile":<8} {"read/с":>9} {"write/с":>9} '
+            f'{"read p95 мс":>12} {"write p95 мс":>13} {"ошибок":>7}'
+        )
+        for name in options['profile'] or PROFILES:
+            directory = tempfile.mkdtemp(prefix='db-benchmark-')
+            try:
+                self.report(name, os.path.join(directory, 'db.sqlite3'),
+                            options)
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def seed(self, path, pragmas, options):
+        rng = random.Random(options['seed'])
+        connection = sqlite3.connect(path, isolation_level=None)
+        for statement in pragma_statements(pragmas):
+            connection.execute(statement)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.execute('BEGIN')
+        connection.executemany(
+            'INSERT INTO post (id, text) VALUES (?, ?)',
+            ((i, 'Пост ' * 50) for i in range(1, options['posts'] + 1))
+        )
+        connection.executemany(
+            'INSERT INTO comment (post_id, text, created) VALUES (?, ?, ?)',
+            ((rng.randint(1, options['posts']), 'Комментарий ' * 20, i)
+             for i in range(options['comments']))
+        )
+        connection.execute('COMMIT')
+        connection.close()
+
+    def report(self, name, path, options):
+        pragmas, persistent = PROFILES[name]
+        self.seed(path, pragmas, options)
+        deadline = time.perf_counter() + options['duration']
+        workers = [
+            Worker(path, pragmas, persistent, deadline, operation,
+                   options['posts'], options['seed'] + number)
+            for number, operation in enumerate(
+                ['read'] * options['readers'] + ['write'] * options['writers']
+            )
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        results = {}
+        for operation in ('read', 'write'):
+            timings = [
+                timing for worker in workers
+                if worker.operation == operation
+                for timing in worker.timings
+            ]
+            results[operation] = (
+                len(timings) / elapsed,
+                percentile(timings, 95) * 1000 if timings else 0.0
+            )
+        errors = sum(worker.errors for worker in workers)
+        self.stdout.write(
+            f'{name:<8} {results["read"][0]:>9.0f} '
+            f'{results["write"][0]:>9.0f} {results["read"][1]:>12.2f} '
+            f'{results["write"][1]:>13.2f} {errors:>7}'
+        )
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from core.routers import copy_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную SQLite-базу в реплики (по умолчанию - во все '
+        'остальные базы из DATABASES). Для локальной проверки чтения с '
+        'реплики: копия отстает от основной базы до следующего запуска.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or [
+            alias for alias in settings.DATABASES
+            if alias != DEFAULT_DB_ALIAS
+        ]
+        for alias in aliases:
+            database = settings.DATABASES.get(alias)
+            if alias == DEFAULT_DB_ALIAS or database is None:
+                raise CommandError(f'Неизвестная реплика {alias}')
+            if not database['ENGINE'].endswith('sqlite3'):
+                raise CommandError(
+                    f'{alias}: копируются только базы SQLite'
+                )
+            copy_database(alias)
+            self.stdout.write(f'{alias}: {database["NAME"]}')
@@ -0,0 +1,173 @@
+"""Отдача загруженных файлов из MEDIA_ROOT.
+
+Миниатюры (MEDIA_IMMUTABLE_PREFIXES) никогда не меняются по одному
+имени: имя sorl-thumbnail - хеш исходника и параметров, поэтому они
+кэшируются на год с immutable. Остальным файлам - MEDIA_MAX_AGE.
+
+Если фронтовой сервер умеет отдавать файлы сам (MEDIA_OFFLOAD), view
+только проверяет путь и заголовки и возвращает пустой ответ с
+X-Accel-Redirect (nginx) или X-Sendfile (Apache, lighttpd): байты
+картинок читает и шлет фронт, а не воркер Python. Без фронта view сам
+отвечает на условные запросы (get_conditional_response, RFC 7232) и
+Range, чтобы браузер и плееры не скачивали файл целиком повторно.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+OFFLOAD_HEADERS = {
+    'x-accel-redirect': 'X-Accel-Redirect',
+    'x-sendfile': 'X-Sendfile',
+}
+
+
+def parse_range(header: Optional[str], size: int):
+    """(start, end) включительно для одного диапазона Range.
+
+    None - заголовка нет или он не поддерживается (несколько диапазонов,
+    другие единицы): отдается весь файл. ValueError - диапазон вне файла.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # bytes=-500 - последние 500 байт
+        length = int(last)
+        if length == 0:
+            raise ValueError('пустой суффикс')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError('диапазон вне файла')
+    return start, end
+
+
+def _read_range(path: str, start: int, length: int):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def cache_control(path: str) -> str:
+    prefixes = tuple(getattr(settings, 'MEDIA_IMMUTABLE_PREFIXES', ()))
+    if prefixes and path.startswith(prefixes):
+        return IMMUTABLE_CACHE_CONTROL
+    return f'public, max-age={settings.MEDIA_MAX_AGE}'
+
+
+def _etag(stat) -> str:
+    return quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+
+
+def _if_range_matches(header: Optional[str], etag: str, mtime) -> bool:
+    """Без If-Range или при совпадении версии Range применяется."""
+    if not header:
+        return True
+    if header.startswith(('"', 'W/')):
+        return header == etag
+    header_mtime = parse_http_date_safe(header)
+    return header_mtime is not None and int(mtime) <= header_mtime
+
+
+def _offload(path: str, fullpath: str) -> Tuple[str, str]:
+    header = OFFLOAD_HEADERS[settings.MEDIA_OFFLOAD]
+    if settings.MEDIA_OFFLOAD == 'x-sendfile':
+        return header, fullpath
+    return header, settings.MEDIA_ACCEL_PREFIX + path
+
+
+@require_safe
+def serve(request, path):
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(fullpath)
+    except (OSError, ValueError):
+        raise Http404('Файл не найден')
+    if not os.path.isfile(fullpath):
+        raise Http404('Файл не найден')
+
+    etag = _etag(stat)
+    headers = {
+        'Last-Modified': http_date(stat.st_mtime),
+        'ETag': etag,
+        'Cache-Control': cache_control(path),
+    }
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        response = _file_response(request, path, fullpath, stat, etag)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def _file_response(request, path, fullpath, stat, etag):
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+
+    if settings.MEDIA_OFFLOAD:
+        # Range, длину и тело фронт обработает сам
+        response = HttpResponse(content_type=content_type)
+        header, value = _offload(path, fullpath)
+        response[header] = value
+        return response
+
+    size = stat.st_size
+    file_range = None
+    if _if_range_matches(request.META.get('HTTP_IF_RANGE'), etag,
+                         stat.st_mtime):
+        try:
+            file_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if file_range is None:
+        response = FileResponse(
+            open(fullpath, 'rb'), content_type=content_type
+        )
+        response['Content-Length'] = size
+    else:
+        start, end = file_range
+        response = StreamingHttpResponse(
+            _read_range(fullpath, start, end - start + 1),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,229 @@
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+from . import compression, routers
+from .querybudget import QueryRecorder
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetMiddleware:
+    """Считает SQL-запросы на запрос, ищет N+1 и следит за бюджетом."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        stats = recorder.stats(
+            match.view_name if match else None, request.method
+        )
+        response.query_stats = stats
+
+        if stats.over_budget:
+            logger.warning(
+                'Превышен бюджет запросов %s %s: %d из %d',
+                stats.method, stats.view_name, stats.count, stats.budget
+            )
+        for shape, times in stats.repeated.items():
+            logger.warning(
+                'Возможный N+1 в %s: %d раз %s',
+                stats.view_name or request.path, times, shape
+            )
+
+        if settings.DEBUG:
+            response['X-Query-Count'] = stats.count
+            response['X-Query-Time'] = f'{stats.duration * 1000:.1f}ms'
+            if stats.budget is not None:
+                response['X-Query-Budget'] = stats.budget
+            if stats.repeated:
+                response['X-Query-Repeated'] = len(stats.repeated)
+        return response
+
+
+class CompressionMiddleware:
+    """gzip/brotli для HTML и JSON, в том числе потоковых ответов.
+
+    Маленькие ответы, уже сжатые и несжимаемые типы пропускаются.
+    Обычный ответ с ETag (у лент он считается из поколений фрагментов)
+    сжимается один раз: сжатые байты лежат в кэше рядом с фрагментами
+    под ключом из ETag и устаревают вместе с ними. Потоковый ответ
+    сжимается по кускам, каждый кусок уходит клиенту сразу.
+
+    Степень сжатия и время CPU пишутся в лог, при DEBUG - в заголовки
+    X-Compression-Ratio и X-Compression-Time.
+    """
+    min_length = 200
+    cache_timeout = 60 * 60 * 24
+    compressible_types = (
+        'application/javascript',
+        'application/json',
+        'application/xml',
+        'image/svg+xml',
+    )
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if encoding is None:
+            return response
+        if response.streaming:
+            self.compress_stream(request, response, encoding)
+        else:
+            self.compress_content(request, response, encoding)
+        return response
+
+    def is_compressible(self, response):
+        if response.status_code in (204, 206, 304):
+            return False
+        if response.has_header('Content-Encoding'):
+            return False
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0]
+        return (
+            content_type.startswith('text/')
+            or content_type in self.compressible_types
+        )
+
+    def cache_key(self, request, response, encoding):
+        """Ключ сжатого тела или None, если тело не определяется ETag."""
+        etag = response.get('ETag')
+        if not etag or response.status_code != 200:
+            return None
+        # Показанные flash-сообщения не входят в ETag страницы
+        if getattr(getattr(request, '_messages', None), 'used', False):
+            return None
+        # Токен в форме выписан под новую CSRF-куку этого ответа
+        if (request.META.get('CSRF_COOKIE_USED')
+                and settings.CSRF_COOKIE_NAME not in request.COOKIES):
+            return None
+        digest = hashlib.md5(etag.encode()).hexdigest()
+        return f'compressed:{encoding}:{digest}'
+
+    def compress_content(self, request, response, encoding):
+        content = response.content
+        if len(content) < self.min_length:
+            return
+        key = self.cache_key(request, response, encoding)
+        compressed = cache.get(key) if key else None
+        cached = compressed is not None
+        start = time.thread_time()
+        if not cached:
+            compressed = compression.compress(encoding, content)
+            if key:
+                cache.set(key, compressed, self.cache_timeout)
+        cpu_time = time.thread_time() - start
+        if len(compressed) >= len(content):
+            return
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        self.mark_encoded(response, encoding)
+        self.report(request, response, len(content), len(compressed),
+                    cpu_time, cached)
+
+    def compress_stream(self, request, response, encoding):
+        response.streaming_content = self.stream(
+            request, response.streaming_content, encoding
+        )
+        del response['Content-Length']
+        self.mark_encoded(response, encoding)
+
+    def stream(self, request, chunks, encoding):
+        compressor = compression.stream_compressor(encoding)
+        original = compressed = 0
+        cpu_time = 0.0
+        for chunk in chunks:
+            start = time.thread_time()
+            data = compressor.compress(chunk)
+            cpu_time += time.thread_time() - start
+            original += len(chunk)
+            compressed += len(data)
+            if data:
+                yield data
+        data = compressor.finish()
+        compressed += len(data)
+        yield data
+        self.report(request, None, original, compressed, cpu_time, False)
+
+    def mark_encoded(self, response, encoding):
+        response['Content-Encoding'] = encoding
+        # Сжатое тело не совпадает побайтно с несжатым - ETag слабый
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+    def report(self, request, response, original, compressed, cpu_time,
+               cached):
+        ratio = original / compressed if compressed else 0
+        logger.debug(
+            'Сжатие %s: %d -> %d байт (x%.1f), CPU %.2f мс%s',
+            request.path, original, compressed, ratio, cpu_time * 1000,
+            ', из кэша' if cached else ''
+        )
+        if settings.DEBUG and response is not None:
+            response['X-Compression-Ratio'] = f'{ratio:.2f}'
+            response['X-Compression-Time'] = f'{cpu_time * 1000:.2f}ms'
+            if cached:
+                response['X-Compression-Cache'] = 'hit'
+
+
+class ReplicaRoutingMiddleware:
+    """Чтение с реплики для view с read_from_replica = True.
+
+    После записи браузер REPLICA_PIN_SECONDS читает из основной базы:
+    реплика могла еще не получить только что созданный пост. Срок
+    хранится в куке, а не в сессии, чтобы не писать сессию в базу на
+    каждую запись.
+    """
+    cookie_name = 'primary_until'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            pin = routers.end()
+        if pin:
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                self.cookie_name,
+                str(int(time.time() + seconds)),
+                max_age=seconds,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+    def is_pinned(self, request):
+        try:
+            return int(request.COOKIES[self.cookie_name]) > time.time()
+        except (KeyError, ValueError):
+            return False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if not getattr(view_class, 'read_from_replica', False):
+            return None
+        if request.method in ('GET', 'HEAD') and not self.is_pinned(request):
+            routers.read_from_replica()
+        return None
@@ -0,0 +1,142 @@
+from django.core.paginator import InvalidPage
+from django.http import Http404
+from django.utils.cache import (
+    add_never_cache_headers,
+    get_conditional_response,
+    patch_cache_control,
+    quote_etag,
+)
+from django.utils.http import http_date
+
+from .identity import IdentityMap
+from .paginators import (
+    CURSOR_ORDERING,
+    CursorPaginator,
+    ShallowPaginator,
+    encode_cursor,
+)
+
+
+class CursorPaginationMixin:
+    """Паджинация ListView по ключу (created, pk).
+
+    Без параметров и с ?page=N отдаются обычные нумерованные страницы,
+    но только неглубокие. Дальше листаем по непрозрачному ?after=<курсор>.
+    """
+    paginator_class = ShallowPaginator
+    cursor_kwarg = 'after'
+    cursor_ordering = CURSOR_ORDERING
+
+    def get_count(self):
+        """Готовое число объектов (денормализованный счетчик) или None."""
+        return None
+
+    def get_count_key(self):
+        """Ключ кэша для числа объектов или None."""
+        return None
+
+    def get_paginator(self, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True, **kwargs):
+        kwargs.setdefault('count', self.get_count())
+        kwargs.setdefault('count_key', self.get_count_key())
+        return super().get_paginator(
+            queryset, per_page, orphans, allow_empty_first_page, **kwargs
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        queryset = queryset.order_by(*self.cursor_ordering)
+        token = self.request.GET.get(self.cursor_kwarg)
+        if token is None:
+            paginator, page, object_list, is_paginated = (
+                super().paginate_queryset(queryset, page_size)
+            )
+            page.page_window = paginator.page_window(page.number)
+            page.next_cursor = None
+            if page.has_next():
+                page.next_cursor = encode_cursor(
+                    page[len(page) - 1], self.cursor_ordering
+                )
+            return paginator, page, page.object_list, is_paginated
+
+        paginator = CursorPaginator(
+            queryset, page_size, ordering=self.cursor_ordering
+        )
+        try:
+            page = paginator.page_after(token)
+        except InvalidPage as e:
+            raise Http404(f'Неверная страница: {e}')
+        return paginator, page, page.object_list, True
+
+
+def has_pending_messages(request) -> bool:
+    """Есть ли у запроса непоказанные flash-сообщения."""
+    storage = getattr(request, '_messages', None)
+    return storage is not None and len(storage) > 0
+
+
+class ConditionalGetMixin:
+    """Условный GET: 304 Not Modified до построения queryset и шаблона.
+
+    Наследник возвращает валидаторы из get_etag() и get_last_modified(),
+    они должны быть дешевыми: их считают на каждый GET и HEAD.
+    Страница с flash-сообщением отдается целиком и без валидаторов:
+    сообщения в них не учтены, и 304 спрятал бы его от пользователя.
+    """
+
+    def get_etag(self):
+        return None
+
+    def get_last_modified(self):
+        """Время изменения страницы (timestamp) или None."""
+        return None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        if has_pending_messages(request):
+            response = super().dispatch(request, *args, **kwargs)
+            add_never_cache_headers(response)
+            return response
+        etag = self.get_etag()
+        etag = quote_etag(etag) if etag else None
+        last_modified = self.get_last_modified()
+        last_modified = int(last_modified) if last_modified else None
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            if etag and not response.has_header('ETag'):
+                response['ETag'] = etag
+            if last_modified and not response.has_header('Last-Modified'):
+                response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(
+                response,
+                no_cache=True,
+                private=request.user.is_authenticated
+            )
+        return response
+
+
+class IdentityMapMixin:
+    """Доступ view к карте идентичности запроса.
+
+    Связанные объекты из identity_related, загруженные select_related
+    для object_list, заменяются экземплярами карты: автор десяти постов
+    на странице - один объект, и он же в контексте view.
+    """
+    identity_related = ()
+
+    @property
+    def identity_map(self) -> IdentityMap:
+        return IdentityMap.for_request(self.request)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.identity_related:
+            self.identity_map.share(
+                context.get('object_list', ()), *self.identity_related
+            )
+        return context
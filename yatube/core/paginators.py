@@ -0,0 +1,164 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import List, Tuple
+
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, InvalidPage, Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+CURSOR_ORDERING = ('-created', '-pk')
+MAX_NUMBERED_PAGE = 10
+PAGE_WINDOW = 2
+COUNT_TTL = 60 * 60
+
+
+def _cursor_fields(ordering: Tuple[str, str]) -> Tuple[str, str]:
+    return tuple(field.lstrip('-') for field in ordering)
+
+
+def encode_token(*parts) -> str:
+    """Упаковывает значения ключа в непрозрачный токен."""
+    raw = '|'.join(str(part) for part in parts)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_token(token: str, size: int) -> List[str]:
+    """Распаковывает токен, некорректный токен - InvalidPage."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidPage('Некорректный курсор')
+    parts = raw.rsplit('|', size - 1)
+    if len(parts) != size:
+        raise InvalidPage('Некорректный курсор')
+    return parts
+
+
+def encode_cursor(obj, ordering: Tuple[str, str] = CURSOR_ORDERING) -> str:
+    """Кодирует позицию объекта (created, pk) в непрозрачный токен."""
+    created_field, pk_field = _cursor_fields(ordering)
+    created = getattr(obj, created_field)
+    return encode_token(created.isoformat(), getattr(obj, pk_field))
+
+
+def decode_cursor(token: str) -> Tuple[datetime, int]:
+    """Разбирает токен курсора, некорректный токен - InvalidPage."""
+    created, pk = decode_token(token, 2)
+    try:
+        created = parse_datetime(created)
+        pk = int(pk)
+    except ValueError:
+        raise InvalidPage('Некорректный курсор')
+    if created is None:
+        raise InvalidPage('Некорректный курсор')
+    return created, pk
+
+
+def filter_after(queryset, token: str,
+                 ordering: Tuple[str, str] = CURSOR_ORDERING):
+    """Объекты после позиции курсора в порядке ordering."""
+    created, pk = decode_cursor(token)
+    created_field, pk_field = _cursor_fields(ordering)
+    return queryset.filter(
+        Q(**{f'{created_field}__lt': created})
+        | Q(**{created_field: created, f'{pk_field}__lt': pk})
+    )
+
+
+class ShallowPaginator(Paginator):
+    """Нумерованный паджинатор только для первых max_page страниц.
+
+    Глубокие страницы через OFFSET не отдаются: дальше листаем курсором.
+    Поэтому точное число объектов не нужно: COUNT ограничен первыми
+    max_page страницами и кэшируется по count_key. Готовое число (например,
+    денормализованный счетчик) можно передать в count.
+    """
+
+    def __init__(self, *args, max_page=MAX_NUMBERED_PAGE, count=None,
+                 count_key=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_page = max_page
+        self.count_key = count_key
+        if count is not None:
+            self.count = count
+
+    @cached_property
+    def count(self):
+        if self.count_key is not None:
+            count = cache.get(self.count_key)
+            if count is not None:
+                return count
+        limit = self.max_page * self.per_page + self.orphans + 1
+        count = self.object_list[:limit].count()
+        if self.count_key is not None:
+            cache.set(self.count_key, count, COUNT_TTL)
+        return count
+
+    def validate_number(self, number):
+        if isinstance(number, (int, float)) and number > self.max_page:
+            raise EmptyPage('Слишком далекая страница, используйте курсор')
+        return super().validate_number(number)
+
+    @property
+    def is_truncated(self):
+        return self.num_pages > self.max_page
+
+    @property
+    def page_range(self):
+        return range(1, min(self.num_pages, self.max_page) + 1)
+
+    def page_window(self, number, size=PAGE_WINDOW):
+        """Номера не дальше size от текущей страницы."""
+        last = min(self.num_pages, self.max_page)
+        return range(max(1, number - size), min(last, number + size) + 1)
+
+
+class CursorPage(Page):
+    """Страница, полученная по курсору: без номера и без COUNT(*)."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, cursor, next_cursor):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __repr__(self):
+        return f'<Page after {self.cursor}>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.cursor is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+class CursorPaginator(Paginator):
+    """Паджинатор по ключу (created, pk) для моделей на основе CreatedModel.
+
+    Каждая страница - один запрос по индексу без OFFSET, поэтому
+    стоимость не зависит от глубины. Поля ключа можно переопределить
+    через ordering, queryset должен быть отсортирован так же.
+    """
+
+    def __init__(self, *args, ordering=CURSOR_ORDERING, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ordering = ordering
+
+    def page_after(self, token: str) -> CursorPage:
+        queryset = filter_after(self.object_list, token, self.ordering)
+        return self.page_from(queryset, token)
+
+    def page_from(self, queryset, cursor=None) -> CursorPage:
+        items = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(items) > self.per_page:
+            items = items[:self.per_page]
+            next_cursor = encode_cursor(items[-1], self.ordering)
+        return CursorPage(items, self, cursor, next_cursor)
@@ -0,0 +1,130 @@
+"""Учет SQL-запросов на один HTTP-запрос и бюджеты по именам URL.
+
+Приложение объявляет бюджеты рядом со своими urls.py:
+
+    querybudget.declare(app_name, {
+        'index': 6,
+        'post_edit': {'GET': 7, 'POST': 9},
+    })
+
+Число - бюджет для любого метода, словарь - бюджеты по методам HTTP:
+отправка формы обычно дороже показа. HEAD считается как GET.
+QueryBudgetMiddleware считает запросы каждого HTTP-запроса, находит
+повторяющиеся формы запросов (N+1) и сравнивает число запросов с
+бюджетом. В режиме DEBUG счетчики попадают в заголовки ответа.
+
+BEGIN, SAVEPOINT и RELEASE в бюджет не входят: внутри транзакции
+TestCase, где бюджеты проверяются, atomic их не выполняет, а в
+рабочем режиме autocommit выполняет.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from typing import Dict, List, Optional, Union
+
+from django.db import connections
+
+N_PLUS_ONE_THRESHOLD = 3
+
+Budget = Union[int, Dict[str, int]]
+
+_budgets: Dict[str, Budget] = {}
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_TRANSACTION_RE = re.compile(
+    r'\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b', re.IGNORECASE
+)
+
+
+def declare(namespace: str, budgets: Dict[str, Budget]) -> None:
+    """Объявляет бюджеты запросов для URL из пространства имен."""
+    for url_name, budget in budgets.items():
+        _budgets[f'{namespace}:{url_name}'] = budget
+
+
+def budget_for(view_name: str, method: str = 'GET') -> Optional[int]:
+    budget = _budgets.get(view_name)
+    if not isinstance(budget, dict):
+        return budget
+    method = 'GET' if method == 'HEAD' else method
+    return budget.get(method)
+
+
+def is_transaction_control(sql: str) -> bool:
+    return _TRANSACTION_RE.match(sql) is not None
+
+
+def query_shape(sql: str) -> str:
+    """Форма запроса: без значений и длины списков IN."""
+    return _NUMBER_RE.sub('?', _IN_LIST_RE.sub('IN (...)', sql))
+
+
+class QueryStats:
+    def __init__(self, queries: List[str], duration: float,
+                 view_name: str = None, method: str = 'GET'):
+        self.queries = queries
+        self.duration = duration
+        self.view_name = view_name
+        self.method = method
+        self.budget = budget_for(view_name, method) if view_name else None
+
+    @property
+    def statements(self) -> List[str]:
+        """Запросы без управления транзакциями."""
+        return [
+            sql for sql in self.queries if not is_transaction_control(sql)
+        ]
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def repeated(self) -> Dict[str, int]:
+        """Формы запросов, повторенные N_PLUS_ONE_THRESHOLD раз и больше."""
+        shapes = Counter(query_shape(sql) for sql in self.statements)
+        return {
+            shape: times for shape, times in shapes.items()
+            if times >= N_PLUS_ONE_THRESHOLD
+        }
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.count > self.budget
+
+
+class QueryRecorder:
+    """Записывает запросы всех подключений внутри блока with."""
+
+    def __init__(self):
+        self.queries = []
+        self.executed = []
+        self.duration = 0.0
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.queries.append(sql)
+            if not many:
+                self.executed.append((context['connection'], sql, params))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def stats(self, view_name: str = None,
+              method: str = 'GET') -> QueryStats:
+        return QueryStats(
+            list(self.queries), self.duration, view_name, method
+        )
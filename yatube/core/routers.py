@@ -0,0 +1,176 @@
+"""Чтение с реплик, запись - в основную базу.
+
+Запись всегда идет в 'default'. Чтение уходит на реплику из
+DATABASE_REPLICAS только внутри запроса к view с read_from_replica = True
+(ленты, профиль, страница поста): остальные view, формы и команды
+читают из основной базы, как раньше.
+
+Реплика отстает от основной базы, поэтому запрос остается на основной:
+- после первой записи в этом же запросе;
+- внутри транзакции, открытой во время запроса;
+- REPLICA_PIN_SECONDS после записи в любом запросе этого же браузера,
+  чтобы автор сразу видел свой пост и комментарий (read-your-writes);
+- если данные страницы изменились после позиции реплики (require_fresh):
+  ключи фрагментов и ETag считаются из поколений основного кэша, и
+  HTML отстающей реплики закэшировался бы под новым поколением.
+
+Позиция реплики - время начала последней копии copy_database в общем
+кэше. Реплика без известной позиции не используется: ее файл мог быть
+создан пустым любым подключением к alias (makemigrations --check,
+тестовая база benchmark_views). View без поколений фрагментов
+(require_fresh(None)) всегда читает из основной базы.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+POSITION_KEY = 'replica:position:{alias}'
+# Сигналы поднимают поколения до коммита транзакции: запись, которая
+# закоммитилась чуть позже начала копии, в копию не попала
+POSITION_MARGIN = 1.0
+
+# Пользователи и сессии всегда читаются из основной базы: иначе только
+# что вошедший пользователь на отстающей реплике выглядел бы анонимом
+PRIMARY_APPS = ('auth', 'sessions', 'contenttypes')
+
+_state = threading.local()
+
+
+def replica_aliases():
+    return [
+        alias for alias in getattr(settings, 'DATABASE_REPLICAS', ())
+        if alias in settings.DATABASES
+    ]
+
+
+def _atomic_depth() -> int:
+    connection = connections[DEFAULT_DB_ALIAS]
+    return int(connection.in_atomic_block) + len(connection.savepoint_ids)
+
+
+def begin() -> None:
+    """Начало запроса: пока view не выбрана, читаем из основной базы."""
+    _state.replica = None
+    _state.wrote = False
+    _state.pin = False
+    _state.internal = False
+    _state.depth = _atomic_depth()
+
+
+def read_from_replica() -> None:
+    """Чтение до конца запроса - с одной случайной реплики.
+
+    Только из реплик, которые copy_database уже заполнила.
+    """
+    aliases = replica_aliases()
+    if not aliases or getattr(_state, 'wrote', False):
+        return
+    positions = cache.get_many(
+        [POSITION_KEY.format(alias=alias) for alias in aliases]
+    )
+    aliases = [
+        alias for alias in aliases
+        if POSITION_KEY.format(alias=alias) in positions
+    ]
+    if aliases:
+        _state.replica = random.choice(aliases)
+
+
+def copy_database(alias: str, source: str = DEFAULT_DB_ALIAS) -> None:
+    """Копия SQLite-базы source в alias через backup API.
+
+    Копия пишется в открытый файл реплики под ее блокировкой, поэтому
+    читатели видят либо прежнюю копию, либо новую целиком, а их
+    постоянные соединения остаются рабочими.
+    """
+    position = time.time() - POSITION_MARGIN
+    source_connection = connections[source]
+    source_connection.ensure_connection()
+    target = connections[alias]
+    target.ensure_connection()
+    source_connection.connection.backup(target.connection)
+    cache.set(POSITION_KEY.format(alias=alias), position, None)
+
+
+def require_fresh(modified: Optional[float]) -> None:
+    """Основная база, если реплика не видела изменений от modified.
+
+    modified - время последнего изменения данных страницы, None -
+    неизвестно.
+    """
+    replica = getattr(_state, 'replica', None)
+    if replica is None:
+        return
+    position = cache.get(POSITION_KEY.format(alias=replica))
+    if position is None or modified is None or modified > position:
+        _state.replica = None
+
+
+def end() -> bool:
+    """Конец запроса; True, если браузер нужно закрепить за основной базой.
+
+    Служебные записи из internal_writes() не в счет.
+    """
+    pin = getattr(_state, 'pin', False)
+    _state.__dict__.clear()
+    return pin
+
+
+@contextmanager
+def use_primary():
+    """Чтение внутри блока - из основной базы, даже во view с репликой."""
+    replica = getattr(_state, 'replica', None)
+    _state.replica = None
+    try:
+        yield
+    finally:
+        _state.replica = replica
+
+
+@contextmanager
+def internal_writes():
+    """Служебные записи блока (ленты, кэши в базе) - не действия пользователя.
+
+    Чтение до конца запроса все равно идет из основной базы, но браузер
+    не закрепляется за ней на REPLICA_PIN_SECONDS.
+    """
+    internal = getattr(_state, 'internal', False)
+    _state.internal = True
+    try:
+        yield
+    finally:
+        _state.internal = internal
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = getattr(_state, 'replica', None)
+        if replica is None or _state.wrote:
+            return None
+        if model._meta.app_label in PRIMARY_APPS:
+            return None
+        if _atomic_depth() > _state.depth:
+            return None
+        return replica
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        if not getattr(_state, 'internal', False):
+            _state.pin = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия основной базы, объекты с обеих связываются
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на реплику вместе с данными
+        if db in replica_aliases():
+            return False
+        return None
@@ -0,0 +1,202 @@
+"""Статика с хешами в именах, заранее сжатая и с кэшем "навсегда".
+
+collectstatic через CompressedManifestStaticFilesStorage пишет копии
+файлов с хешем содержимого в имени (css/bootstrap.min.<hash>.css),
+манифест staticfiles.json и рядом с текстовыми файлами - .br и .gz.
+Сжатие происходит один раз при сборке, а не на каждый запрос.
+
+StaticFilesApplication - WSGI-обертка, которая отдает STATIC_ROOT до
+Django. Каталог обходится один раз при старте, небольшие файлы читаются
+в память, поэтому запрос к статике не делает ни stat(), ни open():
+только поиск в словаре и выбор кодировки по Accept-Encoding. Файлам с
+хешем в имени отдается Cache-Control: immutable на год - новая версия
+получит новое имя.
+"""
+import hashlib
+import json
+import mimetypes
+import os
+from typing import Dict, NamedTuple, Optional, Tuple
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.utils.http import parse_etags
+
+from .compression import (
+    STATIC_LEVELS,
+    accepted_encodings,
+    compress,
+)
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.json', '.map', '.svg', '.txt', '.xml', '.html',
+    '.ico', '.eot', '.ttf', '.otf',
+)
+# Сжатая копия хранится, только если она заметно меньше исходной
+MIN_COMPRESSION_RATIO = 0.95
+MAX_MEMORY_FILE_SIZE = 1024 * 1024
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Файлы без хеша в имени (например, favicon.ico по прямой ссылке)
+REVALIDATE_CACHE_CONTROL = 'public, max-age=60'
+# Порядок предпочтения кодировок: (кодировка, расширение файла)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match по RFC 7232, как у core.media: '*' или список тегов,
+    сравнение слабое (W/ не учитывается)."""
+    etags = parse_etags(header)
+    if etags == ['*']:
+        return True
+    return etag in {tag[2:] if tag.startswith('W/') else tag for tag in etags}
+
+
+def compress_variants(data: bytes) -> Dict[str, bytes]:
+    """{расширение: сжатые данные} для кодировок, которые дают выигрыш."""
+    variants = {}
+    for encoding, extension in ENCODINGS:
+        compressed = compress(encoding, data, STATIC_LEVELS)
+        if len(compressed) < len(data) * MIN_COMPRESSION_RATIO:
+            variants[extension] = compressed
+    return variants
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Манифест с хешами плюс .gz/.br копии, записанные при сборке.
+
+    Для файла, которого нет ни в манифесте, ни на диске (например, в
+    шаблоне ссылка на еще не добавленную картинку), {% static %} отдает
+    исходное имя вместо ошибки рендеринга страницы.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            with self.open(name) as file:
+                data = file.read()
+            for extension, compressed in compress_variants(data).items():
+                compressed_name = name + extension
+                if self.exists(compressed_name):
+                    self.delete(compressed_name)
+                self._save(compressed_name, ContentFile(compressed))
+
+
+class StaticFile(NamedTuple):
+    path: str
+    size: int
+    etag: str
+    # Содержимое в памяти; None - большой файл, читается с диска
+    content: Optional[bytes]
+
+
+class StaticAsset(NamedTuple):
+    headers: Tuple[Tuple[str, str], ...]
+    # {кодировка или 'identity': файл}
+    files: Dict[str, StaticFile]
+
+
+def _read(path: str) -> StaticFile:
+    stat = os.stat(path)
+    if stat.st_size > MAX_MEMORY_FILE_SIZE:
+        etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+        return StaticFile(path, stat.st_size, etag, None)
+    with open(path, 'rb') as file:
+        content = file.read()
+    etag = '"{}"'.format(hashlib.md5(content).hexdigest()[:16])
+    return StaticFile(path, stat.st_size, etag, content)
+
+
+def _immutable_names(root: str) -> frozenset:
+    """Имена файлов с хешем из манифеста collectstatic."""
+    path = os.path.join(root, ManifestStaticFilesStorage.manifest_name)
+    try:
+        with open(path, encoding='utf-8') as file:
+            return frozenset(json.load(file).get('paths', {}).values())
+    except (OSError, ValueError):
+        return frozenset()
+
+
+def scan(root: str) -> Dict[str, StaticAsset]:
+    """{имя относительно root: файл со всеми сжатыми вариантами}."""
+    immutable = _immutable_names(root)
+    suffixes = tuple(extension for _, extension in ENCODINGS)
+    assets = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(suffixes):
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            files = {'identity': _read(path)}
+            for encoding, extension in ENCODINGS:
+                if os.path.exists(path + extension):
+                    files[encoding] = _read(path + extension)
+            content_type, _ = mimetypes.guess_type(filename)
+            headers = [
+                ('Content-Type', content_type or 'application/octet-stream'),
+                ('Cache-Control', IMMUTABLE_CACHE_CONTROL if name in immutable
+                 else REVALIDATE_CACHE_CONTROL),
+            ]
+            if len(files) > 1:
+                headers.append(('Vary', 'Accept-Encoding'))
+            assets[name] = StaticAsset(tuple(headers), files)
+    return assets
+
+
+class StaticFilesApplication:
+    """WSGI-обертка: STATIC_URL из памяти, остальное - в application."""
+
+    def __init__(self, application, root: Optional[str] = None,
+                 prefix: Optional[str] = None):
+        self.application = application
+        self.root = root or settings.STATIC_ROOT
+        self.prefix = prefix or settings.STATIC_URL
+        self.assets = {}
+        if self.root and os.path.isdir(self.root):
+            self.assets = scan(self.root)
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.prefix):
+            return self.application(environ, start_response)
+        asset = self.assets.get(path[len(self.prefix):])
+        method = environ.get('REQUEST_METHOD')
+        if asset is None or method not in ('GET', 'HEAD'):
+            return self.application(environ, start_response)
+        return self.serve(asset, environ, start_response, method == 'HEAD')
+
+    def serve(self, asset: StaticAsset, environ, start_response, head):
+        encoding, file = 'identity', asset.files['identity']
+        accepted = accepted_encodings(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        for candidate, _ in ENCODINGS:
+            if candidate in accepted and candidate in asset.files:
+                encoding, file = candidate, asset.files[candidate]
+                break
+        headers = list(asset.headers)
+        headers.append(('ETag', file.etag))
+        if etag_matches(environ.get('HTTP_IF_NONE_MATCH', ''), file.etag):
+            start_response('304 Not Modified', headers)
+            return []
+        if encoding != 'identity':
+            headers.append(('Content-Encoding', encoding))
+        headers.append(('Content-Length', str(file.size)))
+        start_response('200 OK', headers)
+        if head:
+            return []
+        if file.content is not None:
+            return [file.content]
+        wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return wrapper(open(file.path, 'rb'))
@@ -0,0 +1,18 @@
+from django import template
+
+from ..identity import IdentityMap
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def load_related(context, objects, *fields):
+    """Догружает связи fields объектов objects через карту запроса.
+
+    Один IN-запрос на поле, объекты из карты не запрашиваются:
+    {% load_related page_obj 'author' 'group' %}
+    """
+    IdentityMap.for_request(context['request']).load_related(
+        objects, *fields
+    )
+    return ''
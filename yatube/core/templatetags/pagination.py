@@ -0,0 +1,16 @@
+from django import template
+
+register = template.Library()
+
+PAGINATION_PARAMS = ('page', 'after')
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, **params):
+    """Ссылка на страницу с сохранением остальных GET-параметров."""
+    query = context['request'].GET.copy()
+    for name in PAGINATION_PARAMS:
+        query.pop(name, None)
+    for name, value in params.items():
+        query[name] = value
+    return f'?{query.urlencode()}'
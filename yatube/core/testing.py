@@ -0,0 +1,125 @@
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+from .querybudget import QueryRecorder, QueryStats
+
+FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def testing_settings() -> override_settings:
+    """Настройки прогона тестов поверх боевых.
+
+    Манифест статики без collectstatic не нужен, реплики тесты включают
+    сами, кэш - чистый в памяти, а не данные сайта и прошлых прогонов.
+    Миниатюры строятся в том же процессе: процессы пула читают боевые
+    настройки и писали бы в базу и кэш сайта.
+    """
+    caches = {
+        alias: {
+            **config,
+            'LOCATION': f'file:yatube-test-{alias}?mode=memory&cache=shared',
+        }
+        for alias, config in settings.CACHES.items()
+    }
+    return override_settings(
+        STATICFILES_STORAGE=(
+            'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+        DATABASE_REPLICAS=[],
+        CACHES=caches,
+        THUMBNAIL_WORKERS=0,
+    )
+
+
+class TestRunner(DiscoverRunner):
+    """manage.py test с настройками testing_settings()."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.testing_settings = testing_settings()
+        self.testing_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.testing_settings.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+class QueryBudgetTestMixin:
+    """Проверки для TestCase по данным QueryBudgetMiddleware."""
+
+    def get_query_stats(self, response) -> QueryStats:
+        stats = getattr(response, 'query_stats', None)
+        self.assertIsNotNone(
+            stats,
+            'Ответ без query_stats: подключен ли QueryBudgetMiddleware?'
+        )
+        return stats
+
+    def assertNoRepeatedQueries(self, response):
+        stats = self.get_query_stats(response)
+        self.assertFalse(
+            stats.repeated,
+            f'Повторяющиеся запросы (N+1) в {stats.view_name}: '
+            f'{stats.repeated}'
+        )
+
+    def assertWithinQueryBudget(self, response):
+        stats = self.get_query_stats(response)
+        self.assertIsNotNone(
+            stats.budget,
+            f'Для {stats.method} {stats.view_name} не объявлен бюджет'
+        )
+        self.assertLessEqual(
+            stats.count,
+            stats.budget,
+            f'{stats.method} {stats.view_name}: {stats.count} запросов '
+            f'при бюджете {stats.budget}:\n' + '\n'.join(stats.queries)
+        )
+        self.assertNoRepeatedQueries(response)
+
+
+class QueryPlanTestMixin:
+    """Проверка планов запросов SQLite через EXPLAIN QUERY PLAN.
+
+    Полный просмотр таблицы и сортировка во временном B-дереве означают,
+    что запросу не хватает индекса. Маленькие справочники можно
+    разрешить через plan_scan_allowed.
+    """
+    plan_scan_allowed = ()
+
+    def get_plan_problems(self, executed):
+        problems = []
+        for connection, sql, params in executed:
+            if connection.vendor != 'sqlite':
+                continue
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            tables = set(connection.introspection.table_names())
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                details = [row[3] for row in cursor.fetchall()]
+            for detail in details:
+                scan = FULL_SCAN_RE.match(detail)
+                full_scan = (
+                    scan and scan.group(1) in tables
+                    and scan.group(1) not in self.plan_scan_allowed
+                )
+                if full_scan or TEMP_SORT in detail:
+                    problems.append(f'{detail}\n    {sql}')
+        return problems
+
+    @contextmanager
+    def assertEfficientQueryPlans(self):
+        """Все SELECT внутри блока with идут по индексам."""
+        with QueryRecorder() as recorder:
+            yield recorder
+        problems = self.get_plan_problems(recorder.executed)
+        self.assertFalse(
+            problems,
+            'Запросы без подходящего индекса:\n' + '\n'.join(problems)
+        )
@@ -1,6 +1,36 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import time
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
-from django.test import TestCase
+import brotli
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.template import Context, Template
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+
+from . import compression, querybudget
+from .benchmark import compare, percentile
+from .cache import SQLiteCache
+from .identity import IdentityMap
+from .media import IMMUTABLE_CACHE_CONTROL as MEDIA_IMMUTABLE, parse_range
+from .middleware import CompressionMiddleware
+from .querybudget import QueryStats
+from .staticfiles import IMMUTABLE_CACHE_CONTROL, StaticFilesApplication
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +38,527 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class QueryStatsTestClass(TestCase):
+    def test_repeated_query_shapes(self):
+        """Одинаковые по форме запросы считаются повторами."""
+        queries = [
+            'SELECT * FROM t WHERE id = %s',
+            'SELECT * FROM t WHERE id = %s',
+            'SELECT * FROM t WHERE id = %s',
+            'SELECT * FROM t WHERE id IN (%s, %s) LIMIT 10',
+            'SELECT * FROM t WHERE id IN (%s) LIMIT 20',
+        ]
+        stats = QueryStats(queries, 0.0)
+        self.assertEqual(
+            stats.repeated,
+            {'SELECT * FROM t WHERE id = %s': 3}
+        )
+
+    def test_transaction_control_is_not_counted(self):
+        """BEGIN и точки сохранения не входят в бюджет и поиск N+1."""
+        stats = QueryStats(
+            ['BEGIN', 'SAVEPOINT "s1_x1"', 'SELECT 1',
+             'RELEASE SAVEPOINT "s1_x1"', 'SAVEPOINT "s1_x2"',
+             'ROLLBACK TO SAVEPOINT "s1_x2"'],
+            0.0
+        )
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(stats.repeated, {})
+
+    def test_budget_per_method(self):
+        """Бюджет можно объявить отдельно для методов HTTP."""
+        querybudget.declare('budget-tests', {
+            'list': 3,
+            'form': {'GET': 2, 'POST': 5},
+        })
+        self.assertEqual(
+            querybudget.budget_for('budget-tests:list', 'POST'), 3
+        )
+        self.assertEqual(
+            querybudget.budget_for('budget-tests:form', 'HEAD'), 2
+        )
+        self.assertEqual(
+            QueryStats([], 0.0, 'budget-tests:form', 'POST').budget, 5
+        )
+        self.assertIsNone(
+            querybudget.budget_for('budget-tests:form', 'DELETE')
+        )
+
+
+class IdentityMapTestClass(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.users = [
+            User.objects.create_user(username=f'user{i}') for i in range(3)
+        ]
+
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        self.identity_map = IdentityMap.for_request(self.request)
+
+    def test_object_loaded_once_per_request(self):
+        """Повторный поиск по pk или username не ходит в базу."""
+        User = get_user_model()
+        user = self.users[0]
+        with self.assertNumQueries(1):
+            by_name = self.identity_map.get(
+                User.objects.all(), username=user.username
+            )
+        with self.assertNumQueries(0):
+            self.assertIs(
+                self.identity_map.get(User.objects.all(), pk=str(user.pk)),
+                by_name
+            )
+            self.assertIs(
+                IdentityMap.for_request(self.request)
+                .get(User.objects.all(), username=user.username),
+                by_name
+            )
+        with self.assertRaises(Http404):
+            self.identity_map.get(User.objects.all(), username='nobody')
+
+    def test_instances_with_other_fields_are_not_shared(self):
+        """Экземпляр без нужных полей или связей не отдается."""
+        User = get_user_model()
+        pk = self.users[0].pk
+        partial = self.identity_map.get(
+            User.objects.only('username'), pk=pk
+        )
+        with self.assertNumQueries(1):
+            full = self.identity_map.get(
+                User.objects.select_related('counters'), pk=pk
+            )
+        self.assertIsNot(full, partial)
+        self.assertIsNotNone(full.email)
+        with self.assertNumQueries(0):
+            self.assertIs(
+                self.identity_map.get(User.objects.all(), pk=pk), full
+            )
+        self.assertIs(
+            self.identity_map.add(User.objects.only('username').get(pk=pk)),
+            full
+        )
+
+    def test_load_many_batches_missing(self):
+        """Недостающие объекты догружаются одним IN-запросом."""
+        User = get_user_model()
+        first = self.identity_map.get(User.objects.all(), pk=self.users[0].pk)
+        ids = [user.pk for user in self.users] + [self.users[1].pk, 0]
+        with self.assertNumQueries(1):
+            loaded = self.identity_map.load_many(User.objects.all(), ids)
+        self.assertEqual(set(loaded), {user.pk for user in self.users})
+        self.assertIs(loaded[first.pk], first)
+        with self.assertNumQueries(0):
+            self.identity_map.load_many(User.objects.all(), ids)
+
+    def test_load_related_in_template(self):
+        """{% load_related %}: один запрос на поле, общие экземпляры."""
+        permissions = list(Permission.objects.order_by('id')[:20])
+        template = Template(
+            "{% load identity %}"
+            "{% load_related permissions 'content_type' %}"
+            "{% for permission in permissions %}"
+            "{{ permission.content_type.model }} "
+            "{% endfor %}"
+        )
+        with self.assertNumQueries(1):
+            output = template.render(Context({
+                'request': self.request, 'permissions': permissions
+            }))
+        self.assertEqual(output.split(), [
+            permission.content_type.model for permission in permissions
+        ])
+        types = {id(permission.content_type) for permission in permissions}
+        self.assertEqual(
+            len(types),
+            len({permission.content_type_id for permission in permissions})
+        )
+
+
+class SQLiteCacheTestClass(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_shared_between_instances(self):
+        """Запись одного экземпляра видна другому (другому процессу)."""
+        self.cache.set('key', {'value': 1})
+        other = self.make_cache()
+        self.assertEqual(other.get('key'), {'value': 1})
+        self.assertEqual(other.get_many(['key', 'missing']),
+                         {'key': {'value': 1}})
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_add_incr_and_ttl(self):
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.make_cache().incr('counter', 2), 3)
+        self.assertEqual(self.cache.get('counter'), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+        self.cache.set('short', 'value', timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 'new'))
+
+    def test_old_sqlite_is_rejected(self):
+        """Без RETURNING и UPSERT кэш не создается."""
+        with mock.patch('core.cache.sqlite3.sqlite_version_info',
+                        (3, 31, 1)), \
+                self.assertRaises(ImproperlyConfigured):
+            self.make_cache()
+
+    def test_cull_evicts_least_recently_used(self):
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=5)
+        for number in range(10):
+            cache.set(f'key{number}', number)
+        connection = cache._connection()
+        connection.execute(
+            "UPDATE cache SET accessed = 0 WHERE key LIKE '%key0'"
+        )
+        cache.set('key10', 10)
+        cache._cull()
+        self.assertIsNone(cache.get('key0'))
+        self.assertEqual(cache.get('key10'), 10)
+        self.assertLessEqual(
+            connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0],
+            10
+        )
+
+
+class BenchmarkTestClass(SimpleTestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_compare_reports_regressions(self):
+        """Регрессия - рост p95 сверх допуска или новые запросы."""
+        baseline = {'small': {
+            'index': {'p95_ms': 10.0, 'queries': 3},
+            'profile': {'p95_ms': 10.0, 'queries': 3},
+        }}
+        results = {'small': {
+            'index': {'p95_ms': 11.0, 'queries': 3},
+            'profile': {'p95_ms': 13.0, 'queries': 4},
+            'new_view': {'p95_ms': 100.0, 'queries': 50},
+        }}
+        regressions = compare(results, baseline, tolerance=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(
+            all(line.startswith('small/profile') for line in regressions)
+        )
+
+
+class StaticPipelineTestClass(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp()
+        with override_settings(
+            STATIC_ROOT=cls.root,
+            STATICFILES_STORAGE=(
+                'core.staticfiles.CompressedManifestStaticFilesStorage'
+            ),
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.root, 'staticfiles.json')) as file:
+            cls.manifest = json.load(file)['paths']
+        cls.app = StaticFilesApplication(
+            cls.inner_app, root=cls.root, prefix='/static/'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.root, ignore_errors=True)
+        super().tearDownClass()
+
+    @staticmethod
+    def inner_app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'django']
+
+    def get(self, path, **environ):
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        environ.setdefault('REQUEST_METHOD', 'GET')
+        body = b''.join(self.app({'PATH_INFO': path, **environ},
+                                 start_response))
+        return response['status'], response['headers'], body
+
+    def test_hashed_copy_is_precompressed(self):
+        """Копия с хешем лежит рядом с исходником, .gz и .br версиями."""
+        hashed = self.manifest['css/bootstrap.min.css']
+        self.assertNotEqual(hashed, 'css/bootstrap.min.css')
+        with open(os.path.join(self.root, hashed), 'rb') as file:
+            original = file.read()
+        with gzip.open(os.path.join(self.root, hashed + '.gz')) as file:
+            self.assertEqual(file.read(), original)
+        with open(os.path.join(self.root, hashed + '.br'), 'rb') as file:
+            self.assertEqual(brotli.decompress(file.read()), original)
+        for extension in ('.gz', '.br'):
+            self.assertFalse(os.path.exists(
+                os.path.join(self.root, 'img/Pushka.jpg' + extension)
+            ))
+
+    def test_negotiates_encoding_and_caches_forever(self):
+        """gzip по Accept-Encoding, immutable для имени с хешем."""
+        path = '/static/' + self.manifest['css/bootstrap.min.css']
+        status, headers, body = self.get(
+            path, HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(headers['Content-Length']), len(body))
+        self.assertTrue(gzip.decompress(body))
+
+        _, br_headers, br_body = self.get(
+            path, HTTP_ACCEPT_ENCODING='gzip, deflate, br'
+        )
+        self.assertEqual(br_headers['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(br_body), gzip.decompress(body))
+
+        status, plain_headers, _ = self.get(
+            path, HTTP_ACCEPT_ENCODING='gzip;q=0'
+        )
+        self.assertNotIn('Content-Encoding', plain_headers)
+        etag = headers['ETag']
+        for if_none_match in (etag, f'W/{etag}', '*', f'"other", {etag}'):
+            with self.subTest(if_none_match=if_none_match):
+                status, _, body = self.get(
+                    path, HTTP_ACCEPT_ENCODING='gzip',
+                    HTTP_IF_NONE_MATCH=if_none_match
+                )
+                self.assertEqual(status, '304 Not Modified')
+                self.assertEqual(body, b'')
+        status, _, _ = self.get(
+            path, HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=f'"other{etag[1:]}'
+        )
+        self.assertEqual(status, '200 OK')
+
+    def test_unhashed_and_unknown_paths(self):
+        """Исходные имена кэшируются ненадолго, прочее уходит в Django."""
+        _, headers, _ = self.get('/static/css/bootstrap.min.css')
+        self.assertNotIn('immutable', headers['Cache-Control'])
+        self.assertEqual(self.get('/static/missing.css')[2], b'django')
+        self.assertEqual(self.get('/')[2], b'django')
+
+
+class MediaServeTestClass(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(cls.root, 'cache', 'ab'))
+        os.makedirs(os.path.join(cls.root, 'posts'))
+        cls.content = bytes(range(256)) * 4
+        for name in ('cache/ab/thumb.jpg', 'posts/image.jpg'):
+            with open(os.path.join(cls.root, name), 'wb') as file:
+                file.write(cls.content)
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.root)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.root, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-99', 1024), (0, 99))
+        self.assertEqual(parse_range('bytes=1000-', 1024), (1000, 1023))
+        self.assertEqual(parse_range('bytes=-24', 1024), (1000, 1023))
+        self.assertEqual(parse_range('bytes=0-5000', 1024), (0, 1023))
+        self.assertIsNone(parse_range('bytes=0-1,5-9', 1024))
+        self.assertIsNone(parse_range(None, 1024))
+        with self.assertRaises(ValueError):
+            parse_range('bytes=2000-', 1024)
+
+    def test_full_and_conditional(self):
+        """Миниатюры кэшируются навсегда, повторный запрос - 304."""
+        response = self.client.get('/media/cache/ab/thumb.jpg')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Cache-Control'], MEDIA_IMMUTABLE)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+        response = self.client.get(
+            '/media/cache/ab/thumb.jpg',
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.client.get('/media/posts/image.jpg')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_conditional_headers_follow_rfc_7232(self):
+        """If-None-Match важнее If-Modified-Since, '*' и слабые теги."""
+        url = '/media/posts/image.jpg'
+        response = self.client.get(url)
+        etag, modified = response['ETag'], response['Last-Modified']
+        for if_none_match in (etag, f'W/{etag}', '*', f'"other", {etag}'):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=if_none_match
+                )
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response['ETag'], etag)
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH='"other"',
+            HTTP_IF_MODIFIED_SINCE=modified
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response = self.client.get(url, HTTP_IF_MATCH='"other"')
+        self.assertEqual(response.status_code,
+                         HTTPStatus.PRECONDITION_FAILED)
+
+    def test_range_requests(self):
+        response = self.client.get(
+            '/media/posts/image.jpg', HTTP_RANGE='bytes=10-19'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(response.streaming_content),
+                         self.content[10:20])
+
+        response = self.client.get(
+            '/media/posts/image.jpg', HTTP_RANGE='bytes=10-19',
+            HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response = self.client.get(
+            '/media/posts/image.jpg', HTTP_RANGE='bytes=4096-'
+        )
+        self.assertEqual(response.status_code,
+                         HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_missing_and_outside_root(self):
+        for path in ('/media/posts/missing.jpg', '/media/posts/'):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.get('/media/../manage.py')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.client.post('/media/posts/image.jpg')
+        self.assertEqual(response.status_code,
+                         HTTPStatus.METHOD_NOT_ALLOWED)
+
+    def test_offload_to_front_server(self):
+        """С MEDIA_OFFLOAD тело отдает фронт, ответ Django пустой."""
+        with self.settings(MEDIA_OFFLOAD='x-accel-redirect'):
+            response = self.client.get('/media/cache/ab/thumb.jpg')
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/cache/ab/thumb.jpg')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Cache-Control'], MEDIA_IMMUTABLE)
+        with self.settings(MEDIA_OFFLOAD='x-sendfile'):
+            response = self.client.get('/media/posts/image.jpg')
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(self.root, 'posts', 'image.jpg')
+        )
+
+
+class CompressionMiddlewareTestClass(TestCase):
+    html = '<li class="post">Запись</li>\n' * 200
+
+    def respond(self, response, accept='gzip, br'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_feed_page_compressed_once(self):
+        """Сжатые байты ленты берутся из кэша, пока не сменится ETag."""
+        with mock.patch.object(
+            compression, 'compress', wraps=compression.compress
+        ) as compress:
+            first = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', first['Vary'])
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        self.assertEqual(first.content, second.content)
+        self.assertIn('<html', gzip.decompress(first.content).decode())
+        self.assertEqual(
+            self.client.get(
+                '/', HTTP_IF_NONE_MATCH=first['ETag']
+            ).status_code,
+            HTTPStatus.NOT_MODIFIED
+        )
+
+    def test_brotli_preferred(self):
+        """br выбирается, если клиент принимает и его, и gzip."""
+        response = self.respond(HttpResponse(self.html), 'gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content).decode(),
+                         self.html)
+        chunks = [self.html.encode()] * 3
+        streaming = self.respond(
+            StreamingHttpResponse(iter(chunks)), 'br'
+        )
+        self.assertEqual(streaming['Content-Encoding'], 'br')
+        self.assertEqual(
+            brotli.decompress(b''.join(streaming.streaming_content)),
+            b''.join(chunks)
+        )
+
+    def test_skips_small_encoded_and_refused(self):
+        small = self.respond(HttpResponse('<p>короткий</p>'))
+        self.assertFalse(small.has_header('Content-Encoding'))
+        encoded = HttpResponse(self.html)
+        encoded['Content-Encoding'] = 'identity'
+        self.assertEqual(self.respond(encoded)['Content-Encoding'],
+                         'identity')
+        image = self.respond(HttpResponse(b'x' * 1000,
+                                          content_type='image/png'))
+        self.assertFalse(image.has_header('Content-Encoding'))
+        refused = self.respond(HttpResponse(self.html), 'gzip;q=0')
+        self.assertFalse(refused.has_header('Content-Encoding'))
+        self.assertEqual(refused['Vary'], 'Accept-Encoding')
+
+    def test_streaming_compressed_incrementally(self):
+        chunks = [self.html.encode()] * 3
+        response = self.respond(StreamingHttpResponse(iter(chunks)), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        parts = list(response.streaming_content)
+        self.assertGreater(len(parts), 1)
+        self.assertEqual(gzip.decompress(b''.join(parts)), b''.join(chunks))
+        self.assertLess(len(b''.join(parts)), len(b''.join(chunks)) / 10)
+
+
+class SQLiteTuningTestClass(TestCase):
+    def test_connection_pragmas(self):
+        """PRAGMA применяются к каждому соединению Django."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_benchmark_reports_profiles(self):
+        out = StringIO()
+        call_command('db_benchmark', duration=0.2, comments=100,
+                     readers=2, writers=1, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[1:]],
+                         ['default', 'tuned'])
@@ -0,0 +1,308 @@
+"""Версионированный JSON API для лент, постов и комментариев.
+
+Только чтение. Списки листаются по ключу (created, id): ответ содержит
+курсор next, следующий запрос передает его в ?after=. Клиент, который
+уже видел ленту, опрашивает ее с ?since_id=<самый новый id> и получает
+только новые записи.
+
+Строки читаются через values_list() только с нужными колонками и
+сериализуются прямо из кортежей, без создания экземпляров моделей.
+"""
+import json
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from django.core.files.storage import default_storage
+from django.core.paginator import InvalidPage
+from django.http import Http404, HttpResponse, JsonResponse
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from django.views import View
+
+from core.paginators import encode_token, filter_after
+from . import fragments, timeline
+from .models import Comment, Group, Post, TimelineEntry, User
+from .views import FragmentValidatorsMixin
+
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+CONTENT_TYPE = 'application/json; charset=utf-8'
+
+POST_FIELDS = (
+    'id', 'text', 'created', 'author_id', 'author__username', 'group__slug',
+    'image', 'image_width', 'image_height', 'comments_count',
+)
+COMMENT_FIELDS = (
+    'id', 'post_id', 'text', 'created', 'author_id', 'author__username',
+)
+
+
+def _created(value) -> str:
+    return value.isoformat()
+
+
+def serialize_post(row: Tuple) -> Dict:
+    (pk, text, created, author_id, username, group,
+     image, width, height, comments_count) = row
+    return {
+        'id': pk,
+        'text': text,
+        'created': _created(created),
+        'author': {'id': author_id, 'username': username},
+        'group': group,
+        'image': {
+            'url': default_storage.url(image),
+            'width': width,
+            'height': height,
+        } if image else None,
+        'comments_count': comments_count,
+    }
+
+
+def serialize_comment(row: Tuple) -> Dict:
+    pk, post_id, text, created, author_id, username = row
+    return {
+        'id': pk,
+        'post': post_id,
+        'text': text,
+        'created': _created(created),
+        'author': {'id': author_id, 'username': username},
+    }
+
+
+def _dumps(payload: Dict) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+
+class BadRequest(Exception):
+    """Некорректный параметр запроса, сообщение - для клиента."""
+
+
+def error(status: int, detail: str) -> JsonResponse:
+    return JsonResponse(
+        {'detail': detail},
+        status=status,
+        json_dumps_params={'ensure_ascii': False}
+    )
+
+
+class APIView(FragmentValidatorsMixin, View):
+    """Ответы в JSON, ошибки тоже в JSON.
+
+    ETag и Last-Modified считаются по поколениям фрагментов, если
+    наследник вернул их из get_fragment_scopes().
+    """
+    http_method_names = ('get', 'head', 'options')
+
+    def get_fragment_scopes(self):
+        return ()
+
+    def get_etag(self):
+        return super().get_etag() if self.get_fragment_scopes() else None
+
+    def get_last_modified(self):
+        if not self.get_fragment_scopes():
+            return None
+        return super().get_last_modified()
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except BadRequest as e:
+            return error(400, str(e))
+        except Http404 as e:
+            return error(404, str(e) or 'Не найдено')
+
+    def render(self, payload: Dict) -> HttpResponse:
+        return HttpResponse(_dumps(payload), content_type=CONTENT_TYPE)
+
+
+class FeedAPIView(APIView):
+    """Страница списка: results, next и since_id для следующего опроса.
+
+    Наследник задает queryset с колонками fields, функцию serialize
+    для одной строки и, при необходимости, ordering ключа.
+    """
+    fields: Sequence[str] = POST_FIELDS
+    serialize: Callable[[Tuple], Dict] = staticmethod(serialize_post)
+    ordering: Tuple[str, str] = ('-created', '-id')
+    since_model = Post
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get_limit(self) -> int:
+        try:
+            limit = int(self.request.GET.get('limit', API_PAGE_SIZE))
+        except ValueError:
+            raise BadRequest('Некорректный limit')
+        return max(1, min(limit, API_MAX_PAGE_SIZE))
+
+    def get_since_id(self) -> Optional[int]:
+        since_id = self.request.GET.get('since_id')
+        if since_id is None:
+            return None
+        try:
+            return int(since_id)
+        except ValueError:
+            raise BadRequest('Некорректный since_id')
+
+    def filter_since(self, queryset, since_id: int):
+        """Записи новее since_id.
+
+        Условие по дате записи since_id, а не только по id: иначе SQLite
+        выбирает диапазон первичного ключа и сортирует результат во
+        временном B-дереве вместо чтения по индексу ленты. since_id -
+        id объекта since_model; если его удалили, остается условие по id.
+        """
+        created_field, pk_field = (
+            field.lstrip('-') for field in self.ordering
+        )
+        created = self.since_model.objects.filter(pk=since_id).values_list(
+            'created', flat=True
+        ).first()
+        if created is None:
+            return queryset.filter(**{f'{pk_field}__gt': since_id})
+        return queryset.filter(
+            Q(**{f'{created_field}__gt': created})
+            | Q(**{created_field: created, f'{pk_field}__gt': since_id})
+        )
+
+    def get(self, request, *args, **kwargs):
+        created_field, pk_field = (
+            field.lstrip('-') for field in self.ordering
+        )
+        queryset = self.get_queryset().order_by(*self.ordering)
+        since_id = self.get_since_id()
+        if since_id is not None:
+            queryset = self.filter_since(queryset, since_id)
+        after = request.GET.get('after')
+        if after is not None:
+            try:
+                queryset = filter_after(queryset, after, self.ordering)
+            except InvalidPage as e:
+                raise BadRequest(str(e))
+
+        fields = tuple(self.fields)
+        created_index = fields.index(created_field)
+        pk_index = fields.index(pk_field)
+        limit = self.get_limit()
+        rows = list(queryset.values_list(*fields)[:limit + 1])
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_token(
+                last[created_index].isoformat(), last[pk_index]
+            )
+        newest = rows[0][pk_index] if rows else since_id
+        if after is not None:
+            newest = since_id
+        return self.render({
+            'results': [self.serialize(row) for row in rows],
+            'next': next_cursor,
+            'since_id': newest,
+        })
+
+
+class PostListAPI(FeedAPIView):
+    def get_fragment_scopes(self):
+        return fragments.ALL_POSTS, fragments.ALL_GROUPS
+
+    def get_queryset(self):
+        return Post.objects.all()
+
+
+class GroupPostsAPI(FeedAPIView):
+    group = None
+
+    def get_group(self):
+        if self.group is None:
+            self.group = get_object_or_404(
+                Group.objects.only('id'), slug=self.kwargs['slug']
+            )
+        return self.group
+
+    def get_fragment_scopes(self):
+        return (
+            fragments.ALL_GROUPS,
+            fragments.group_scope(self.get_group().id)
+        )
+
+    def get_queryset(self):
+        return Post.objects.filter(group=self.get_group())
+
+
+class ProfilePostsAPI(FeedAPIView):
+    author = None
+
+    def get_author(self):
+        if self.author is None:
+            self.author = get_object_or_404(
+                User.objects.only('id'), username=self.kwargs['username']
+            )
+        return self.author
+
+    def get_fragment_scopes(self):
+        return (
+            fragments.ALL_GROUPS,
+            fragments.author_scope(self.get_author().id)
+        )
+
+    def get_queryset(self):
+        return Post.objects.filter(author=self.get_author())
+
+
+class FollowFeedAPI(FeedAPIView):
+    """Лента подписок текущего пользователя из материализованной ленты.
+
+    since_id сравнивается с id поста: старые посты автора, на которого
+    только что подписались, в дельту не попадают, их видно при полной
+    перезагрузке ленты.
+    """
+    fields = (
+        'post_id', 'post__text', 'created', 'author_id', 'author__username',
+        'post__group__slug', 'post__image', 'post__image_width',
+        'post__image_height', 'post__comments_count',
+    )
+    ordering = ('-created', '-post_id')
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error(401, 'Требуется авторизация')
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_queryset(self):
+        timeline.pull(self.request.user.id)
+        return TimelineEntry.objects.filter(user_id=self.request.user.id)
+
+
+class PostDetailAPI(APIView):
+    def get_fragment_scopes(self):
+        return (
+            fragments.ALL_GROUPS,
+            fragments.post_scope(self.kwargs['post_id'])
+        )
+
+    def get(self, request, post_id):
+        row = Post.objects.filter(id=post_id).values_list(
+            *POST_FIELDS
+        ).first()
+        if row is None:
+            raise Http404('Пост не найден')
+        return self.render(serialize_post(row))
+
+
+class CommentListAPI(FeedAPIView):
+    fields = COMMENT_FIELDS
+    since_model = Comment
+    serialize = staticmethod(serialize_comment)
+
+    def get_fragment_scopes(self):
+        return (fragments.post_scope(self.kwargs['post_id']),)
+
+    def get(self, request, *args, **kwargs):
+        get_object_or_404(Post.objects.only('id'), id=kwargs['post_id'])
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return Comment.objects.filter(post_id=self.kwargs['post_id'])
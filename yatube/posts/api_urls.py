@@ -0,0 +1,37 @@
+from django.urls import path
+
+from core import querybudget
+from . import api
+
+app_name = 'api_v1'
+
+urlpatterns = [
+    path('posts/', api.PostListAPI.as_view(), name='posts'),
+    path('posts/<int:post_id>/', api.PostDetailAPI.as_view(), name='post'),
+    path(
+        'posts/<int:post_id>/comments/',
+        api.CommentListAPI.as_view(),
+        name='comments'
+    ),
+    path(
+        'groups/<slug:slug>/posts/',
+        api.GroupPostsAPI.as_view(),
+        name='group_posts'
+    ),
+    path(
+        'users/<str:username>/posts/',
+        api.ProfilePostsAPI.as_view(),
+        name='profile_posts'
+    ),
+    path('follow/', api.FollowFeedAPI.as_view(), name='follow'),
+]
+
+
+querybudget.declare(app_name, {
+    'posts': 4,
+    'post': 3,
+    'comments': 5,
+    'group_posts': 5,
+    'profile_posts': 5,
+    'follow': 7,
+})
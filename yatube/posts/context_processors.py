@@ -0,0 +1,19 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import follows
+
+
+def following(request):
+    """following_ids - id авторов, на которых подписан пользователь.
+
+    Множество читается при первом обращении в шаблоне, например
+    {% if post.author_id in following_ids %}.
+    """
+    user = request.user
+
+    def author_ids():
+        if not user.is_authenticated:
+            return frozenset()
+        return follows.following_ids(user.pk)
+
+    return {'following_ids': SimpleLazyObject(author_ids)}
@@ -0,0 +1,95 @@
+"""Денормализованные счетчики постов, подписок и комментариев.
+
+Счетчики меняются атомарно через F-выражения при создании и удалении
+Post, Comment и Follow, поэтому страницам не нужен COUNT(*).
+"""
+from typing import Dict
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, UserCounters
+
+User = get_user_model()
+
+
+def _deltas(**deltas):
+    return {
+        field: F(field) + delta if delta > 0 else Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    }
+
+
+def bump_user(user_id: int, **deltas) -> None:
+    """Меняет счетчики пользователя, например bump_user(1, posts_count=1).
+
+    Строка создается только при увеличении: при удалении пользователя
+    его счетчики могут быть уже удалены каскадом.
+    """
+    updates = _deltas(**deltas)
+    updated = UserCounters.objects.filter(user_id=user_id).update(**updates)
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        UserCounters.objects.get_or_create(user_id=user_id)
+        UserCounters.objects.filter(user_id=user_id).update(**updates)
+
+
+def bump_post(post_id: int, **deltas) -> None:
+    Post.objects.filter(pk=post_id).update(**_deltas(**deltas))
+
+
+def for_user(user) -> UserCounters:
+    """Счетчики пользователя, строка создается при первом обращении."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return UserCounters.objects.get_or_create(user=user)[0]
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def _repair(queryset, field, actual) -> int:
+    drifted = list(
+        queryset.annotate(actual=actual)
+        .exclude(**{field: F('actual')})
+        .values_list('pk', flat=True)
+    )
+    if drifted:
+        queryset.filter(pk__in=drifted).update(**{field: actual})
+    return len(drifted)
+
+
+def reconcile() -> Dict[str, int]:
+    """Пересчитывает все счетчики, возвращает число исправленных строк."""
+    UserCounters.objects.bulk_create(
+        (UserCounters(user_id=pk) for pk in User.objects.filter(
+            counters__isnull=True
+        ).values_list('pk', flat=True).iterator()),
+        batch_size=500,
+        ignore_conflicts=True
+    )
+    user_counters = {
+        'posts_count': _count(
+            Post.objects.filter(author=OuterRef('user')), 'author'),
+        'followers_count': _count(
+            Follow.objects.filter(author=OuterRef('user')), 'author'),
+        'following_count': _count(
+            Follow.objects.filter(user=OuterRef('user')), 'user'),
+    }
+    fixed = {
+        field: _repair(UserCounters.objects.all(), field, actual)
+        for field, actual in user_counters.items()
+    }
+    fixed['comments_count'] = _repair(
+        Post.objects.all(),
+        'comments_count',
+        _count(Comment.objects.filter(post=OuterRef('pk')), 'post')
+    )
+    return fixed
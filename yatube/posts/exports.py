@@ -0,0 +1,159 @@
+"""Потоковая выгрузка постов, комментариев и подписок.
+
+Строки читаются по ключу (created, id) или по id порциями фиксированного
+размера через values_list(), поэтому память не зависит от объема
+таблицы, а каждая порция - короткий запрос по индексу без OFFSET.
+
+Водяной знак - позиция последней выгруженной строки. Следующая выгрузка
+с этим знаком отдает только более новые строки. У Follow нет даты
+создания, его водяной знак - только id.
+"""
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+from datetime import datetime
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Post
+
+CHUNK_SIZE = 5000
+FORMATS = ('ndjson', 'csv')
+COMPRESSORS = {
+    'gzip': ('.gz', gzip.open),
+    'bz2': ('.bz2', bz2.open),
+    'xz': ('.xz', lzma.open),
+}
+
+
+class Export(NamedTuple):
+    model: type
+    fields: Tuple[str, ...]
+    created: Optional[str] = 'created'
+
+
+EXPORTS = {
+    'posts': Export(Post, (
+        'id', 'created', 'author_id', 'group_id', 'text', 'image',
+        'image_width', 'image_height',
+    )),
+    'comments': Export(Comment, (
+        'id', 'created', 'post_id', 'author_id', 'text',
+    )),
+    'follows': Export(Follow, ('id', 'user_id', 'author_id'), created=None),
+}
+
+
+def encode_watermark(created: Optional[datetime], pk: int) -> Dict:
+    return {
+        'created': created.isoformat() if created else None,
+        'id': pk,
+    }
+
+
+def decode_watermark(watermark: Optional[Dict]):
+    """(created, id) из сохраненного знака; (None, 0) - с самого начала."""
+    if not watermark:
+        return None, 0
+    created = watermark.get('created')
+    return (parse_datetime(created) if created else None), watermark['id']
+
+
+def rows(export: Export, watermark: Optional[Dict] = None,
+         until: Optional[datetime] = None,
+         chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple]:
+    """Строки export новее watermark, старые вперед, порциями."""
+    created_field = export.created
+    created, pk = decode_watermark(watermark)
+    queryset = export.model.objects.all()
+    if created_field is None:
+        ordering = ('id',)
+    else:
+        ordering = (created_field, 'id')
+        if until is not None:
+            queryset = queryset.filter(**{f'{created_field}__lte': until})
+    queryset = queryset.order_by(*ordering)
+    fields = export.fields
+    created_index = fields.index(created_field) if created_field else None
+    pk_index = fields.index('id')
+    while True:
+        chunk = queryset
+        if created is not None:
+            # Отдельная граница created >= дает SQLite диапазон индекса.
+            chunk = chunk.filter(
+                Q(**{f'{created_field}__gt': created}) | Q(id__gt=pk),
+                **{f'{created_field}__gte': created}
+            )
+        elif created_field is None:
+            chunk = chunk.filter(id__gt=pk)
+        batch = list(chunk.values_list(*fields)[:chunk_size])
+        yield from batch
+        if len(batch) < chunk_size:
+            return
+        last = batch[-1]
+        pk = last[pk_index]
+        if created_index is not None:
+            created = last[created_index]
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class NDJSONWriter:
+    def __init__(self, file, fields):
+        self.file = file
+        self.fields = fields
+
+    def write(self, row):
+        self.file.write(json.dumps(
+            dict(zip(self.fields, map(_value, row))),
+            ensure_ascii=False
+        ))
+        self.file.write('\n')
+
+
+class CSVWriter:
+    def __init__(self, file, fields):
+        self.writer = csv.writer(file)
+        self.writer.writerow(fields)
+
+    def write(self, row):
+        self.writer.writerow([
+            '' if value is None else _value(value) for value in row
+        ])
+
+
+WRITERS = {'ndjson': NDJSONWriter, 'csv': CSVWriter}
+
+
+def open_output(path: str, compress: Optional[str] = None):
+    """Текстовый файл для записи, при compress - со сжатием на лету."""
+    if compress is None:
+        return open(path, 'w', encoding='utf-8', newline='')
+    _, opener = COMPRESSORS[compress]
+    return io.TextIOWrapper(
+        opener(path, 'wb'), encoding='utf-8', newline=''
+    )
+
+
+def write(export: Export, file, fmt: str, **kwargs) -> Tuple[int, Dict]:
+    """Пишет строки в file, возвращает их число и новый водяной знак."""
+    writer = WRITERS[fmt](file, export.fields)
+    count, last = 0, None
+    for row in rows(export, **kwargs):
+        writer.write(row)
+        count += 1
+        last = row
+    if last is None:
+        return 0, kwargs.get('watermark')
+    fields = export.fields
+    created = last[fields.index(export.created)] if export.created else None
+    return count, encode_watermark(created, last[fields.index('id')])
@@ -0,0 +1,37 @@
+"""Кэш графа подписок: множество id авторов, на которых подписан
+пользователь.
+
+Множество читается одним запросом и живет в кэше до подписки или
+отписки, поэтому проверка "подписан ли я на X" для любого числа авторов
+на странице идет в памяти. Сбрасывается сигналами Follow.
+"""
+from django.core.cache import cache
+
+from .models import Follow
+
+FOLLOWING_KEY = 'follows:following:{user_id}'
+FOLLOWING_TTL = 60 * 60 * 24
+
+
+def following_ids(user_id: int) -> frozenset:
+    """id авторов, на которых подписан пользователь."""
+    key = FOLLOWING_KEY.format(user_id=user_id)
+    author_ids = cache.get(key)
+    if author_ids is None:
+        author_ids = frozenset(
+            Follow.objects.filter(user_id=user_id).values_list(
+                'author_id', flat=True
+            )
+        )
+        cache.set(key, author_ids, FOLLOWING_TTL)
+    return author_ids
+
+
+def is_following(user, author_id: int) -> bool:
+    if not user.is_authenticated:
+        return False
+    return author_id in following_ids(user.pk)
+
+
+def invalidate(user_id: int) -> None:
+    cache.delete(FOLLOWING_KEY.format(user_id=user_id))
@@ -1,5 +1,6 @@
 from django import forms
 
+from . import images
 from .models import Post, Comment
 
 
@@ -8,6 +9,29 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ingested = None
+
+    def clean_image(self):
+        """Новая загрузка проходит images.ingest и заменяется JPEG."""
+        image = self.cleaned_data.get('image')
+        if 'image' not in self.changed_data or not image:
+            return image
+        self.ingested = images.ingest(image)
+        return self.ingested.content
+
+    def save(self, commit=True):
+        if self.ingested is not None:
+            self.instance.image_width = self.ingested.width
+            self.instance.image_height = self.ingested.height
+        elif not self.instance.image:
+            self.instance.image_width = self.instance.image_height = None
+        post = super().save(commit)
+        if commit and self.ingested is not None:
+            images.save_variants(post.image.name, self.ingested.variants)
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,86 @@
+"""Версионированный кэш фрагментов страниц.
+
+Ключ фрагмента собирается из страницы или курсора, аудитории и поколений
+данных, которые показывает фрагмент. Запись Post, Comment или Group
+увеличивает поколение, старые ключи перестают читаться и доживают свой
+TTL, поэтому TTL может быть долгим, а изменения видны сразу.
+"""
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from django.core.cache import cache
+
+FRAGMENT_TTL = 60 * 60 * 24
+GENERATION_KEY = 'fragments:gen:{scope}'
+MODIFIED_KEY = 'fragments:modified:{scope}'
+ALL_POSTS = 'posts'
+ALL_GROUPS = 'groups'
+
+
+def author_scope(author_id: int) -> str:
+    return f'author:{author_id}'
+
+
+def group_scope(group_id: int) -> str:
+    return f'group:{group_id}'
+
+
+def post_scope(post_id: int) -> str:
+    return f'post:{post_id}'
+
+
+def _fresh_generation() -> int:
+    """Новое поколение после вытеснения ключа не совпадет со старыми."""
+    return time.time_ns() // 1000
+
+
+def bump(*scopes: str) -> None:
+    """Инвалидирует все фрагменты, зависящие от scopes."""
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope=scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_generation(), None)
+    cache.set_many(
+        {MODIFIED_KEY.format(scope=scope): time.time() for scope in scopes},
+        None
+    )
+
+
+def generations(scopes: Iterable[str]) -> str:
+    """Текущие поколения scopes одной строкой для ключа фрагмента."""
+    keys = {GENERATION_KEY.format(scope=scope): scope for scope in scopes}
+    values = cache.get_many(keys)
+    for key in keys.keys() - values.keys():
+        cache.add(key, _fresh_generation(), None)
+        cache.add(MODIFIED_KEY.format(scope=keys[key]), time.time(), None)
+        values[key] = cache.get(key)
+    return ','.join(f'{keys[key]}={values[key]}' for key in sorted(keys))
+
+
+def last_modified(scopes: Iterable[str]) -> Optional[float]:
+    """Время последнего изменения scopes или None, если оно неизвестно."""
+    keys = [MODIFIED_KEY.format(scope=scope) for scope in scopes]
+    values = cache.get_many(keys)
+    if len(values) < len(keys):
+        return None
+    return max(values.values())
+
+
+def fragment_context(request, *scopes: str) -> Dict[str, Any]:
+    """fragment_ttl и fragment_key для {% cache %} в шаблоне.
+
+    Ключ различает страницу или курсор, анонимов и авторизованных
+    пользователей и поколения переданных scopes.
+    """
+    params = request.GET
+    if 'after' in params:
+        page = f"a{params['after']}"
+    else:
+        page = f"p{params.get('page', 1)}"
+    audience = 'auth' if request.user.is_authenticated else 'anon'
+    return {
+        'fragment_ttl': FRAGMENT_TTL,
+        'fragment_key': ':'.join((page, audience, generations(scopes))),
+    }
@@ -0,0 +1,122 @@
+"""Прием картинок постов.
+
+Загруженный файл проверяется на размер и формат, поворачивается по EXIF,
+теряет метаданные и перекодируется в JPEG не шире MAX_WIDTH. Рядом с
+оригиналом сохраняются уменьшенные копии шириной VARIANT_WIDTHS, из
+которых шаблоны собирают srcset.
+"""
+import os
+from io import BytesIO
+from typing import Dict, List, NamedTuple, Tuple
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+MAX_PIXELS = 40_000_000
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+MAX_WIDTH = 1920
+VARIANT_WIDTHS = (480, 960, 1440)
+JPEG_QUALITY = 82
+BACKGROUND = (255, 255, 255)
+
+
+class IngestedImage(NamedTuple):
+    content: ContentFile
+    width: int
+    height: int
+    variants: Dict[int, bytes]
+
+
+def _open(upload) -> Image.Image:
+    if upload.size > MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.',
+            params={'limit': MAX_UPLOAD_SIZE // (1024 * 1024)}
+        )
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+        if image.format not in ALLOWED_FORMATS:
+            raise ValidationError('Поддерживаются JPEG, PNG, GIF и WebP.')
+        if image.width * image.height > MAX_PIXELS:
+            raise ValidationError('Слишком большое разрешение картинки.')
+        image.load()
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Файл поврежден или не является картинкой.')
+    return image
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """RGB без прозрачности: JPEG не хранит альфа-канал."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, BACKGROUND)
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _resized(image: Image.Image, width: int) -> Image.Image:
+    if image.width <= width:
+        return image
+    height = round(image.height * width / image.width)
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def _encode(image: Image.Image) -> bytes:
+    """JPEG без EXIF и ICC: метаданные в выходной файл не передаются."""
+    buffer = BytesIO()
+    image.save(
+        buffer, 'JPEG',
+        quality=JPEG_QUALITY, optimize=True, progressive=True
+    )
+    return buffer.getvalue()
+
+
+def ingest(upload) -> IngestedImage:
+    """Проверяет и перекодирует загрузку; ValidationError при отказе."""
+    image = _resized(_flatten(_open(upload)), MAX_WIDTH)
+    name = os.path.splitext(os.path.basename(upload.name))[0] + '.jpg'
+    variants = {
+        width: _encode(_resized(image, width))
+        for width in VARIANT_WIDTHS
+        if width < image.width
+    }
+    return IngestedImage(
+        ContentFile(_encode(image), name=name),
+        image.width,
+        image.height,
+        variants
+    )
+
+
+def variant_name(name: str, width: int) -> str:
+    root, ext = os.path.splitext(name)
+    return f'{root}_{width}w{ext}'
+
+
+def save_variants(name: str, variants: Dict[int, bytes]) -> None:
+    """Сохраняет копии рядом с оригиналом под предсказуемыми именами."""
+    for width, data in variants.items():
+        variant = variant_name(name, width)
+        if default_storage.exists(variant):
+            default_storage.delete(variant)
+        default_storage.save(variant, ContentFile(data))
+
+
+def srcset(image, width: int) -> List[Tuple[str, int]]:
+    """Пары (url, ширина) для атрибута srcset, от меньшей к большей."""
+    if not image or not width:
+        return []
+    candidates = [
+        (default_storage.url(variant_name(image.name, variant_width)),
+         variant_width)
+        for variant_width in VARIANT_WIDTHS
+        if variant_width < width
+    ]
+    candidates.append((image.url, width))
+    return candidates
@@ -0,0 +1,417 @@
+"""Массовая загрузка постов и комментариев из NDJSON или CSV.
+
+Файл читается потоком, строки превращаются в объекты порциями: авторы,
+группы и посты (и по имени, и по id) ищутся через LookupCache одним
+запросом на порцию, а пишутся многострочными INSERT ... RETURNING
+внутри транзакции на порцию.
+
+Сигналы при bulk_create не срабатывают, поэтому производные данные
+(счетчики, поисковый индекс, ленты, поколения фрагментов) Importer
+обновляет сам: после каждой транзакции или, с defer=True, один раз в
+конце. В отложенном режиме вторичные индексы таблицы на время загрузки
+удаляются и строятся заново: сортировка при создании индекса дешевле,
+чем поддержка B-дерева на каждую вставку.
+"""
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import AutoField
+from django.db.models.sql import InsertQuery
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, fragments, search, timeline
+from .models import Comment, Group, Post, User
+
+BATCH_SIZE = 1000
+TRANSACTION_SIZE = 10000
+LOOKUP_CHUNK = 500
+DECOMPRESSORS = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open,
+}
+
+
+def batches(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def historical_created(*models):
+    """bulk_create с auto_now_add перезаписал бы даты текущим временем."""
+    fields = [model._meta.get_field('created') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+@contextmanager
+def deferred_indexes(model):
+    """Удаляет Meta.indexes модели на время блока и строит их заново.
+
+    Редактор схемы используется без with: для DROP/CREATE INDEX не нужно
+    пересоздавать таблицу, поэтому блок работает и внутри транзакции.
+    """
+    indexes = list(model._meta.indexes)
+    editor = connection.schema_editor()
+    for index in indexes:
+        editor.remove_index(model, index)
+    try:
+        yield
+    finally:
+        for index in indexes:
+            editor.add_index(model, index)
+
+
+def insert_returning(model, objects: List, columns: Iterable[str]) -> List:
+    """Вставляет objects и возвращает columns вставленных строк.
+
+    Django 2.2 не проставляет pk после bulk_create на SQLite, поэтому
+    id и нужные поля берутся из INSERT ... RETURNING (SQLite 3.35+).
+    Порядок строк результата не совпадает с порядком objects.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not isinstance(field, AutoField)
+    ]
+    batch_size = connection.ops.bulk_batch_size(fields, objects)
+    returning = ', '.join(
+        connection.ops.quote_name(
+            model._meta.pk.column if column == 'pk'
+            else model._meta.get_field(column).column
+        )
+        for column in columns
+    )
+    rows = []
+    with connection.cursor() as cursor:
+        for batch in batches(objects, batch_size):
+            query = InsertQuery(model)
+            query.insert_values(fields, batch)
+            compiler = query.get_compiler(connection=connection)
+            for sql, params in compiler.as_sql():
+                cursor.execute(f'{sql} RETURNING {returning}', params)
+                rows.extend(cursor.fetchall())
+    return rows
+
+
+def open_input(path: str):
+    """Текстовый поток из файла, '-' - stdin; сжатие по расширению."""
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    for extension, opener in DECOMPRESSORS.items():
+        if path.endswith(extension):
+            return opener(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_rows(file, fmt: str,
+              skipped: Optional[Counter] = None) -> Iterator[Dict]:
+    """Строки файла как словари.
+
+    Строка NDJSON, которая не разбирается в объект JSON, пропускается и
+    считается в skipped вместе со своим номером.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            row = None
+        if isinstance(row, dict):
+            yield row
+        elif skipped is not None:
+            skipped[f'некорректный JSON в строке {number}'] += 1
+
+
+class RowError(ValueError):
+    """Строку нельзя загрузить, сообщение - причина."""
+
+
+class LookupCache:
+    """Значение поля -> id, недостающие значения - одним запросом.
+
+    Промахи тоже запоминаются, чтобы неизвестный автор не искался на
+    каждой строке.
+    """
+
+    def __init__(self, queryset, field: str):
+        self.queryset = queryset
+        self.field = field
+        self.ids = {}
+
+    def prefetch(self, keys: Iterable) -> None:
+        missing = sorted({key for key in keys if key not in self.ids})
+        for chunk in batches(missing, LOOKUP_CHUNK):
+            found = dict(
+                self.queryset.filter(**{f'{self.field}__in': chunk})
+                .values_list(self.field, 'pk')
+            )
+            self.ids.update({key: found.get(key) for key in chunk})
+
+    def get(self, key) -> Optional[int]:
+        return self.ids.get(key)
+
+
+def _value(row: Dict, key: str):
+    """Пустая строка в CSV означает отсутствие значения."""
+    value = row.get(key)
+    return None if value == '' else value
+
+
+def _created(row: Dict, default: datetime) -> datetime:
+    value = _value(row, 'created')
+    if value is None:
+        return default
+    created = parse_datetime(value)
+    if created is None:
+        raise RowError('некорректная дата')
+    if timezone.is_naive(created):
+        created = timezone.make_aware(created, timezone.utc)
+    return created
+
+
+def _int(value, name: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'некорректный {name}')
+
+
+class Importer:
+    """Загрузка строк одного вида: 'posts' или 'comments'.
+
+    Автора можно указать как author (username) или author_id, группу -
+    как group (slug) или group_id, пост комментария - как post или
+    post_id. Формат выгрузки команды export подходит как есть.
+    """
+    models = {'posts': Post, 'comments': Comment}
+    # Поле владельца строки для счетчиков
+    owners = {'posts': 'author', 'comments': 'post'}
+
+    def __init__(self, kind: str, batch_size: int = BATCH_SIZE,
+                 create_users: bool = False, defer: bool = False):
+        self.kind = kind
+        self.model = self.models[kind]
+        self.batch_size = batch_size
+        self.create_users = create_users
+        self.defer = defer
+        self.authors = LookupCache(User.objects.all(), 'username')
+        self.author_ids = LookupCache(User.objects.all(), 'pk')
+        self.groups = LookupCache(Group.objects.all(), 'slug')
+        self.group_ids = LookupCache(Group.objects.all(), 'pk')
+        self.posts = LookupCache(Post.objects.all(), 'pk')
+        self.created = 0
+        self.skipped = Counter()
+        self.scopes = set()
+        self.now = timezone.now()
+
+    def load(self, rows: Iterable[Dict],
+             transaction_size: int = TRANSACTION_SIZE,
+             progress=None) -> int:
+        """Загружает строки, progress(created, skipped) после порции."""
+        with historical_created(self.model), self.maybe_deferred():
+            for chunk in batches(rows, transaction_size):
+                objects = self.build(chunk)
+                if objects:
+                    self.write(objects)
+                if progress is not None:
+                    progress(self.created, sum(self.skipped.values()))
+        if self.defer:
+            self.rebuild_derived()
+        fragments.bump(*sorted(self.scopes))
+        return self.created
+
+    @contextmanager
+    def maybe_deferred(self):
+        if not self.defer:
+            yield
+            return
+        with deferred_indexes(self.model):
+            yield
+
+    @staticmethod
+    def collect_ids(rows: List[Dict], read) -> set:
+        """id из строк через read(row); некорректные пропускаются здесь
+        и отбрасываются при разборе строки."""
+        ids = set()
+        for row in rows:
+            try:
+                ids.add(read(row))
+            except RowError:
+                pass
+        return ids - {None}
+
+    def prefetch(self, rows: List[Dict]) -> None:
+        self.author_ids.prefetch(
+            self.collect_ids(
+                rows, lambda row: self.explicit_id(row, 'author_id')
+            )
+        )
+        usernames = {_value(row, 'author') for row in rows} - {None}
+        self.authors.prefetch(usernames)
+        if self.create_users:
+            missing = sorted(
+                name for name in usernames if self.authors.get(name) is None
+            )
+            if missing:
+                password = make_password(None)
+                User.objects.bulk_create(
+                    (User(username=name, password=password)
+                     for name in missing),
+                    batch_size=self.batch_size
+                )
+                for name in missing:
+                    del self.authors.ids[name]
+                self.authors.prefetch(missing)
+        if self.kind == 'posts':
+            self.groups.prefetch(
+                {_value(row, 'group') for row in rows} - {None}
+            )
+            self.group_ids.prefetch(
+                self.collect_ids(
+                    rows, lambda row: self.explicit_id(row, 'group_id')
+                )
+            )
+        else:
+            self.posts.prefetch(self.collect_ids(rows, self.post_id))
+
+    @staticmethod
+    def explicit_id(row: Dict, key: str) -> Optional[int]:
+        value = _value(row, key)
+        return None if value is None else _int(value, key)
+
+    def post_id(self, row: Dict) -> int:
+        return _int(_value(row, 'post_id') or _value(row, 'post'), 'post')
+
+    def author_id(self, row: Dict) -> int:
+        author_id = self.explicit_id(row, 'author_id')
+        if author_id is not None:
+            author_id = self.author_ids.get(author_id)
+        else:
+            author_id = self.authors.get(_value(row, 'author'))
+        if author_id is None:
+            raise RowError('неизвестный автор')
+        return author_id
+
+    def group_id(self, row: Dict) -> Optional[int]:
+        group_id = self.explicit_id(row, 'group_id')
+        if group_id is not None:
+            group_id = self.group_ids.get(group_id)
+        elif _value(row, 'group') is not None:
+            group_id = self.groups.get(row['group'])
+        else:
+            return None
+        if group_id is None:
+            raise RowError('неизвестная группа')
+        return group_id
+
+    def build_post(self, row: Dict) -> Post:
+        post = Post(
+            author_id=self.author_id(row),
+            group_id=self.group_id(row),
+            text=_value(row, 'text'),
+            created=_created(row, self.now),
+            image=_value(row, 'image') or '',
+        )
+        for field in ('image_width', 'image_height'):
+            if _value(row, field) is not None:
+                setattr(post, field, _int(row[field], field))
+        return post
+
+    def build_comment(self, row: Dict) -> Comment:
+        post_id = self.post_id(row)
+        if self.posts.get(post_id) is None:
+            raise RowError('неизвестный пост')
+        return Comment(
+            post_id=post_id,
+            author_id=self.author_id(row),
+            text=_value(row, 'text'),
+            created=_created(row, self.now),
+        )
+
+    def build(self, rows: List[Dict]) -> List:
+        self.prefetch(rows)
+        build = self.build_post if self.kind == 'posts' else (
+            self.build_comment
+        )
+        objects = []
+        for row in rows:
+            try:
+                obj = build(row)
+                if not obj.text:
+                    raise RowError('пустой текст')
+            except RowError as e:
+                self.skipped[str(e)] += 1
+                continue
+            objects.append(obj)
+        return objects
+
+    def write(self, objects: List) -> None:
+        """Одна транзакция на порцию, внутри - пачки INSERT ... RETURNING."""
+        with transaction.atomic():
+            rows = insert_returning(
+                self.model, objects, ('pk', 'text', self.owners[self.kind])
+            )
+            if not self.defer:
+                self.update_derived(rows)
+        self.created += len(objects)
+        self.collect_scopes(objects)
+
+    def collect_scopes(self, objects: List) -> None:
+        if self.kind == 'comments':
+            self.scopes.update(
+                fragments.post_scope(obj.post_id) for obj in objects
+            )
+            return
+        self.scopes.add(fragments.ALL_POSTS)
+        for obj in objects:
+            self.scopes.add(fragments.author_scope(obj.author_id))
+            if obj.group_id is not None:
+                self.scopes.add(fragments.group_scope(obj.group_id))
+
+    def update_derived(self, rows: List) -> None:
+        """Счетчики, поиск и ленты для вставленных (pk, text, владелец)."""
+        model = self.model
+        if search.is_enabled():
+            search.index_rows(model, ((pk, text) for pk, text, _ in rows))
+        totals = Counter(owner_id for _, _, owner_id in rows)
+        if model is Post:
+            for author_id, total in totals.items():
+                counters.bump_user(author_id, posts_count=total)
+            timeline.fan_out_posts(sorted(pk for pk, _, _ in rows))
+        else:
+            for post_id, total in totals.items():
+                counters.bump_post(post_id, comments_count=total)
+
+    def rebuild_derived(self) -> None:
+        counters.reconcile()
+        if search.is_enabled():
+            search.rebuild(self.model)
+        if self.model is Post:
+            timeline.rebuild()
@@ -0,0 +1,188 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+from core import benchmark
+from posts.models import Group, Post, User
+
+DATASETS = {
+    'small': {'users': 200, 'posts': 2000, 'comments': 2000},
+    'medium': {'users': 2000, 'posts': 20000, 'comments': 20000},
+    'large': {'users': 10000, 'posts': 200000, 'comments': 200000},
+}
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'views.json')
+
+
+def private_caches(directory):
+    """Свой кэш в directory: cache.clear() не трогает кэш сайта."""
+    caches = {}
+    for alias, config in settings.CACHES.items():
+        location = os.path.join(directory, f'{alias}.sqlite3')
+        caches[alias] = {
+            **config,
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': location,
+        }
+    return caches
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет Index, GroupPosts, Profile, PostDetailView, PostComments, '
+        'FollowIndex и AddComment на засеянных наборах данных: '
+        'p50/p95/p99, запросы и байты. С --save сохраняет базовую линию, '
+        'без него сравнивает с ней и падает при регрессии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--datasets',
+            default='small,medium',
+            help=f'Наборы через запятую из: {", ".join(DATASETS)}.'
+        )
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кэш перед каждым запросом.'
+        )
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Допустимый рост p95, доля (0.25 = 25%%).'
+        )
+        parser.add_argument('--save', action='store_true')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        names = [name for name in options['datasets'].split(',') if name]
+        unknown = set(names) - set(DATASETS)
+        if unknown:
+            raise CommandError(f'Неизвестные наборы: {", ".join(unknown)}')
+
+        directory = tempfile.mkdtemp(prefix='benchmark-')
+        setup_test_environment()
+        try:
+            with override_settings(
+                MEDIA_ROOT=os.path.join(directory, 'media'),
+                CACHES=private_caches(directory),
+                THUMBNAIL_WORKERS=0,
+            ):
+                results = {
+                    name: self.run_dataset(name, options) for name in names
+                }
+        finally:
+            teardown_test_environment()
+            shutil.rmtree(directory, ignore_errors=True)
+
+        if options['save']:
+            baseline = benchmark.load(options['baseline'])
+            baseline.update(results)
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            benchmark.save(options['baseline'], baseline)
+            self.stdout.write(f'Базовая линия: {options["baseline"]}')
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(
+                f'Базовой линии {options["baseline"]} нет, сравнивать не с '
+                f'чем. Сохраните ее: benchmark_views --save'
+            )
+            return
+        regressions = benchmark.compare(
+            results, benchmark.load(options['baseline']), options['tolerance']
+        )
+        if regressions:
+            raise CommandError('Регрессии:\n' + '\n'.join(regressions))
+
+    def run_dataset(self, name, options):
+        """Отдельная тестовая база на каждый набор данных."""
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            call_command(
+                'seed',
+                seed=options['seed'],
+                until='2024-01-01',
+                images=3,
+                stdout=StringIO(),
+                **DATASETS[name]
+            )
+            cache.clear()
+            results = {}
+            self.stdout.write(
+                f'\n{name}: {"view":<14} {"p50":>8} {"p95":>8} {"p99":>8} '
+                f'{"sql":>5} {"байт":>8}'
+            )
+            for view, request in self.requests().items():
+                def run():
+                    if options['cold']:
+                        cache.clear()
+                    return request()
+
+                result = benchmark.measure(
+                    run, options['requests'], options['warmup']
+                )
+                results[view] = result
+                self.stdout.write(
+                    f'{"":<{len(name) + 1}} {view:<14} '
+                    f'{result["p50_ms"]:>8.2f} {result["p95_ms"]:>8.2f} '
+                    f'{result["p99_ms"]:>8.2f} {result["queries"]:>5} '
+                    f'{result["bytes"]:>8}'
+                )
+            return results
+        finally:
+            cache.clear()
+            teardown_databases(old_config, verbosity=0)
+
+    def requests(self):
+        """Самые тяжелые страницы набора: крупная группа, активный автор,
+        обсуждаемый пост, читатель с наибольшим числом подписок.
+        """
+        group = Group.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').first()
+        author = User.objects.order_by('-counters__posts_count').first()
+        post = Post.objects.order_by('-comments_count').first()
+        reader = User.objects.order_by('-counters__following_count').first()
+
+        guest = Client()
+        member = Client()
+        member.force_login(reader)
+        comment_url = reverse('posts:add_comment', args=(post.id,))
+        return {
+            'index': lambda: guest.get(reverse('posts:index')),
+            'group_posts': lambda: guest.get(
+                reverse('posts:group_posts', args=(group.slug,))
+            ),
+            'profile': lambda: guest.get(
+                reverse('posts:profile', args=(author.username,))
+            ),
+            'post_detail': lambda: guest.get(
+                reverse('posts:post_detail', args=(post.id,))
+            ),
+            'comments': lambda: guest.get(
+                reverse('posts:comments', args=(post.id,))
+            ),
+            'follow_index': lambda: member.get(reverse('posts:follow_index')),
+            'add_comment': lambda: member.post(
+                comment_url, {'text': 'Комментарий из бенчмарка'}
+            ),
+        }
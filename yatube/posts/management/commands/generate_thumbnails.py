@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры картинок всех постов в пуле процессов.'
+
+    def handle(self, *args, **options):
+        image_names = (
+            Post.objects.exclude(image='').order_by()
+            .values_list('image', flat=True).distinct()
+        )
+        total = sum(1 for _ in thumbnails.generate_many(list(image_names)))
+        self.stdout.write(self.style.SUCCESS(f'Картинок: {total}'))
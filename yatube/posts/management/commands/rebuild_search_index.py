@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько записей вставлять за один запрос.'
+        )
+
+    def handle(self, *args, **options):
+        if not search.is_enabled():
+            self.stderr.write('Индекс поддерживается только для SQLite.')
+            return
+        for model in search.SEARCH_TABLES:
+            total = search.rebuild(model, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: {total}'
+            ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики и чинит расхождения.'
+
+    def handle(self, *args, **options):
+        for field, fixed in counters.reconcile().items():
+            self.stdout.write(self.style.SUCCESS(
+                f'{field}: исправлено строк {fixed}'
+            ))
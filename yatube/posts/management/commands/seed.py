@@ -0,0 +1,313 @@
+import random
+import time
+from datetime import datetime, timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from posts import counters, images, search, thumbnails, timeline
+from posts.imports import batches, historical_created
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+ZIPF_EXPONENT = 1.1
+FOLLOW_PARETO_ALPHA = 1.5
+GROUP_PROBABILITY = 0.7
+MAX_GROUPS_PER_AUTHOR = 3
+COMMENT_BURST_SECONDS = 60 * 60 * 3
+SAMPLE_IMAGE_SIZE = (1600, 1000)
+# Комментарии достаются случайной выборке постов такого размера: по
+# Ципфу почти все они уходят первым сотням постов выборки, а в памяти
+# не держатся id всех постов
+HOT_POSTS = 10000
+
+
+def _zipf_cum_weights(count):
+    """Накопленные веса закона Ципфа для rng.choices."""
+    return list(accumulate(
+        1 / rank ** ZIPF_EXPONENT for rank in range(1, count + 1)
+    ))
+
+
+def _descending_offsets(rng, count, span):
+    """count равномерных смещений из [0, span) по убыванию, без списка.
+
+    Максимум из k равномерных на [0, 1) величин распределен как
+    U ** (1 / k), поэтому каждое следующее смещение - доля предыдущего.
+    """
+    current = 1.0
+    for remaining in range(count, 0, -1):
+        current *= rng.random() ** (1 / remaining)
+        yield current * span
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными продакшен-масштаба: '
+        'популярность авторов по Ципфу, подписки со степенным '
+        'распределением, всплески комментариев. Одинаковые --seed и '
+        '--until на пустой базе дают одинаковые данные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--groups', type=int, default=30)
+        parser.add_argument('--posts', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=20,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=20,
+            help='Сколько разных картинок сгенерировать.'
+        )
+        parser.add_argument(
+            '--image-ratio',
+            type=float,
+            default=0.2,
+            help='Доля постов с картинкой.'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument(
+            '--until',
+            help='Дата самого нового поста, YYYY-MM-DD (по умолчанию '
+                 'сегодня).'
+        )
+        parser.add_argument('--password', default='seed-password')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(options['seed'])
+        if options['until']:
+            until = datetime.strptime(options['until'], '%Y-%m-%d')
+            self.until = timezone.make_aware(until, timezone.utc)
+        else:
+            self.until = timezone.now().replace(
+                hour=0, minute=0, second=0, microsecond=0
+            )
+
+        user_ids = self.stage('Пользователи', self.create_users)
+        group_ids = self.stage('Группы', self.create_groups)
+        samples = self.stage('Картинки', self.create_images)
+        last_post = self.last_id(Post)
+        self.stage('Посты', self.create_posts, user_ids, group_ids, samples)
+        self.stage('Подписки', self.create_follows, user_ids)
+        self.stage('Комментарии', self.create_comments, user_ids, last_post)
+        self.stage('Счетчики', lambda: sum(counters.reconcile().values()))
+        self.stage('Поиск', lambda: sum(
+            search.rebuild(model) for model in search.SEARCH_TABLES
+        ) if search.is_enabled() else 0)
+        self.stage('Ленты', timeline.rebuild)
+        cache.clear()
+
+    def stage(self, title, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        size = len(result) if isinstance(result, list) else result
+        self.stdout.write(f'{title}: {size} за {elapsed:.1f} с')
+        return result
+
+    def bulk_create(self, model, objects, **kwargs):
+        with transaction.atomic():
+            for batch in batches(objects, self.options['batch_size']):
+                model.objects.bulk_create(batch, **kwargs)
+
+    def new_ids(self, model, after, *fields):
+        return list(
+            model.objects.filter(pk__gt=after).order_by('pk')
+            .values_list('pk', *fields, flat=not fields)
+        )
+
+    def last_id(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+
+    def create_users(self):
+        start = self.last_id(User)
+        password = make_password(self.options['password'])
+        self.bulk_create(User, (
+            User(
+                username=f'{self.faker.user_name()}{start + number}',
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                password=password
+            )
+            for number in range(1, self.options['users'] + 1)
+        ))
+        return self.new_ids(User, start)
+
+    def create_groups(self):
+        start = self.last_id(Group)
+        self.bulk_create(Group, (
+            Group(
+                title=self.faker.sentence(nb_words=3)[:200],
+                slug=f'seed-{start + number}',
+                description=self.faker.paragraph()
+            )
+            for number in range(1, self.options['groups'] + 1)
+        ))
+        return self.new_ids(Group, start)
+
+    def create_images(self):
+        """Картинки проходят тот же прием, что и загрузки из формы."""
+        samples = []
+        for number in range(self.options['images']):
+            image = Image.new('RGB', SAMPLE_IMAGE_SIZE, tuple(
+                self.rng.randrange(256) for _ in range(3)
+            ))
+            draw = ImageDraw.Draw(image)
+            for _ in range(12):
+                box = sorted(self.rng.randrange(SAMPLE_IMAGE_SIZE[0])
+                             for _ in range(2))
+                box += sorted(self.rng.randrange(SAMPLE_IMAGE_SIZE[1])
+                              for _ in range(2))
+                draw.ellipse(
+                    (box[0], box[2], box[1], box[3]),
+                    fill=tuple(self.rng.randrange(256) for _ in range(3))
+                )
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG')
+            ingested = images.ingest(SimpleUploadedFile(
+                f'seed-{number}.jpg', buffer.getvalue()
+            ))
+            name = default_storage.save(
+                f'posts/{ingested.content.name}', ingested.content
+            )
+            images.save_variants(name, ingested.variants)
+            samples.append((name, ingested.width, ingested.height))
+        list(thumbnails.generate_many([name for name, _, _ in samples]))
+        return samples
+
+    def create_posts(self, user_ids, group_ids, samples):
+        """Посты по времени, авторы по Ципфу, группы из 1-3 на автора."""
+        rng = self.rng
+        authors = user_ids[:]
+        rng.shuffle(authors)
+        author_weights = _zipf_cum_weights(len(authors))
+        memberships = {
+            author: rng.sample(
+                group_ids,
+                min(len(group_ids), rng.randint(1, MAX_GROUPS_PER_AUTHOR))
+            )
+            for author in authors
+        } if group_ids else {}
+        offsets = _descending_offsets(
+            rng, self.options['posts'], self.options['days'] * 24 * 60 * 60
+        )
+
+        def posts():
+            for offset in offsets:
+                author = rng.choices(authors, cum_weights=author_weights)[0]
+                post = Post(
+                    author_id=author,
+                    text=self.faker.paragraph(
+                        nb_sentences=rng.randint(1, 8)
+                    ),
+                    created=self.until - timedelta(seconds=offset)
+                )
+                groups = memberships.get(author)
+                if groups and rng.random() < GROUP_PROBABILITY:
+                    post.group_id = rng.choice(groups)
+                if samples and rng.random() < self.options['image_ratio']:
+                    name, width, height = rng.choice(samples)
+                    post.image = name
+                    post.image_width, post.image_height = width, height
+                yield post
+
+        with historical_created(Post):
+            self.bulk_create(Post, posts())
+        return self.options['posts']
+
+    def create_follows(self, user_ids):
+        """Степени подписок по Парето, цели - по популярности (Ципф)."""
+        rng = self.rng
+        popular = user_ids[:]
+        rng.shuffle(popular)
+        weights = _zipf_cum_weights(len(popular))
+        alpha = FOLLOW_PARETO_ALPHA
+        scale = self.options['follows'] * (alpha - 1) / alpha
+        total = 0
+
+        def follows():
+            nonlocal total
+            for user_id in user_ids:
+                degree = min(
+                    int(rng.paretovariate(alpha) * scale),
+                    len(user_ids) - 1
+                )
+                authors = set(
+                    rng.choices(popular, cum_weights=weights, k=degree)
+                )
+                authors.discard(user_id)
+                total += len(authors)
+                for author_id in sorted(authors):
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self.bulk_create(Follow, follows(), ignore_conflicts=True)
+        return total
+
+    def sample_posts(self, after):
+        """До HOT_POSTS случайных (id, created) постов новее after.
+
+        Строки читаются потоком, выборка - reservoir sampling.
+        """
+        rng = self.rng
+        sample = []
+        rows = Post.objects.filter(pk__gt=after).order_by('pk').values_list(
+            'pk', 'created'
+        ).iterator(chunk_size=self.options['batch_size'])
+        for seen, row in enumerate(rows):
+            if seen < HOT_POSTS:
+                sample.append(row)
+                continue
+            index = rng.randrange(seen + 1)
+            if index < HOT_POSTS:
+                sample[index] = row
+        return sample
+
+    def create_comments(self, user_ids, last_post):
+        """Комментарии достаются горячим постам и идут всплесками."""
+        rng = self.rng
+        hot = self.sample_posts(last_post)
+        if not hot:
+            return 0
+        rng.shuffle(hot)
+        weights = _zipf_cum_weights(len(hot))
+
+        def comments():
+            for _ in range(self.options['comments']):
+                post_id, created = rng.choices(hot, cum_weights=weights)[0]
+                delay = rng.expovariate(1 / COMMENT_BURST_SECONDS)
+                yield Comment(
+                    post_id=post_id,
+                    author_id=rng.choice(user_ids),
+                    text=self.faker.sentence(nb_words=rng.randint(3, 25)),
+                    created=min(created + timedelta(seconds=delay),
+                                self.until)
+                )
+
+        with historical_created(Comment):
+            self.bulk_create(Comment, comments())
+        return self.options['comments']
@@ -0,0 +1,146 @@
+import re
+from typing import Iterable
+
+from django.db import migrations
+
+SEARCH_TABLES = {
+    'Post': 'posts_post_fts',
+    'Comment': 'posts_comment_fts',
+}
+
+# Копия токенизатора и стеммера posts.search на момент миграции:
+# миграция должна строить тот же индекс, как бы ни менялся модуль
+TOKENIZER = 'unicode61 remove_diacritics 2'
+MIN_STEM_LENGTH = 2
+
+WORD_RE = re.compile(r'\w+')
+VOWELS = 'аеиоуыэюя'
+
+
+def _endings(after_a: Iterable[str], anywhere: Iterable[str]):
+    """Окончания по убыванию длины с признаком "только после а/я"."""
+    endings = [(ending, True) for ending in after_a]
+    endings += [(ending, False) for ending in anywhere]
+    return sorted(endings, key=lambda item: len(item[0]), reverse=True)
+
+
+PERFECTIVE_GERUND = _endings(
+    ('вшись', 'вши', 'в'),
+    ('ившись', 'ывшись', 'ивши', 'ывши', 'ив', 'ыв'),
+)
+REFLEXIVE = ('ся', 'сь')
+ADJECTIVE = (
+    'ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое', 'ей',
+    'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую', 'юю', 'ая',
+    'яя', 'ою', 'ею',
+)
+PARTICIPLE = _endings(
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = _endings(
+    ('ете', 'йте', 'ешь', 'нно', 'ла', 'на', 'ли', 'ем', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'й', 'л', 'н'),
+    ('ейте', 'уйте', 'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило', 'ыло',
+     'ено', 'ует', 'уют', 'ены', 'ить', 'ыть', 'ишь', 'ей', 'уй', 'ил', 'ыл',
+     'им', 'ым', 'ен', 'ят', 'ит', 'ыт', 'ую', 'ю'),
+)
+NOUN = (
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ие', 'ье',
+    'еи', 'ии', 'ей', 'ой', 'ий', 'ям', 'ем', 'ам', 'ом', 'ах', 'ях', 'ию',
+    'ью', 'ия', 'ья', 'а', 'е', 'и', 'й', 'о', 'у', 'ы', 'ь', 'ю', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+
+
+def _strip(word: str, endings: Iterable[str]) -> str:
+    for ending in endings:
+        if word.endswith(ending):
+            return word[:-len(ending)]
+    return word
+
+
+def _strip_after_a(word: str, endings) -> str:
+    for ending, after_a in endings:
+        if not word.endswith(ending):
+            continue
+        stem = word[:-len(ending)]
+        if not after_a or stem.endswith(('а', 'я')):
+            return stem
+    return word
+
+
+def stem(word: str) -> str:
+    """Упрощенный стеммер Портера (Snowball) для русского языка."""
+    word = word.lower().replace('ё', 'е')
+    position = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), None
+    )
+    if position is None:
+        return word
+    prefix, rv = word[:position], word[position:]
+
+    stripped = _strip_after_a(rv, PERFECTIVE_GERUND)
+    if stripped == rv:
+        rv = _strip(rv, REFLEXIVE)
+        stripped = _strip(rv, ADJECTIVE)
+        if stripped != rv:
+            stripped = _strip_after_a(stripped, PARTICIPLE)
+        else:
+            stripped = _strip_after_a(rv, VERB)
+            if stripped == rv:
+                stripped = _strip(rv, NOUN)
+    rv = _strip(stripped, ('и',))
+
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        superlative = _strip(rv, SUPERLATIVE)
+        if superlative != rv:
+            rv = superlative
+            if rv.endswith('нн'):
+                rv = rv[:-1]
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+
+    result = prefix + rv
+    return result if len(result) >= MIN_STEM_LENGTH else word
+
+
+def normalize(text: str) -> str:
+    """Текст для индекса: слова в нижнем регистре, сведенные к основам."""
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for model_name, table in SEARCH_TABLES.items():
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} "
+            f"USING fts5(body, tokenize='{TOKENIZER}')"
+        )
+        model = apps.get_model('posts', model_name)
+        rows = model.objects.values_list('pk', 'text').iterator()
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {table} (rowid, body) VALUES (%s, %s)',
+                ((pk, normalize(text)) for pk, text in rows)
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in SEARCH_TABLES.values():
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0009_timelineentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
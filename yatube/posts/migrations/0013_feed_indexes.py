@@ -0,0 +1,66 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:56
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total'),
+        output_field=models.IntegerField()
+    ), 0)
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    """Оставляет самую раннюю из повторных подписок и пересчитывает
+    счетчики затронутых пользователей.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    duplicates = Follow.objects.values('user', 'author').annotate(
+        keep=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    affected = set()
+    for row in duplicates.iterator():
+        Follow.objects.filter(
+            user_id=row['user'], author_id=row['author']
+        ).exclude(id=row['keep']).delete()
+        affected.update((row['user'], row['author']))
+    if affected:
+        UserCounters.objects.filter(user_id__in=affected).update(
+            followers_count=_count(
+                Follow.objects.filter(author=OuterRef('user')), 'author'),
+            following_count=_count(
+                Follow.objects.filter(user=OuterRef('user')), 'user'),
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0012_post_image_size'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created', '-id'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-created', '-id'], name='post_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-created', '-id'], name='post_group_created_idx'),
+        ),
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='follow_unique_user_author'),
+        ),
+    ]
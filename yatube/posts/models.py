@@ -2,6 +2,8 @@ from core.models import CreatedModel
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from . import images
+
 User = get_user_model()
 
 
@@ -37,14 +39,48 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        null=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-created',)
         default_related_name = 'posts'
+        indexes = (
+            models.Index(
+                fields=('-created', '-id'),
+                name='post_created_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-created', '-id'),
+                name='post_author_created_idx'
+            ),
+            models.Index(
+                fields=('group', '-created', '-id'),
+                name='post_group_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def image_srcset(self) -> str:
+        return ', '.join(
+            f'{url} {width}w'
+            for url, width in images.srcset(self.image, self.image_width)
+        )
+
 
 class Comment(CreatedModel):
     post = models.ForeignKey(
@@ -65,6 +101,16 @@ class Comment(CreatedModel):
     class Meta:
         ordering = ('-created',)
         default_related_name = 'comments'
+        indexes = (
+            models.Index(
+                fields=('-created', '-id'),
+                name='comment_created_id_idx'
+            ),
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_idx'
+            ),
+        )
 
 
 class Follow(models.Model):
@@ -78,3 +124,78 @@ class Follow(models.Model):
         related_name='following',
         on_delete=models.CASCADE
     )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='follow_unique_user_author'
+            ),
+        )
+
+
+class UserCounters(models.Model):
+    """Денормализованные счетчики пользователя.
+
+    Обновляются сигналами через F-выражения, расхождения исправляет
+    команда reconcile_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='counters',
+        on_delete=models.CASCADE
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+        db_index=True
+    )
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    def __str__(self):
+        return f'{self.user_id}'
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: пост в ленте пользователя.
+
+    Заполняется при публикации поста (fan-out-on-write), поле created
+    копирует дату поста, чтобы лента читалась одним проходом по индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        related_name='timeline',
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='timeline_entries',
+        on_delete=models.CASCADE
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    created = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-created',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='timeline_unique_user_post'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-created', '-post'),
+                name='timeline_user_created_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx'
+            ),
+        )
@@ -0,0 +1,250 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Индекс - виртуальные таблицы SQLite FTS5, по строке на пост или
+комментарий (rowid совпадает с id). В индекс пишется текст после
+нормализации и стемминга, поэтому "котами" находит "кот" и "коты".
+"""
+import re
+from itertools import islice
+from typing import Iterable, List, Tuple
+
+from django.core.paginator import InvalidPage
+from django.db import connection, transaction
+
+from core.paginators import CursorPage, decode_token, encode_token
+
+from .models import Comment, Post
+
+SEARCH_TABLES = {
+    Post: 'posts_post_fts',
+    Comment: 'posts_comment_fts',
+}
+TOKENIZER = 'unicode61 remove_diacritics 2'
+MIN_STEM_LENGTH = 2
+
+WORD_RE = re.compile(r'\w+')
+VOWELS = 'аеиоуыэюя'
+
+
+def _endings(after_a: Iterable[str], anywhere: Iterable[str]):
+    """Окончания по убыванию длины с признаком "только после а/я"."""
+    endings = [(ending, True) for ending in after_a]
+    endings += [(ending, False) for ending in anywhere]
+    return sorted(endings, key=lambda item: len(item[0]), reverse=True)
+
+
+PERFECTIVE_GERUND = _endings(
+    ('вшись', 'вши', 'в'),
+    ('ившись', 'ывшись', 'ивши', 'ывши', 'ив', 'ыв'),
+)
+REFLEXIVE = ('ся', 'сь')
+ADJECTIVE = (
+    'ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое', 'ей',
+    'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую', 'юю', 'ая',
+    'яя', 'ою', 'ею',
+)
+PARTICIPLE = _endings(
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = _endings(
+    ('ете', 'йте', 'ешь', 'нно', 'ла', 'на', 'ли', 'ем', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'й', 'л', 'н'),
+    ('ейте', 'уйте', 'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило', 'ыло',
+     'ено', 'ует', 'уют', 'ены', 'ить', 'ыть', 'ишь', 'ей', 'уй', 'ил', 'ыл',
+     'им', 'ым', 'ен', 'ят', 'ит', 'ыт', 'ую', 'ю'),
+)
+NOUN = (
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ие', 'ье',
+    'еи', 'ии', 'ей', 'ой', 'ий', 'ям', 'ем', 'ам', 'ом', 'ах', 'ях', 'ию',
+    'ью', 'ия', 'ья', 'а', 'е', 'и', 'й', 'о', 'у', 'ы', 'ь', 'ю', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+
+
+def _strip(word: str, endings: Iterable[str]) -> str:
+    for ending in endings:
+        if word.endswith(ending):
+            return word[:-len(ending)]
+    return word
+
+
+def _strip_after_a(word: str, endings) -> str:
+    for ending, after_a in endings:
+        if not word.endswith(ending):
+            continue
+        stem = word[:-len(ending)]
+        if not after_a or stem.endswith(('а', 'я')):
+            return stem
+    return word
+
+
+def stem(word: str) -> str:
+    """Упрощенный стеммер Портера (Snowball) для русского языка."""
+    word = word.lower().replace('ё', 'е')
+    position = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), None
+    )
+    if position is None:
+        return word
+    prefix, rv = word[:position], word[position:]
+
+    stripped = _strip_after_a(rv, PERFECTIVE_GERUND)
+    if stripped == rv:
+        rv = _strip(rv, REFLEXIVE)
+        stripped = _strip(rv, ADJECTIVE)
+        if stripped != rv:
+            stripped = _strip_after_a(stripped, PARTICIPLE)
+        else:
+            stripped = _strip_after_a(rv, VERB)
+            if stripped == rv:
+                stripped = _strip(rv, NOUN)
+    rv = _strip(stripped, ('и',))
+
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        superlative = _strip(rv, SUPERLATIVE)
+        if superlative != rv:
+            rv = superlative
+            if rv.endswith('нн'):
+                rv = rv[:-1]
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+
+    result = prefix + rv
+    return result if len(result) >= MIN_STEM_LENGTH else word
+
+
+def normalize(text: str) -> str:
+    """Текст для индекса: слова в нижнем регистре, сведенные к основам."""
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
+
+
+def build_match(query: str) -> str:
+    """Запрос FTS5: все слова обязательны, каждое - как префикс основы."""
+    return ' '.join(
+        '"{}"*'.format(stem(word)) for word in WORD_RE.findall(query)
+    )
+
+
+def is_enabled() -> bool:
+    return connection.vendor == 'sqlite'
+
+
+def index(obj) -> None:
+    """Добавляет или обновляет объект в поисковом индексе."""
+    if not is_enabled():
+        return
+    table = SEARCH_TABLES[type(obj)]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', (obj.pk,))
+        cursor.execute(
+            f'INSERT INTO {table} (rowid, body) VALUES (%s, %s)',
+            (obj.pk, normalize(obj.text))
+        )
+
+
+def unindex(obj) -> None:
+    if not is_enabled():
+        return
+    table = SEARCH_TABLES[type(obj)]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', (obj.pk,))
+
+
+def index_rows(model, rows: Iterable[Tuple[int, str]]) -> int:
+    """Добавляет в индекс новые строки (pk, text) одним executemany.
+
+    Для массовой загрузки: строки не должны уже быть в индексе.
+    """
+    table = SEARCH_TABLES[model]
+    batch = [(pk, normalize(text)) for pk, text in rows]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} (rowid, body) VALUES (%s, %s)', batch
+        )
+    return len(batch)
+
+
+def rebuild(model, batch_size: int = 1000) -> int:
+    """Перестраивает индекс модели целиком, возвращает число записей."""
+    table = SEARCH_TABLES[model]
+    total = 0
+    rows = model.objects.order_by().values_list('pk', 'text').iterator(
+        chunk_size=batch_size
+    )
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return total
+            total += index_rows(model, batch)
+
+
+def filter_queryset(queryset, query: str):
+    """Оставляет в queryset только найденные объекты (для админки)."""
+    match = build_match(query)
+    if not match:
+        return queryset
+    if not is_enabled():
+        return queryset.filter(text__icontains=query)
+    model = queryset.model
+    table = SEARCH_TABLES[model]
+    pk_column = f'"{model._meta.db_table}"."{model._meta.pk.column}"'
+    return queryset.extra(
+        where=[
+            f'{pk_column} IN '
+            f'(SELECT rowid FROM {table} WHERE {table} MATCH %s)'
+        ],
+        params=[match]
+    )
+
+
+def _ranked_ids(model, match: str, limit: int,
+                after: Tuple[float, int] = None) -> List[Tuple[int, float]]:
+    table = SEARCH_TABLES[model]
+    sql = (
+        f'SELECT rowid, bm25({table}) AS score FROM {table} '
+        f'WHERE {table} MATCH %s'
+    )
+    params = [match]
+    if after is not None:
+        sql += ' AND (score > %s OR (score = %s AND rowid > %s))'
+        params += [after[0], after[0], after[1]]
+    sql += ' ORDER BY score, rowid LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def search_page(queryset, query: str, per_page: int,
+                cursor: str = None) -> CursorPage:
+    """Страница результатов по релевантности (bm25) с курсором.
+
+    Курсор хранит (score, id) последнего результата, поэтому следующая
+    страница не пересчитывает и не пропускает предыдущие.
+    """
+    after = None
+    if cursor is not None:
+        score, pk = decode_token(cursor, 2)
+        try:
+            after = (float(score), int(pk))
+        except ValueError:
+            raise InvalidPage('Некорректный курсор')
+
+    match = build_match(query)
+    if not match or not is_enabled():
+        return CursorPage([], None, cursor, None)
+
+    rows = _ranked_ids(queryset.model, match, per_page + 1, after)
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_token(repr(rows[-1][1]), rows[-1][0])
+    objects = queryset.in_bulk([pk for pk, _ in rows])
+    items = [objects[pk] for pk, _ in rows if pk in objects]
+    return CursorPage(items, None, cursor, next_cursor)
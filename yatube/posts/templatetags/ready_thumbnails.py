@@ -0,0 +1,44 @@
+from django import template
+from sorl.thumbnail.templatetags.thumbnail import ThumbnailNode
+
+from ..thumbnails import ready_thumbnail
+
+register = template.Library()
+
+
+class ReadyThumbnailNode(ThumbnailNode):
+    """{% thumbnail %}, который не строит миниатюру во время запроса.
+
+    Пока фоновый пул не построил миниатюру, выводится блок {% empty %}.
+    """
+
+    def _render(self, context):
+        file_ = self.file_.resolve(context)
+        thumbnail = None
+        if file_:
+            options = {}
+            for key, expr in self.options:
+                noresolve = {'True': True, 'False': False, 'None': None}
+                value = noresolve.get(str(expr), expr.resolve(context))
+                if key == 'options':
+                    options.update(value)
+                else:
+                    options[key] = value
+            thumbnail = ready_thumbnail(
+                file_, self.geometry.resolve(context), **options
+            )
+        if thumbnail is None:
+            return self.nodelist_empty.render(context)
+        context.push()
+        context[self.as_var] = thumbnail
+        output = self.nodelist_file.render(context)
+        context.pop()
+        return output
+
+
+@register.tag
+def thumbnail(parser, token):
+    node = ReadyThumbnailNode(parser, token)
+    if node.as_var is None:
+        raise template.TemplateSyntaxError(node.error_msg)
+    return node
@@ -0,0 +1,141 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import QueryBudgetTestMixin
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+PAGE = 3
+
+
+class APITests(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание'
+        )
+        for i in range(PAGE * 2 + 1):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'Пост №{i}'
+            )
+        for i in range(PAGE * 2 + 1):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Комментарий №{i}'
+            )
+        cls.urls = {
+            'posts': reverse('api_v1:posts'),
+            'group_posts': reverse(
+                'api_v1:group_posts', args=(cls.group.slug,)
+            ),
+            'profile_posts': reverse(
+                'api_v1:profile_posts', args=(cls.author.username,)
+            ),
+            'comments': reverse('api_v1:comments', args=(cls.post.id,)),
+            'follow': reverse('api_v1:follow'),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(APITests.reader)
+
+    def walk(self, url, **params):
+        """Все страницы списка по курсору next."""
+        ids, pages = [], 0
+        params['limit'] = PAGE
+        while True:
+            response = self.reader_client.get(url, params)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertWithinQueryBudget(response)
+            payload = response.json()
+            ids += [item['id'] for item in payload['results']]
+            pages += 1
+            if payload['next'] is None:
+                return ids, pages
+            params['after'] = payload['next']
+
+    def test_lists_walk_all_items_once(self):
+        """Курсор обходит каждый список целиком, без повторов."""
+        total = PAGE * 2 + 1
+        for name, url in APITests.urls.items():
+            with self.subTest(name=name):
+                ids, pages = self.walk(url)
+                self.assertEqual(len(ids), total)
+                self.assertEqual(ids, sorted(set(ids), reverse=True))
+                self.assertEqual(pages, 3)
+
+    def test_since_id_returns_only_new_items(self):
+        """since_id отдает только записи новее уже виденных."""
+        url = APITests.urls['posts']
+        since_id = self.reader_client.get(url).json()['since_id']
+        self.assertEqual(since_id, APITests.post.id)
+        self.assertEqual(
+            self.reader_client.get(url, {'since_id': since_id}).json(),
+            {'results': [], 'next': None, 'since_id': since_id}
+        )
+        new_post = Post.objects.create(author=APITests.author, text='Новый')
+        payload = self.reader_client.get(url, {'since_id': since_id}).json()
+        self.assertEqual(
+            [item['id'] for item in payload['results']], [new_post.id]
+        )
+        self.assertEqual(payload['since_id'], new_post.id)
+
+    def test_post_detail(self):
+        """Пост сериализуется из кортежа values_list."""
+        post = APITests.post
+        response = self.client.get(reverse('api_v1:post', args=(post.id,)))
+        self.assertWithinQueryBudget(response)
+        self.assertEqual(response.json(), {
+            'id': post.id,
+            'text': post.text,
+            'created': post.created.isoformat(),
+            'author': {'id': post.author_id, 'username': 'author'},
+            'group': 'group',
+            'image': None,
+            'comments_count': PAGE * 2 + 1,
+        })
+
+    def test_errors_are_json(self):
+        """Ошибки отдаются в JSON с подходящим статусом."""
+        requests = (
+            (reverse('api_v1:post', args=(0,)), {}, HTTPStatus.NOT_FOUND),
+            (reverse('api_v1:group_posts', args=('missing',)), {},
+             HTTPStatus.NOT_FOUND),
+            (APITests.urls['posts'], {'after': '!!!'},
+             HTTPStatus.BAD_REQUEST),
+            (APITests.urls['posts'], {'since_id': 'x'},
+             HTTPStatus.BAD_REQUEST),
+            (APITests.urls['posts'], {'limit': 'all'},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api_v1:comments', args=(APITests.post.id,)),
+             {'since_id': '1.5'}, HTTPStatus.BAD_REQUEST),
+            (APITests.urls['follow'], {}, HTTPStatus.UNAUTHORIZED),
+        )
+        for url, params, status in requests:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+
+    def test_unchanged_list_is_not_modified(self):
+        """Повторный запрос с ETag получает 304 без обращения к постам."""
+        url = APITests.urls['posts']
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(author=APITests.author, text='Новый')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
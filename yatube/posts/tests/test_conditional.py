@@ -0,0 +1,134 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.contrib.messages import constants
+from django.contrib.messages.storage.base import Message
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Пост'
+        )
+        cls.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_posts', args=(cls.group.slug,)),
+            'profile': reverse('posts:profile', args=(cls.author.username,)),
+            'detail': reverse('posts:post_detail', args=(cls.post.id,)),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def revalidate(self, client, url):
+        """Первый запрос и повторный с If-None-Match."""
+        response = client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_not_modified(self):
+        """Неизмененная страница отдает 304 без тела."""
+        for name, url in ConditionalGetTests.urls.items():
+            with self.subTest(page=name):
+                response = self.revalidate(self.guest, url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response.content, b'')
+
+    def test_not_modified_skips_queryset(self):
+        """304 для ленты не выполняет запросов к постам."""
+        etag = self.guest.get(ConditionalGetTests.urls['index'])['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest.get(
+                ConditionalGetTests.urls['index'], HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_writes_change_validators(self):
+        """Новый пост, комментарий и подписка меняют ETag страниц."""
+        etags = {
+            name: self.guest.get(url)['ETag']
+            for name, url in ConditionalGetTests.urls.items()
+        }
+        Post.objects.create(
+            author=ConditionalGetTests.author,
+            group=ConditionalGetTests.group,
+            text='Новый пост'
+        )
+        for name in ('index', 'group', 'profile', 'detail'):
+            with self.subTest(page=name):
+                response = self.guest.get(
+                    ConditionalGetTests.urls[name],
+                    HTTP_IF_NONE_MATCH=etags[name]
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        etag = self.guest.get(ConditionalGetTests.urls['detail'])['ETag']
+        Comment.objects.create(
+            post=ConditionalGetTests.post,
+            author=ConditionalGetTests.reader,
+            text='Комментарий'
+        )
+        self.assertNotEqual(
+            self.guest.get(ConditionalGetTests.urls['detail'])['ETag'], etag
+        )
+
+        etag = self.guest.get(ConditionalGetTests.urls['profile'])['ETag']
+        Follow.objects.create(
+            user=ConditionalGetTests.reader,
+            author=ConditionalGetTests.author
+        )
+        self.assertNotEqual(
+            self.guest.get(ConditionalGetTests.urls['profile'])['ETag'], etag
+        )
+
+    def test_pending_messages_skip_validators(self):
+        """Страница после редиректа с сообщением не отдает 304."""
+        url = ConditionalGetTests.urls['index']
+        etag = self.guest.get(url)['ETag']
+        storage = CookieStorage(RequestFactory().get(url))
+        self.guest.cookies[storage.cookie_name] = storage._encode(
+            [Message(constants.SUCCESS, 'Пост опубликован')]
+        )
+        response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Пост опубликован')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_differs_per_user(self):
+        """Страница авторизованного пользователя не совпадает с гостевой."""
+        reader = Client()
+        reader.force_login(ConditionalGetTests.reader)
+        url = ConditionalGetTests.urls['index']
+        response = reader.get(url)
+        self.assertNotEqual(response['ETag'], self.guest.get(url)['ETag'])
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_last_modified(self):
+        """После записи страница отдает Last-Modified и понимает IMS."""
+        Post.objects.create(author=ConditionalGetTests.author, text='Еще')
+        url = ConditionalGetTests.urls['index']
+        last_modified = self.guest.get(url)['Last-Modified']
+        response = self.guest.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
@@ -0,0 +1,110 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def get_counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_counter(self):
+        """Счетчик постов меняется при создании и удалении поста."""
+        self.assertEqual(
+            self.get_counters(CountersTests.author).posts_count, 1
+        )
+        post = Post.objects.create(author=CountersTests.author, text='Еще')
+        self.assertEqual(
+            self.get_counters(CountersTests.author).posts_count, 2
+        )
+        post.delete()
+        self.assertEqual(
+            self.get_counters(CountersTests.author).posts_count, 1
+        )
+
+    def test_follow_counters(self):
+        """Счетчики подписчиков и подписок."""
+        follow = Follow.objects.create(
+            user=CountersTests.reader,
+            author=CountersTests.author
+        )
+        self.assertEqual(
+            self.get_counters(CountersTests.author).followers_count, 1
+        )
+        self.assertEqual(
+            self.get_counters(CountersTests.reader).following_count, 1
+        )
+        follow.delete()
+        self.assertEqual(
+            self.get_counters(CountersTests.author).followers_count, 0
+        )
+        self.assertEqual(
+            self.get_counters(CountersTests.reader).following_count, 0
+        )
+
+    def test_comment_counter(self):
+        """Счетчик комментариев поста."""
+        comment = Comment.objects.create(
+            post=CountersTests.post,
+            author=CountersTests.reader,
+            text='Комментарий'
+        )
+        CountersTests.post.refresh_from_db()
+        self.assertEqual(CountersTests.post.comments_count, 1)
+        comment.delete()
+        CountersTests.post.refresh_from_db()
+        self.assertEqual(CountersTests.post.comments_count, 0)
+
+    def test_reconcile_repairs_drift(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        UserCounters.objects.filter(user=CountersTests.author).update(
+            posts_count=42
+        )
+        UserCounters.objects.filter(user=CountersTests.reader).delete()
+        Post.objects.filter(pk=CountersTests.post.pk).update(
+            comments_count=7
+        )
+        call_command('reconcile_counters', stdout=StringIO())
+
+        self.assertEqual(
+            self.get_counters(CountersTests.author).posts_count, 1
+        )
+        self.assertEqual(
+            self.get_counters(CountersTests.reader).posts_count, 0
+        )
+        CountersTests.post.refresh_from_db()
+        self.assertEqual(CountersTests.post.comments_count, 0)
+
+    def test_profile_and_detail_use_counters(self):
+        """Профиль и пост показывают счетчики."""
+        client = Client()
+        response = client.get(reverse(
+            'posts:profile',
+            kwargs={'username': CountersTests.author.username}
+        ))
+        self.assertEqual(response.context['counters'].posts_count, 1)
+        response = client.get(reverse(
+            'posts:post_detail',
+            kwargs={'post_id': CountersTests.post.id}
+        ))
+        self.assertEqual(response.context['author_posts_count'], 1)
+
+    def test_user_deletion_keeps_integrity(self):
+        """Удаление автора не оставляет висящих счетчиков."""
+        CountersTests.author.delete()
+        self.assertFalse(UserCounters.objects.filter(
+            user_id=CountersTests.author.id
+        ).exists())
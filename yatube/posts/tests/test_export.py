@@ -0,0 +1,105 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.testing import QueryPlanTestMixin
+from .. import exports
+from ..models import Comment, Follow, Post, User
+
+POSTS = 7
+
+
+class ExportCommandTests(QueryPlanTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        start = timezone.now() - timedelta(days=1)
+        for i in range(POSTS):
+            post = Post.objects.create(author=cls.author, text=f'Пост №{i}')
+            Comment.objects.create(post=post, author=cls.reader, text='Да')
+        # Два поста с одной датой проверяют границу порции по (created, id).
+        for i, post in enumerate(Post.objects.order_by('id')):
+            Post.objects.filter(pk=post.pk).update(
+                created=start + timedelta(minutes=i // 2)
+            )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.watermark = os.path.join(self.directory, 'watermark.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def export(self, *names, **options):
+        options.setdefault('output_dir', self.directory)
+        call_command('export', *names, lag=0, stdout=StringIO(), **options)
+
+    def read_ndjson(self, name, opener=open):
+        path = os.path.join(self.directory, name)
+        with opener(path, 'rt', encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_chunks_keep_order_and_export_every_row_once(self):
+        """Порции по ключу (created, id) отдают каждую строку один раз."""
+        with self.assertEfficientQueryPlans():
+            self.export(chunk_size=2)
+        posts = self.read_ndjson('posts.ndjson')
+        self.assertEqual(
+            [row['id'] for row in posts],
+            list(Post.objects.order_by('created', 'id').values_list(
+                'id', flat=True
+            ))
+        )
+        self.assertEqual(set(posts[0]), set(exports.EXPORTS['posts'].fields))
+        self.assertEqual(len(self.read_ndjson('comments.ndjson')), POSTS)
+        self.assertEqual(len(self.read_ndjson('follows.ndjson')), 1)
+
+    def test_watermark_exports_only_new_rows(self):
+        """Повторная выгрузка со знаком отдает только новые строки."""
+        self.export('posts', 'follows', watermark=self.watermark)
+        self.export('posts', 'follows', watermark=self.watermark)
+        self.assertEqual(self.read_ndjson('posts.ndjson'), [])
+        self.assertEqual(self.read_ndjson('follows.ndjson'), [])
+
+        post = Post.objects.create(author=ExportCommandTests.reader, text='Н')
+        Follow.objects.create(
+            user=ExportCommandTests.author, author=ExportCommandTests.reader
+        )
+        self.export('posts', 'follows', watermark=self.watermark)
+        self.assertEqual(
+            [row['id'] for row in self.read_ndjson('posts.ndjson')],
+            [post.id]
+        )
+        self.assertEqual(len(self.read_ndjson('follows.ndjson')), 1)
+        with open(self.watermark, encoding='utf-8') as file:
+            self.assertEqual(json.load(file)['posts']['id'], post.id)
+
+    def test_since_and_compressed_csv(self):
+        """--since отсекает строки старше даты, строки ровно на дате
+        остаются; CSV сжимается на лету."""
+        since = Post.objects.order_by('-created').values_list(
+            'created', flat=True
+        ).first()
+        self.export('posts', format='csv', compress='gzip',
+                    since=since.isoformat())
+        path = os.path.join(self.directory, 'posts.csv.gz')
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(
+            {int(row['id']) for row in rows},
+            set(Post.objects.filter(created=since).values_list(
+                'id', flat=True
+            ))
+        )
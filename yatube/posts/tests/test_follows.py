@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import follows
+from ..models import Follow, User
+
+AUTHORS = 5
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}')
+            for i in range(AUTHORS)
+        ]
+        for author in cls.authors[:2]:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(FollowGraphTests.reader)
+
+    def test_checks_for_many_authors_take_one_query(self):
+        """Проверки подписки на любое число авторов - один запрос."""
+        reader = FollowGraphTests.reader
+        with self.assertNumQueries(1):
+            following = [
+                follows.is_following(reader, author.id)
+                for author in FollowGraphTests.authors
+            ]
+        self.assertEqual(following, [True, True, False, False, False])
+        with self.assertNumQueries(0):
+            follows.following_ids(reader.id)
+
+    def test_follow_and_unfollow_invalidate_the_set(self):
+        """Подписка и отписка сразу видны в кэшированном множестве."""
+        reader = FollowGraphTests.reader
+        author = FollowGraphTests.authors[-1]
+        self.assertNotIn(author.id, follows.following_ids(reader.id))
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(author.username,))
+        )
+        self.assertIn(author.id, follows.following_ids(reader.id))
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(author.username,))
+        )
+        self.assertNotIn(author.id, follows.following_ids(reader.id))
+
+    def test_templates_get_following_ids(self):
+        """Шаблоны получают following_ids, профиль берет подписку из него."""
+        author = FollowGraphTests.authors[0]
+        response = self.reader_client.get(
+            reverse('posts:profile', args=(author.username,))
+        )
+        self.assertTrue(response.context['following'])
+        self.assertIn(author.id, response.context['following_ids'])
+        response = self.client.get(
+            reverse('posts:profile', args=(author.username,))
+        )
+        self.assertEqual(len(response.context['following_ids']), 0)
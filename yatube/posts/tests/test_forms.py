@@ -1,11 +1,16 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
 from django.test import Client, TestCase, override_settings
+from PIL import Image
 
+from .. import images
+from ..forms import PostForm
 from ..models import Post, Group
 from ..utils import (
     get_urls_info,
@@ -109,7 +114,9 @@ class PostFormTests(TestCase):
             last_post.text: form_data['text'],
             last_post.author: PostFormTests.user,
             last_post.group: PostFormTests.group,
-            last_post.image.read(): PostFormTests.small_gif
+            last_post.image.name: 'posts/small.jpg',
+            last_post.image.read(3): b'\xff\xd8\xff',
+            (last_post.image_width, last_post.image_height): (2, 1)
         }
 
         for value, expected in expected_values.items():
@@ -193,3 +200,64 @@ class PostFormTests(TestCase):
                 response = self.authorized_client.get(reversed_name)
                 posts_count = len(response.context['page_obj'])
                 self.assertEqual(posts_count, posts_counts[reversed_name] + 1)
+
+
+def make_upload(size, fmt='JPEG', name='photo.jpg', **save_options):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, fmt, **save_options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageIngestionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def submit(self, upload):
+        return PostForm(
+            data={'text': 'Фото'},
+            files={'image': upload},
+            instance=Post(author=ImageIngestionTests.user)
+        )
+
+    def test_orientation_metadata_and_variants(self):
+        """Картинка повернута по EXIF, без метаданных, с копиями."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Phone'
+        form = self.submit(make_upload((3000, 2000), exif=exif.tobytes()))
+        self.assertTrue(form.is_valid(), form.errors)
+        post = form.save()
+
+        self.assertEqual((post.image_width, post.image_height), (1920, 2880))
+        with Image.open(post.image.path) as saved:
+            self.assertEqual(saved.size, (1920, 2880))
+            self.assertEqual(len(saved.getexif()), 0)
+        for width in images.VARIANT_WIDTHS:
+            with self.subTest(width=width):
+                self.assertTrue(default_storage.exists(
+                    images.variant_name(post.image.name, width)
+                ))
+        self.assertEqual(
+            len(post.image_srcset.split(', ')),
+            len(images.VARIANT_WIDTHS) + 1
+        )
+
+    def test_limits(self):
+        """Слишком большие файлы и не-картинки отклоняются."""
+        with self.subTest('не картинка'):
+            form = self.submit(SimpleUploadedFile('a.jpg', b'not an image'))
+            self.assertFalse(form.is_valid())
+        with self.subTest('больше MAX_UPLOAD_SIZE'):
+            upload = make_upload((10, 10))
+            upload.size = images.MAX_UPLOAD_SIZE + 1
+            form = self.submit(upload)
+            self.assertFalse(form.is_valid())
+            self.assertIn('image', form.errors)
@@ -0,0 +1,183 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .. import search
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+ROWS = 40
+
+
+class ImportCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание'
+        )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write_ndjson(self, name, rows):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            for row in rows:
+                file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return path
+
+    def load(self, *args, **options):
+        call_command('import', *args, stdout=StringIO(), **options)
+
+    def test_posts_update_derived_data_per_batch(self):
+        """Посты загружаются пачками, счетчики, поиск и ленты обновлены."""
+        rows = [
+            {
+                'author': 'author',
+                'group': 'group',
+                'text': f'Импортированный кот №{i}',
+                'created': f'2020-01-01T00:00:{i:02d}+00:00',
+            }
+            for i in range(ROWS)
+        ]
+        rows += [
+            {'author': 'nobody', 'text': 'Без автора'},
+            {'author': 'author', 'group': 'missing', 'text': 'Без группы'},
+            {'author': 'author', 'text': ''},
+        ]
+        path = self.write_ndjson('posts.ndjson', rows)
+        with CaptureQueriesContext(connection) as queries:
+            self.load('posts', path, batch_size=10, transaction_size=20)
+        self.assertLess(len(queries), ROWS)
+
+        posts = Post.objects.filter(author=ImportCommandTests.author)
+        self.assertEqual(posts.count(), ROWS)
+        self.assertEqual(posts.filter(group=ImportCommandTests.group).count(),
+                         ROWS)
+        self.assertEqual(
+            posts.order_by('created').first().created.isoformat(),
+            '2020-01-01T00:00:00+00:00'
+        )
+        ImportCommandTests.author.counters.refresh_from_db()
+        self.assertEqual(ImportCommandTests.author.counters.posts_count, ROWS)
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user=ImportCommandTests.reader
+            ).count(),
+            ROWS
+        )
+        if search.is_enabled():
+            self.assertEqual(
+                search.filter_queryset(Post.objects.all(), 'коты').count(),
+                ROWS
+            )
+
+    def test_unknown_ids_are_skipped(self):
+        """Несуществующие author_id, group_id и post_id - пропущенные
+        строки, а не IntegrityError всей порции."""
+        author = ImportCommandTests.author
+        post = Post.objects.create(author=author, text='Пост')
+        missing = Post.objects.order_by('-pk').first().pk + 1000
+        self.load('posts', self.write_ndjson('posts.ndjson', [
+            {'author_id': author.pk, 'group_id': ImportCommandTests.group.pk,
+             'text': 'С группой'},
+            {'author_id': missing, 'text': 'Без автора'},
+            {'author_id': author.pk, 'group_id': missing,
+             'text': 'Без группы'},
+            {'author_id': 'x', 'text': 'Некорректный автор'},
+        ]))
+        self.load('comments', self.write_ndjson('comments.ndjson', [
+            {'post_id': post.pk, 'author_id': author.pk, 'text': 'Ответ'},
+            {'post_id': missing, 'author_id': author.pk, 'text': 'Мимо'},
+            {'post_id': post.pk, 'author_id': missing, 'text': 'Аноним'},
+        ]))
+        self.assertEqual(
+            list(Post.objects.filter(author=author).values_list(
+                'text', flat=True
+            ).order_by('pk')),
+            ['Пост', 'С группой']
+        )
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)), ['Ответ']
+        )
+
+    def test_malformed_lines_are_skipped(self):
+        """Битая строка NDJSON пропускается с номером, загрузка идет
+        дальше."""
+        path = self.write_ndjson('posts.ndjson', [
+            {'author': 'author', 'text': 'Первый'},
+        ])
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write('{"author": "author", "text": \n[1, 2]\n')
+            file.write(json.dumps({'author': 'author', 'text': 'Второй'}))
+        stdout = StringIO()
+        call_command('import', 'posts', path, stdout=stdout)
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True).order_by('pk')),
+            ['Первый', 'Второй']
+        )
+        output = stdout.getvalue()
+        self.assertIn('Пропущено (некорректный JSON в строке 2): 1', output)
+        self.assertIn('Пропущено (некорректный JSON в строке 3): 1', output)
+
+    def test_deferred_compressed_csv_comments(self):
+        """С --defer индексы возвращаются, счетчики пересчитываются."""
+        post = Post.objects.create(
+            author=ImportCommandTests.author, text='Пост'
+        )
+        path = os.path.join(self.directory, 'comments.csv.gz')
+        with gzip.open(path, 'wt', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(('post_id', 'author', 'text', 'created'))
+            for i in range(ROWS):
+                writer.writerow(
+                    (post.id, f'newcomer{i % 3}', f'Ответ {i}', '')
+                )
+            writer.writerow((0, 'reader', 'К несуществующему посту', ''))
+        indexes = {
+            name for name, info in connection.introspection.get_constraints(
+                connection.cursor(), Comment._meta.db_table
+            ).items() if info['index']
+        }
+
+        self.load('comments', path, defer=True, create_users=True)
+
+        self.assertEqual(Comment.objects.filter(post=post).count(), ROWS)
+        self.assertEqual(
+            User.objects.filter(username__startswith='newcomer').count(), 3
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, ROWS)
+        self.assertEqual(indexes, {
+            name for name, info in connection.introspection.get_constraints(
+                connection.cursor(), Comment._meta.db_table
+            ).items() if info['index']
+        })
+
+    def test_export_round_trip(self):
+        """Выгрузку команды export можно загрузить обратно."""
+        for i in range(3):
+            Post.objects.create(author=ImportCommandTests.author, text=f'{i}')
+        call_command('export', 'posts', output_dir=self.directory, lag=0,
+                     stdout=StringIO())
+        self.load('posts', os.path.join(self.directory, 'posts.ndjson'))
+        self.assertEqual(
+            Post.objects.filter(author=ImportCommandTests.author).count(), 6
+        )
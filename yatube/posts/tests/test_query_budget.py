@@ -0,0 +1,158 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (
+    Client,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from core.querybudget import is_transaction_control
+from core.testing import QueryBudgetTestMixin
+from .. import timeline
+from ..models import Comment, Follow, Group, Post
+from ..utils import OBJ_PER_PAGE
+
+User = get_user_model()
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        for i in range(OBJ_PER_PAGE + 1):
+            author = User.objects.create_user(username=f'author{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            post = Post.objects.create(
+                author=author,
+                group=cls.group,
+                text=f'Пост №{i}'
+            )
+            Comment.objects.create(post=post, author=author, text='Да')
+        cls.post = post
+        cls.author = author
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(QueryBudgetTests.reader)
+
+    def get_urls(self):
+        return (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_posts', args=(QueryBudgetTests.group.slug,)),
+            reverse('posts:profile', args=(QueryBudgetTests.author.username,)),
+            reverse('posts:post_detail', args=(QueryBudgetTests.post.id,)),
+            reverse('posts:comments', args=(QueryBudgetTests.post.id,)),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=пост',
+        )
+
+    def test_views_fit_query_budget(self):
+        """Страницы укладываются в бюджет запросов и не дают N+1."""
+        for url in self.get_urls():
+            for client in (self.client, self.reader_client):
+                with self.subTest(url=url, user=client is self.client):
+                    cache.clear()
+                    response = client.get(url)
+                    self.assertWithinQueryBudget(response)
+
+    def test_write_views_fit_query_budget(self):
+        """Формы и подписки укладываются в бюджет запросов."""
+        author_client = Client()
+        author_client.force_login(QueryBudgetTests.author)
+        username = QueryBudgetTests.author.username
+        post_id = QueryBudgetTests.post.id
+        requests = (
+            (author_client.get, reverse('posts:post_create'), None),
+            (author_client.get, reverse('posts:post_edit', args=(post_id,)),
+             None),
+            (author_client.post, reverse('posts:post_create'),
+             {'text': 'Новый пост', 'group': QueryBudgetTests.group.id}),
+            (author_client.post, reverse('posts:post_edit', args=(post_id,)),
+             {'text': 'Исправленный пост',
+              'group': QueryBudgetTests.group.id}),
+            (self.reader_client.post,
+             reverse('posts:add_comment', args=(post_id,)),
+             {'text': 'Комментарий'}),
+            (self.reader_client.get,
+             reverse('posts:profile_unfollow', args=(username,)), None),
+            (self.reader_client.get,
+             reverse('posts:profile_follow', args=(username,)), None),
+        )
+        for method, url, data in requests:
+            with self.subTest(url=url, method=method.__name__):
+                response = method(url, data)
+                self.assertWithinQueryBudget(response)
+
+    def test_follow_index_with_popular_author_fits_query_budget(self):
+        """Лента с подтягиванием постов популярных авторов - в бюджете."""
+        with mock.patch.object(timeline, 'FANOUT_MAX_FOLLOWERS', 0):
+            response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertWithinQueryBudget(response)
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers(self):
+        """В режиме DEBUG число запросов видно в заголовках."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            int(response['X-Query-Count']),
+            response.query_stats.count
+        )
+        self.assertIn('X-Query-Budget', response)
+
+
+class AutocommitQueryBudgetTests(QueryBudgetTestMixin, TransactionTestCase):
+    """Бюджеты записи в режиме autocommit, как в рабочем запросе.
+
+    Вне транзакции теста atomic и bulk_create выполняют BEGIN и
+    SAVEPOINT; бюджет их не считает.
+    """
+
+    def setUp(self):
+        group = Group.objects.create(title='Группа', slug='group')
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        # С подписчиком автор популярен при FANOUT_MAX_FOLLOWERS = 0
+        Follow.objects.create(
+            user=User.objects.create_user(username='follower'),
+            author=self.author
+        )
+        for i in range(OBJ_PER_PAGE + 1):
+            Post.objects.create(
+                author=self.author, group=group, text=f'Пост №{i}'
+            )
+        self.group = group
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        cache.clear()
+
+    def test_writes_fit_query_budget(self):
+        username = self.author.username
+        with mock.patch.object(timeline, 'FANOUT_MAX_FOLLOWERS', 0):
+            follow = self.reader_client.get(
+                reverse('posts:profile_follow', args=(username,))
+            )
+            feed = self.reader_client.get(reverse('posts:follow_index'))
+        create = self.author_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Новый пост', 'group': self.group.id}
+        )
+        self.assertTrue(any(
+            is_transaction_control(sql) for sql in feed.query_stats.queries
+        ))
+        for response in (follow, feed, create):
+            with self.subTest(view=response.query_stats.view_name):
+                self.assertWithinQueryBudget(response)
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import QueryPlanTestMixin
+from ..models import Comment, Follow, Group, Post
+from ..utils import OBJ_PER_PAGE
+
+User = get_user_model()
+
+
+class QueryPlanTests(QueryPlanTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(OBJ_PER_PAGE * 2):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                group=cls.group if i % 2 else None,
+                text=f'Пост №{i}'
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='Комментарий'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(QueryPlanTests.reader)
+
+    def test_read_views_use_indexes(self):
+        """Страницы не сканируют таблицы и не сортируют во временном дереве."""
+        page_two = {'page': 2}
+        urls = (
+            (reverse('posts:index'), {}),
+            (reverse('posts:index'), page_two),
+            (reverse('posts:group_posts', args=(QueryPlanTests.group.slug,)),
+             page_two),
+            (reverse('posts:profile', args=(QueryPlanTests.author.username,)),
+             page_two),
+            (reverse('posts:post_detail', args=(QueryPlanTests.post.id,)), {}),
+            (reverse('posts:comments', args=(QueryPlanTests.post.id,)), {}),
+            (reverse('posts:follow_index'), page_two),
+        )
+        for url, params in urls:
+            with self.subTest(url=url, params=params):
+                cache.clear()
+                with self.assertEfficientQueryPlans():
+                    self.reader_client.get(url, params)
+
+    def test_api_lists_use_indexes(self):
+        """Списки API читаются по индексу так же, как страницы."""
+        post_id = QueryPlanTests.post.id
+        urls = (
+            reverse('api_v1:posts'),
+            reverse('api_v1:group_posts', args=(QueryPlanTests.group.slug,)),
+            reverse('api_v1:profile_posts',
+                    args=(QueryPlanTests.author.username,)),
+            reverse('api_v1:comments', args=(post_id,)),
+            reverse('api_v1:follow'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertEfficientQueryPlans():
+                    self.reader_client.get(url, {'since_id': 1})
+
+    def test_follow_lookup_uses_unique_index(self):
+        """Подписка проверяется по уникальному индексу (user, author)."""
+        with self.assertEfficientQueryPlans():
+            self.reader_client.get(reverse(
+                'posts:profile_follow',
+                args=(QueryPlanTests.author.username,)
+            ))
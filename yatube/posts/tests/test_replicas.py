@@ -0,0 +1,149 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import routers
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry, User
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Реплика - вторая SQLite-база, копия основной из copy_database.
+
+    Без транзакции теста: backup API не пишет в базу с открытой
+    транзакцией.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        # Посты setUp созданы вплотную к копии, запас не нужен
+        margin = mock.patch.object(routers, 'POSITION_MARGIN', 0)
+        margin.start()
+        self.addCleanup(margin.stop)
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, text='Старый пост')
+        # Первый показ заводит поколения страниц, дальше они известны
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:post_detail', args=(self.post.id,)))
+        routers.copy_database('replica')
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_feeds_read_from_replica(self):
+        """Без изменений после копии ленты читаются с реплики."""
+        detail = reverse('posts:post_detail', args=(self.post.id,))
+        for client, url in ((self.client, reverse('posts:index')),
+                            (self.author_client, detail)):
+            with self.subTest(url=url), \
+                    CaptureQueriesContext(connections['replica']) as queries:
+                self.assertContains(client.get(url), 'Старый пост')
+                self.assertTrue(queries)
+
+    def test_stale_replica_is_not_cached(self):
+        """Изменения после копии читаются из основной базы и видны в
+        ленте до и после синхронизации, ETag меняется."""
+        index = reverse('posts:index')
+        etag = self.client.get(index)['ETag']
+        fresh = Post.objects.create(
+            author=self.author, text='Только в основной'
+        )
+        response = self.client.get(index)
+        self.assertContains(response, 'Только в основной')
+        self.assertNotEqual(response['ETag'], etag)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(fresh.id,))
+        )
+        self.assertEqual(response.status_code, 200)
+
+        routers.copy_database('replica')
+        response = self.client.get(index, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Только в основной')
+
+    def test_unknown_position_reads_primary(self):
+        cache.delete(routers.POSITION_KEY.format(alias='replica'))
+        with CaptureQueriesContext(connections['replica']) as queries:
+            self.client.get(reverse('posts:index'))
+        self.assertFalse(queries)
+
+    def test_unsynced_replica_is_not_used(self):
+        """Пустой файл реплики без позиции не читается ни одной view."""
+        cache.delete(routers.POSITION_KEY.format(alias='replica'))
+        with mock.patch.object(routers, 'require_fresh'), \
+                CaptureQueriesContext(connections['replica']) as queries:
+            self.client.get(reverse('posts:index'))
+        self.assertFalse(queries)
+
+    def test_timeline_reads_primary(self):
+        """Ленту подписок без поколений не проверить на свежесть."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        routers.copy_database('replica')
+        TimelineEntry.objects.filter(user=reader).delete()
+        with connections['replica'].cursor() as cursor:
+            cursor.execute(
+                f'DROP TABLE {TimelineEntry._meta.db_table}'
+            )
+        reader_client = Client()
+        reader_client.force_login(reader)
+        for url in (reverse('posts:follow_index'),
+                    reverse('api_v1:follow')):
+            with self.subTest(url=url):
+                response = reader_client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_write_pins_browser_to_primary(self):
+        """После записи браузер автора не читает с реплики."""
+        response = self.author_client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост автора'}
+        )
+        self.assertIn('primary_until', response.cookies)
+        profile = reverse('posts:profile', args=('author',))
+        with mock.patch.object(routers, 'read_from_replica') as replica:
+            self.assertContains(self.author_client.get(profile),
+                                'Новый пост автора')
+            replica.assert_not_called()
+            self.client.get(profile)
+            replica.assert_called_once()
+        with mock.patch('core.middleware.time.time',
+                        return_value=10 ** 10), \
+                mock.patch.object(routers, 'read_from_replica') as replica:
+            self.author_client.get(profile)
+            replica.assert_called_once()
+
+    def test_own_feed_pull_does_not_pin(self):
+        """Подтягивание постов популярных авторов в ленту при чтении не
+        закрепляет читателя за основной базой."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        routers.copy_database('replica')
+        reader_client = Client()
+        reader_client.force_login(reader)
+        with mock.patch.object(timeline, 'FANOUT_MAX_FOLLOWERS', 0):
+            cache.delete(timeline.POPULAR_AUTHORS_KEY)
+            TimelineEntry.objects.filter(user=reader).delete()
+            response = reader_client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Старый пост')
+        self.assertTrue(TimelineEntry.objects.filter(user=reader).exists())
+        self.assertNotIn('primary_until', response.cookies)
+
+    def test_writes_and_other_views_use_primary(self):
+        router = routers.ReplicaRouter()
+        self.assertEqual(router.db_for_write(Post), DEFAULT_DB_ALIAS)
+        self.assertIsNone(router.db_for_read(Post))
+        Post.objects.create(
+            author=self.author, text='Черновик в основной'
+        )
+        response = self.author_client.get(
+            reverse('posts:post_edit', args=(self.post.id,))
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            router.allow_migrate('replica', 'posts', model_name='post')
+        )
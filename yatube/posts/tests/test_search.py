@@ -0,0 +1,98 @@
+from http import HTTPStatus
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..search import stem
+from ..utils import OBJ_PER_PAGE
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.cat_post = Post.objects.create(
+            author=cls.user,
+            text='Красивые коты гуляли по крыше'
+        )
+        cls.dog_post = Post.objects.create(
+            author=cls.user,
+            text='Собака лаяла на кота, кота и ещё раз кота'
+        )
+        cls.comment = Comment.objects.create(
+            author=cls.user,
+            post=cls.dog_post,
+            text='Отличные собаки'
+        )
+        cls.url = reverse('posts:search')
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, **params):
+        response = self.client.get(SearchTests.url, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.context['page_obj']
+
+    def test_stem_reduces_word_forms(self):
+        """Разные формы слова сводятся к одной основе."""
+        for word in ('коты', 'котами', 'котов'):
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), stem('кот'))
+
+    def test_search_finds_word_forms_ranked(self):
+        """Поиск находит формы слова, чаще упомянутые - выше."""
+        found = [post.id for post in self.search(q='Котом')]
+        self.assertEqual(
+            found,
+            [SearchTests.dog_post.id, SearchTests.cat_post.id]
+        )
+
+    def test_search_in_comments(self):
+        """Поиск по комментариям."""
+        found = list(self.search(q='собака', type='comments'))
+        self.assertEqual(found, [SearchTests.comment])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = Post.objects.create(author=SearchTests.user, text='Жираф')
+        self.assertEqual(list(self.search(q='жирафы')), [post])
+        post.text = 'Слон'
+        post.save()
+        self.assertEqual(list(self.search(q='жираф')), [])
+        post.delete()
+        self.assertEqual(list(self.search(q='слон')), [])
+
+    def test_search_cursor_pagination(self):
+        """Курсор ведет по всем результатам без повторов."""
+        Post.objects.bulk_create(
+            Post(author=SearchTests.user, text=f'Попугай номер {i}')
+            for i in range(OBJ_PER_PAGE + 2)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        page = self.search(q='попугаи')
+        found = [post.id for post in page]
+        self.assertEqual(len(found), OBJ_PER_PAGE)
+        page = self.search(q='попугаи', after=page.next_cursor)
+        found += [post.id for post in page]
+        self.assertIsNone(page.next_cursor)
+        self.assertEqual(len(set(found)), OBJ_PER_PAGE + 2)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит формы слова."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'),
+            {'q': 'котам'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 2)
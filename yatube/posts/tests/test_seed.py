@@ -0,0 +1,64 @@
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from .. import counters
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+UNTIL = datetime(2024, 1, 1, tzinfo=timezone.utc)
+SEED_OPTIONS = {
+    'users': 30,
+    'groups': 3,
+    'posts': 200,
+    'comments': 100,
+    'follows': 5,
+    'images': 1,
+    'until': '2024-01-01',
+    'seed': 7,
+    'stdout': StringIO(),
+}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class SeedCommandTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self):
+        call_command('seed', **SEED_OPTIONS)
+        return list(
+            Post.objects.order_by('created').values_list(
+                'author__username', 'group__slug', 'text', 'created'
+            )
+        )
+
+    def test_volumes_and_derived_data(self):
+        """Команда создает данные и согласованные производные таблицы."""
+        self.seed()
+        self.assertEqual(User.objects.count(), SEED_OPTIONS['users'])
+        self.assertEqual(Group.objects.count(), SEED_OPTIONS['groups'])
+        self.assertEqual(Post.objects.count(), SEED_OPTIONS['posts'])
+        self.assertEqual(Comment.objects.count(), SEED_OPTIONS['comments'])
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertFalse(
+            Post.objects.filter(created__gt=UNTIL).exists()
+        )
+        self.assertEqual(set(counters.reconcile().values()), {0})
+
+    def test_deterministic(self):
+        """Одинаковый seed дает одинаковые данные."""
+        with transaction.atomic():
+            first = self.seed()
+            transaction.set_rollback(True)
+        self.assertEqual(self.seed(), first)
@@ -0,0 +1,79 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..thumbnails import THUMBNAIL_GEOMETRIES, generate, ready_thumbnail
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif')
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(ThumbnailsTests.user)
+
+    def get_detail(self):
+        return self.client.get(reverse(
+            'posts:post_detail',
+            kwargs={'post_id': ThumbnailsTests.post.id}
+        ))
+
+    def test_placeholder_until_generated(self):
+        """Пока миниатюры нет, страница выводит заглушку и не строит ее."""
+        response = self.get_detail()
+        self.assertContains(response, 'thumbnail-placeholder')
+        self.assertNotContains(response, '<img class="card-img')
+        geometry, options = THUMBNAIL_GEOMETRIES[0]
+        self.assertIsNone(
+            ready_thumbnail(ThumbnailsTests.post.image, geometry, **options)
+        )
+
+        generate(ThumbnailsTests.post.image.name)
+        cache.clear()
+        response = self.get_detail()
+        self.assertContains(response, '<img class="card-img')
+        self.assertNotContains(response, 'thumbnail-placeholder')
+
+    def test_upload_does_not_generate_on_request(self):
+        """Загрузка картинки через форму не строит миниатюры в запросе."""
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Новый пост',
+            'image': SimpleUploadedFile('new.gif', SMALL_GIF, 'image/gif'),
+        })
+        post = Post.objects.get(text='Новый пост')
+        for geometry, options in THUMBNAIL_GEOMETRIES:
+            self.assertIsNone(ready_thumbnail(post.image, geometry, **options))
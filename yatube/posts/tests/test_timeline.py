@@ -0,0 +1,141 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(TimelineTests.reader)
+
+    def get_feed_ids(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return [post.id for post in response.context['page_obj']]
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет старые посты в ленту, отписка убирает."""
+        self.reader_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': TimelineTests.author.username}
+        ))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=TimelineTests.reader,
+            post=TimelineTests.old_post
+        ).exists())
+
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': TimelineTests.author.username}
+        ))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=TimelineTests.reader).exists()
+        )
+        self.assertEqual(self.get_feed_ids(), [])
+
+    @mock.patch.object(timeline, 'BACKFILL_POSTS', 1)
+    def test_backfill_takes_latest_posts(self):
+        """В ленту нового подписчика попадают только последние посты."""
+        post = Post.objects.create(
+            author=TimelineTests.author,
+            text='Новый пост'
+        )
+        Follow.objects.create(
+            user=TimelineTests.reader,
+            author=TimelineTests.author
+        )
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=TimelineTests.reader
+            ).values_list('post_id', flat=True)),
+            [post.id]
+        )
+
+    @mock.patch.object(timeline, 'FANOUT_MAX_FOLLOWERS', 0)
+    def test_popular_author_is_not_backfilled(self):
+        """Старые посты популярного автора подтягиваются при чтении,
+        даже если читатель уже открывал ленту."""
+        Post.objects.filter(pk=TimelineTests.old_post.pk).update(
+            created=timezone.now() - timedelta(days=1)
+        )
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=TimelineTests.reader, author=other)
+        self.assertEqual(self.get_feed_ids(), [])
+        cache.delete(timeline.POPULAR_AUTHORS_KEY)
+        Follow.objects.create(
+            user=TimelineTests.reader,
+            author=TimelineTests.author
+        )
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=TimelineTests.reader
+        ).exists())
+        self.assertEqual(self.get_feed_ids(), [TimelineTests.old_post.id])
+
+    def test_new_post_is_fanned_out(self):
+        """Новый пост сразу попадает в ленты подписчиков."""
+        Follow.objects.create(
+            user=TimelineTests.reader,
+            author=TimelineTests.author
+        )
+        post = Post.objects.create(
+            author=TimelineTests.author,
+            text='Новый пост'
+        )
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=TimelineTests.reader,
+            post=post
+        ).exists())
+        self.assertEqual(
+            self.get_feed_ids(),
+            [post.id, TimelineTests.old_post.id]
+        )
+
+    @mock.patch.object(timeline, 'FANOUT_MAX_FOLLOWERS', 0)
+    def test_popular_author_is_read_on_demand(self):
+        """Посты популярного автора не раскладываются при записи."""
+        Follow.objects.create(
+            user=TimelineTests.reader,
+            author=TimelineTests.author
+        )
+        post = Post.objects.create(
+            author=TimelineTests.author,
+            text='Пост популярного автора'
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=post).exists()
+        )
+        self.assertIn(post.id, self.get_feed_ids())
+
+    @mock.patch.object(timeline, 'FANOUT_MAX_FOLLOWERS', 0)
+    def test_rebuild_pulls_popular_authors_again(self):
+        """После rebuild старые посты популярного автора снова в ленте."""
+        Post.objects.filter(pk=TimelineTests.old_post.pk).update(
+            created=timezone.now() - timedelta(days=1)
+        )
+        Follow.objects.create(
+            user=TimelineTests.reader,
+            author=TimelineTests.author
+        )
+        self.assertIn(TimelineTests.old_post.id, self.get_feed_ids())
+        timeline.rebuild()
+        self.assertIn(TimelineTests.old_post.id, self.get_feed_ids())
@@ -8,11 +8,19 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Post, Group, Follow, Comment
-from ..utils import get_urls_info, get_reversed_names, OBJ_PER_PAGE
+from core.paginators import MAX_NUMBERED_PAGE, PAGE_WINDOW
+from ..models import Post, Group, Follow, Comment, UserCounters
+from ..utils import (
+    COMMENTS_PER_PAGE,
+    OBJ_PER_PAGE,
+    get_reversed_names,
+    get_urls_info,
+)
 
 User = get_user_model()
 
@@ -277,21 +285,38 @@ class PostsViewTests(TestCase):
         )
 
     def test_cache_index_page(self):
-        """Страница Index сохраняет кэш."""
+        """Страница Index сохраняет кэш до изменения постов."""
 
         reversed_name = reverse('posts:index')
 
         response = self.authorized_client.get(reversed_name)
         cached_context = response.content
-        post = Post.objects.all().order_by('-id')[0]
-        post.delete()
+        Post.objects.filter(pk=PostsViewTests.post.pk).update(
+            text='Текст, измененный в обход сигналов'
+        )
         response = self.authorized_client.get(reversed_name)
         self.assertEqual(response.content, cached_context)
 
-        cache.clear()
+        post = Post.objects.all().order_by('-id')[0]
+        post.delete()
         response = self.authorized_client.get(reversed_name)
         self.assertNotEqual(response.content, cached_context)
 
+    def test_cache_varies_by_audience_and_group(self):
+        """Кэш различает аудиторию, а правка группы его сбрасывает."""
+        reversed_name = reverse('posts:index')
+        anonymous = self.client.get(reversed_name).content
+        authorized = self.authorized_client.get(reversed_name).content
+        self.assertNotEqual(anonymous, authorized)
+
+        group_url = PostsViewTests.reversed_names['posts:group_posts']
+        self.client.get(group_url)
+        group = Group.objects.get(pk=PostsViewTests.group.pk)
+        group.title = 'Новое название группы'
+        group.save()
+        response = self.client.get(group_url)
+        self.assertContains(response, 'Новое название группы')
+
 
 class PaginatorViewTest(TestCase):
     @classmethod
@@ -360,3 +385,164 @@ class PaginatorViewTest(TestCase):
                         len(response.context['page_obj']),
                         obj_left % (OBJ_PER_PAGE + 1)
                     )
+
+
+class CursorPaginatorViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='CursorAuthor')
+        cls.NUMBER_OF_POSTS = OBJ_PER_PAGE * 2 + 3
+        for i in range(cls.NUMBER_OF_POSTS):
+            Post.objects.create(
+                author=cls.user,
+                text='Тестовый текст поста №' + str(i)
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages_walk_all_posts_once(self):
+        """Курсорные страницы отдают все посты по одному разу."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        seen = [post.id for post in response.context['page_obj']]
+        next_cursor = response.context['page_obj'].next_cursor
+        while next_cursor:
+            response = self.client.get(url, {'after': next_cursor})
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            page = response.context['page_obj']
+            seen.extend(post.id for post in page)
+            next_cursor = page.next_cursor
+
+        expected = list(
+            Post.objects.order_by('-created', '-id').values_list(
+                'id', flat=True
+            )
+        )
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_returns_404(self):
+        """Некорректный курсор дает 404."""
+        response = self.client.get(reverse('posts:index'), {'after': '%%%'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_deep_numbered_page_returns_404(self):
+        """Глубокие нумерованные страницы недоступны."""
+        response = self.client.get(
+            reverse('posts:index'),
+            {'page': MAX_NUMBERED_PAGE + 1}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class WindowedPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='WindowAuthor')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост №{i}')
+            for i in range(OBJ_PER_PAGE * (MAX_NUMBERED_PAGE + 2))
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_window_around_current_page(self):
+        """Ссылки только на соседние страницы, а не на все."""
+        response = self.client.get(reverse('posts:index'), {'page': 5})
+        page = response.context['page_obj']
+        self.assertEqual(
+            list(page.page_window),
+            list(range(5 - PAGE_WINDOW, 5 + PAGE_WINDOW + 1))
+        )
+        self.assertTrue(page.paginator.is_truncated)
+
+    def test_count_is_bounded_and_cached(self):
+        """COUNT ограничен видимыми страницами и не повторяется."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertEqual(
+            response.context['paginator'].count,
+            OBJ_PER_PAGE * MAX_NUMBERED_PAGE + 1
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'page': 2})
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries.captured_queries)
+        )
+
+    def test_profile_uses_denormalized_count(self):
+        """Профиль берет число постов из счетчика автора."""
+        UserCounters.objects.filter(user=WindowedPaginatorTest.user).update(
+            posts_count=OBJ_PER_PAGE * 3
+        )
+        response = self.client.get(reverse(
+            'posts:profile', args=(WindowedPaginatorTest.user.username,)
+        ))
+        self.assertEqual(
+            response.context['paginator'].count, OBJ_PER_PAGE * 3
+        )
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Commentator')
+        cls.post = Post.objects.create(author=cls.user, text='Горячий пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий №{i}')
+            for i in range(COMMENTS_PER_PAGE * 2 + 1)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_newest_comments_only(self):
+        """На странице поста только первая страница новых комментариев."""
+        response = self.client.get(reverse(
+            'posts:post_detail', args=(CommentsPaginationTest.post.id,)
+        ))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertEqual(
+            comments[0],
+            Comment.objects.order_by('-created', '-pk').first()
+        )
+        self.assertContains(response, 'data-comments-more')
+
+    def test_comment_pages_walk_all_comments_once(self):
+        """Фрагменты по курсору отдают каждый комментарий ровно один раз."""
+        post_id = CommentsPaginationTest.post.id
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post_id,))
+        )
+        seen = [comment.id for comment in response.context['comments']]
+        cursor = response.context['comments'].next_cursor
+        while cursor:
+            response = self.client.get(
+                reverse('posts:comments', args=(post_id,)), {'after': cursor}
+            )
+            self.assertTemplateUsed(
+                response, 'posts/includes/comment_list.html'
+            )
+            page = response.context['comments']
+            seen += [comment.id for comment in page]
+            cursor = page.next_cursor
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), COMMENTS_PER_PAGE * 2 + 1)
+        self.assertNotContains(response, 'data-comments-more')
+
+    def test_invalid_cursor_or_post_returns_404(self):
+        """Битый курсор и несуществующий пост - 404."""
+        urls = (
+            (reverse('posts:comments', args=(CommentsPaginationTest.post.id,)),
+             {'after': '!!!'}),
+            (reverse('posts:comments', args=(0,)), {}),
+        )
+        for url, params in urls:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
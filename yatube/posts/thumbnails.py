@@ -0,0 +1,119 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Миниатюры всех геометрий из THUMBNAIL_GEOMETRIES строятся в пуле
+процессов сразу после загрузки картинки. Шаблоны только ищут готовую
+миниатюру в kvstore sorl-thumbnail и до ее появления выводят заглушку,
+поэтому декодирование и ресайз никогда не выполняются во время запроса.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import fragments
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_GEOMETRIES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+_executor = None
+
+
+def _workers() -> int:
+    return getattr(settings, 'THUMBNAIL_WORKERS', os.cpu_count() or 1)
+
+
+def _init_worker(settings_module: str) -> None:
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=_workers(),
+            mp_context=get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(os.environ['DJANGO_SETTINGS_MODULE'],)
+        )
+    return _executor
+
+
+def generate(image_name: str) -> str:
+    """Строит миниатюры всех геометрий (выполняется в процессе пула)."""
+    for geometry, options in THUMBNAIL_GEOMETRIES:
+        default.backend.get_thumbnail(image_name, geometry, **options)
+    return image_name
+
+
+def ready_thumbnail(file_, geometry: str, **options) -> Optional[ImageFile]:
+    """Готовая миниатюра из kvstore или None, сама ничего не строит.
+
+    Повторяет вычисление имени из ThumbnailBackend.get_thumbnail,
+    чтобы найти ту же запись, что создаст generate().
+    """
+    backend = default.backend
+    source = ImageFile(file_)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def _done(post_scopes: Iterable[str]):
+    def callback(future):
+        try:
+            future.result()
+        except Exception:
+            logger.exception('Не удалось построить миниатюры')
+            return
+        fragments.bump(*post_scopes)
+    return callback
+
+
+def schedule(post) -> None:
+    """Ставит миниатюры картинки поста в очередь после коммита."""
+    if not post.image:
+        return
+    image_name = post.image.name
+    post_scopes = (
+        fragments.ALL_POSTS,
+        fragments.author_scope(post.author_id),
+        fragments.post_scope(post.pk),
+    ) + ((fragments.group_scope(post.group_id),) if post.group_id else ())
+
+    def submit():
+        if _workers() == 0:
+            generate(image_name)
+            fragments.bump(*post_scopes)
+            return
+        future = _get_executor().submit(generate, image_name)
+        future.add_done_callback(_done(post_scopes))
+
+    transaction.on_commit(submit)
+
+
+def generate_many(image_names: Iterable[str]):
+    """Строит миниатюры набора картинок на всех ядрах, отдает имена."""
+    if _workers() == 0:
+        yield from map(generate, image_names)
+        return
+    yield from _get_executor().map(generate, image_names, chunksize=8)
@@ -0,0 +1,216 @@
+"""Материализованная лента подписок.
+
+Посты обычных авторов раскладываются по лентам подписчиков при публикации
+(fan-out-on-write). Посты популярных авторов не раскладываются: читатель
+подтягивает их в свою ленту сам при открытии страницы (fan-out-on-read),
+поэтому один пост не порождает миллионы записей.
+"""
+import time
+from datetime import timedelta
+from itertools import islice
+from typing import Iterable
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.routers import internal_writes, use_primary
+
+from . import follows
+from .models import Follow, Post, TimelineEntry, UserCounters
+
+FANOUT_MAX_FOLLOWERS = 1000
+POPULAR_AUTHORS_KEY = 'timeline:popular_authors'
+POPULAR_AUTHORS_TTL = 60 * 10
+PULLED_AT_KEY = 'timeline:pulled_at:{generation}:{user_id}'
+# rebuild() стирает подтянутые записи, новое поколение сбрасывает все
+# отметки pulled_at, и популярные авторы подтягиваются заново целиком
+PULL_GENERATION_KEY = 'timeline:pull_generation'
+PULL_OVERLAP = timedelta(seconds=5)
+# Сколько последних постов автора попадает в ленту нового подписчика
+BACKFILL_POSTS = 100
+BATCH_SIZE = 500
+TIMELINE_ORDERING = ('-created', '-post_id')
+POST_ORDERING = ('-created', '-id')
+
+
+def _bulk_add(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _entries_for_posts(user_id, posts):
+    for post_id, author_id, created in posts.values_list(
+            'id', 'author_id', 'created').iterator():
+        yield TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            created=created
+        )
+
+
+def _pull_generation() -> int:
+    generation = cache.get(PULL_GENERATION_KEY)
+    if generation is None:
+        # После вытеснения ключа поколение не совпадет со старыми
+        cache.add(PULL_GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(PULL_GENERATION_KEY)
+    return generation
+
+
+def popular_author_ids() -> frozenset:
+    """Авторы, у которых подписчиков больше FANOUT_MAX_FOLLOWERS."""
+    author_ids = cache.get(POPULAR_AUTHORS_KEY)
+    if author_ids is None:
+        author_ids = frozenset(
+            UserCounters.objects.filter(
+                followers_count__gt=FANOUT_MAX_FOLLOWERS
+            ).values_list('user_id', flat=True)
+        )
+        cache.set(POPULAR_AUTHORS_KEY, author_ids, POPULAR_AUTHORS_TTL)
+    return author_ids
+
+
+def fan_out(post: Post) -> None:
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if post.author_id in popular_author_ids():
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_add(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.id,
+            author_id=post.author_id,
+            created=post.created
+        )
+        for user_id in follower_ids.iterator()
+    )
+
+
+def backfill(user_id: int, author_id: int) -> None:
+    """Добавляет в ленту подписчика последние посты нового автора.
+
+    Посты популярного автора не пишутся: сброс отметки pulled_at
+    заставит pull() подтянуть их при следующем открытии ленты.
+    """
+    if author_id in popular_author_ids():
+        cache.delete(PULLED_AT_KEY.format(
+            generation=_pull_generation(), user_id=user_id
+        ))
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        *POST_ORDERING
+    )[:BACKFILL_POSTS]
+    _bulk_add(_entries_for_posts(user_id, posts))
+
+
+def prune(user_id: int, author_id: int) -> None:
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def pull(user_id: int) -> None:
+    """Подтягивает в ленту новые посты популярных авторов из подписок."""
+    popular = popular_author_ids()
+    if not popular:
+        return
+    author_ids = sorted(follows.following_ids(user_id) & popular)
+    if not author_ids:
+        return
+    key = PULLED_AT_KEY.format(
+        generation=_pull_generation(), user_id=user_id
+    )
+    pulled_at = cache.get(key)
+    now = timezone.now()
+    posts = Post.objects.filter(author_id__in=author_ids)
+    if pulled_at is not None:
+        posts = posts.filter(created__gte=pulled_at - PULL_OVERLAP)
+    else:
+        # Первое подтягивание - последние посты, а не вся история авторов
+        posts = posts.order_by(*POST_ORDERING)[
+            :BACKFILL_POSTS * len(author_ids)
+        ]
+    # Отметка pulled_at - время основной базы: на отстающей реплике
+    # новые посты пропали бы из ленты навсегда. Запись в свою ленту при
+    # чтении - не действие пользователя и не закрепляет его за основной
+    with use_primary(), internal_writes():
+        _bulk_add(_entries_for_posts(user_id, posts))
+    cache.set(key, now, None)
+
+
+def entries_for(user_id: int):
+    """Лента пользователя: один проход по индексу (user, created, post).
+
+    Авторов и группы постов догружает карта идентичности view: их в
+    ленте немного, и каждый читается один раз на страницу.
+    """
+    pull(user_id)
+    return TimelineEntry.objects.filter(user_id=user_id).select_related(
+        'post'
+    )
+
+
+def _fan_out_sql(condition: str = ''):
+    """INSERT ... SELECT записей ленты для постов, подходящих под condition.
+
+    Популярных авторов пропускает так же, как fan_out.
+    """
+    popular = sorted(popular_author_ids())
+    entry, follow, post = (
+        model._meta.db_table for model in (TimelineEntry, Follow, Post)
+    )
+    sql = (
+        f'INSERT INTO {entry} (user_id, post_id, author_id, created) '
+        f'SELECT f.user_id, p.id, p.author_id, p.created '
+        f'FROM {follow} f JOIN {post} p ON p.author_id = f.author_id '
+        f'WHERE 1 = 1'
+    )
+    if popular:
+        placeholders = ', '.join(['%s'] * len(popular))
+        sql += f' AND f.author_id NOT IN ({placeholders})'
+    if condition:
+        sql += f' AND {condition}'
+    return sql, popular
+
+
+def fan_out_posts(post_ids: Iterable[int]) -> int:
+    """Раскладывает по лентам новые посты с id из post_ids.
+
+    Для массовой загрузки: один запрос на пачку постов вместо fan_out
+    на каждый. Возвращает число записей.
+    """
+    total = 0
+    post_ids = iter(post_ids)
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(islice(post_ids, BATCH_SIZE))
+            if not batch:
+                return total
+            placeholders = ', '.join(['%s'] * len(batch))
+            sql, params = _fan_out_sql(f'p.id IN ({placeholders})')
+            cursor.execute(sql, params + batch)
+            total += cursor.rowcount
+
+
+def rebuild() -> int:
+    """Пересобирает все ленты одним INSERT ... SELECT.
+
+    Для массовой загрузки данных в обход сигналов: построчный fan_out
+    на миллионах постов слишком медленный. Посты популярных авторов
+    читатели подтянут заново при следующем открытии ленты. Возвращает
+    число записей.
+    """
+    cache.delete(POPULAR_AUTHORS_KEY)
+    cache.set(PULL_GENERATION_KEY, time.time_ns(), None)
+    sql, params = _fan_out_sql()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TimelineEntry._meta.db_table}')
+        cursor.execute(sql, params)
+        return cursor.rowcount
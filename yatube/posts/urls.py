@@ -1,5 +1,6 @@
 from django.urls import path
 
+from core import querybudget
 from . import views
 
 app_name = 'posts'
@@ -26,7 +27,11 @@ urlpatterns = [
     path('posts/<int:post_id>/comment/',
          views.AddComment.as_view(),
          name='add_comment'),
+    path('posts/<int:post_id>/comments/',
+         views.PostComments.as_view(),
+         name='comments'),
     path('follow/', views.FollowIndex.as_view(), name='follow_index'),
+    path('search/', views.Search.as_view(), name='search'),
     path(
         'profile/<str:username>/follow/',
         views.ProfileFollow.as_view(),
@@ -38,3 +43,22 @@ urlpatterns = [
         name='profile_unfollow'
     )
 ]
+
+
+querybudget.declare(app_name, {
+    'index': 5,
+    'group_posts': 7,
+    'profile': 8,
+    'post_detail': 6,
+    # С популярными авторами: подтягивание их постов в ленту. Авторы и
+    # группы постов - по IN-запросу через карту идентичности
+    'follow_index': 10,
+    'search': 6,
+    # Публикация: счетчик автора, раскладка по лентам, поисковый индекс
+    'post_create': {'GET': 4, 'POST': 11},
+    'post_edit': {'GET': 7, 'POST': 9},
+    'add_comment': 8,
+    'comments': 4,
+    'profile_follow': 12,
+    'profile_unfollow': 9,
+})
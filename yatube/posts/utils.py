@@ -3,6 +3,7 @@ from typing import Tuple, Dict
 from django.urls import reverse
 
 OBJ_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
 
 
 def get_urls_info(
@@ -1,35 +1,125 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.paginator import InvalidPage
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.shortcuts import redirect
 from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
 from django.views import View
-from django.views.generic import ListView, DetailView
+from django.views.generic import ListView, DetailView, TemplateView
 from django.views.generic.edit import CreateView, UpdateView
 
+from core import routers
+from core.mixins import (
+    ConditionalGetMixin,
+    CursorPaginationMixin,
+    IdentityMapMixin,
+)
+from core.paginators import CURSOR_ORDERING, CursorPaginator, decode_cursor
+from . import counters, follows, fragments, search, thumbnails, timeline
 from .forms import CommentForm, PostForm
 from .models import Group, Post, User, Follow, Comment
-from .utils import OBJ_PER_PAGE
+from .utils import COMMENTS_PER_PAGE, OBJ_PER_PAGE
+
+
+def comments_page(post_id, after=None):
+    """Страница комментариев поста, новые сверху.
+
+    Запрос выполняется при первом обращении к странице, то есть внутри
+    {% cache %}: при попадании в кэш комментарии не читаются.
+    """
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id)
+        .select_related('author').order_by(*CURSOR_ORDERING),
+        COMMENTS_PER_PAGE
+    )
+    if after is None:
+        return SimpleLazyObject(
+            lambda: paginator.page_from(paginator.object_list)
+        )
+    return SimpleLazyObject(lambda: paginator.page_after(after))
+
+
+class FragmentValidatorsMixin(IdentityMapMixin, ConditionalGetMixin):
+    """ETag и Last-Modified из поколений фрагментов страницы.
+
+    Поколения увеличиваются сигналами при любой записи, которую видно на
+    странице, поэтому проверка не обращается к постам и комментариям.
+    """
+    read_from_replica = True
+
+    def get_fragment_scopes(self):
+        raise NotImplementedError
+
+    def dispatch(self, request, *args, **kwargs):
+        # Поколения берутся из основного кэша, поэтому страницу можно
+        # читать с реплики, только если та уже видела все ее изменения
+        # Без поколений свежесть реплики не проверить - основная база
+        with routers.use_primary():
+            scopes = self.get_fragment_scopes()
+        routers.require_fresh(
+            fragments.last_modified(scopes) if scopes else None
+        )
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_etag(self):
+        request = self.request
+        user = request.user
+        parts = (
+            request.get_full_path(),
+            f'u{user.pk}' if user.is_authenticated else 'anon',
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+            fragments.generations(self.get_fragment_scopes()),
+        )
+        return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+    def get_last_modified(self):
+        return fragments.last_modified(self.get_fragment_scopes())
+
+    def get_count_key(self):
+        """Число постов живет, пока не сменятся поколения страницы."""
+        return 'paginator:count:{}:{}'.format(
+            self.request.path,
+            fragments.generations(self.get_fragment_scopes())
+        )
 
 
-class Index(ListView):
+class Index(FragmentValidatorsMixin, CursorPaginationMixin, ListView):
     template_name = 'posts/index.html'
     paginate_by = OBJ_PER_PAGE
-    model = Post
+    identity_related = ('author', 'group')
+    queryset = Post.objects.select_related('author', 'group')
+
+    def get_fragment_scopes(self):
+        return fragments.ALL_POSTS, fragments.ALL_GROUPS
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data()
         context['index'] = True
+        context.update(fragments.fragment_context(
+            self.request, *self.get_fragment_scopes()
+        ))
         return context
 
 
-class GroupPosts(ListView):
+class GroupPosts(FragmentValidatorsMixin, CursorPaginationMixin, ListView):
     template_name = 'posts/group_list.html'
     paginate_by = OBJ_PER_PAGE
+    identity_related = ('author',)
 
     def get_group(self, **kwargs):
-        slug = self.kwargs['slug']
-        group = get_object_or_404(Group, slug=slug)
-        return group
+        return self.identity_map.get(
+            Group.objects.all(), slug=self.kwargs['slug']
+        )
+
+    def get_fragment_scopes(self):
+        return (
+            fragments.ALL_GROUPS,
+            fragments.group_scope(self.get_group().id)
+        )
 
     def get_queryset(self, **kwargs):
         group = self.get_group(**kwargs)
@@ -40,17 +130,31 @@ class GroupPosts(ListView):
         context = super().get_context_data()
         group = self.get_group(**kwargs)
         context['group'] = group
+        context.update(fragments.fragment_context(
+            self.request, *self.get_fragment_scopes()
+        ))
         return context
 
 
-class Profile(ListView):
+class Profile(FragmentValidatorsMixin, CursorPaginationMixin, ListView):
     template_name = 'posts/profile.html'
     paginate_by = OBJ_PER_PAGE
+    identity_related = ('author', 'group')
 
     def get_author(self, **kwargs):
-        username = self.kwargs['username']
-        author = get_object_or_404(User, username=username)
-        return author
+        return self.identity_map.get(
+            User.objects.select_related('counters'),
+            username=self.kwargs['username']
+        )
+
+    def get_fragment_scopes(self):
+        return (
+            fragments.ALL_GROUPS,
+            fragments.author_scope(self.get_author().id)
+        )
+
+    def get_count(self):
+        return counters.for_user(self.get_author()).posts_count
 
     def get_queryset(self, **kwargs):
         author = self.get_author(**kwargs)
@@ -60,32 +164,44 @@ class Profile(ListView):
     def get_context_data(self, **kwargs):
         author = self.get_author(**kwargs)
         context = super().get_context_data()
-        following = False
-        if self.request.user.is_authenticated:
-            following = Follow.objects.filter(
-                user=self.request.user,
-                author=author
-            ).exists()
         context['author'] = author
-        context['following'] = following
+        context['counters'] = counters.for_user(author)
+        context['following'] = follows.is_following(
+            self.request.user, author.id
+        )
         context['is_not_author'] = self.request.user != author
+        context.update(fragments.fragment_context(
+            self.request, *self.get_fragment_scopes()
+        ))
         return context
 
 
-class PostDetailView(DetailView):
+class PostDetailView(FragmentValidatorsMixin, DetailView):
     template_name = 'posts/post_detail.html'
-    model = Post
+    queryset = Post.objects.select_related('author__counters', 'group')
     pk_url_kwarg = 'post_id'
 
+    def get_object(self, queryset=None):
+        return self.identity_map.get(
+            queryset or self.get_queryset(), pk=self.kwargs['post_id']
+        )
+
+    def get_fragment_scopes(self):
+        post = self.get_object()
+        return (
+            fragments.post_scope(post.id),
+            fragments.author_scope(post.author_id)
+        )
+
     def get_context_data(self, **kwargs):
         post = self.get_object()
         author = post.author
 
-        author_posts_count = author.posts.count()
+        author_posts_count = counters.for_user(author).posts_count
         is_author_of_post = author == self.request.user
 
         form = CommentForm(self.request.POST or None)
-        comments = post.comments.select_related('author')
+        comments = comments_page(post.id)
 
         context = super().get_context_data()
         context['post'] = post
@@ -93,6 +209,9 @@ class PostDetailView(DetailView):
         context['is_author_of_post'] = is_author_of_post
         context['form'] = form
         context['comments'] = comments
+        context.update(fragments.fragment_context(
+            self.request, fragments.post_scope(post.id)
+        ))
         return context
 
 
@@ -103,7 +222,9 @@ class PostCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.author = self.request.user
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        thumbnails.schedule(self.object)
+        return response
 
     def get_success_url(self):
         return reverse(
@@ -126,7 +247,10 @@ class PostEditView(LoginRequiredMixin, UpdateView):
 
     def form_valid(self, form):
         form.instance.author = self.request.user
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        if 'image' in form.changed_data:
+            thumbnails.schedule(self.object)
+        return response
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -155,14 +279,56 @@ class AddComment(LoginRequiredMixin, CreateView):
         return reverse('posts:post_detail', kwargs={'post_id': post_id})
 
 
-class FollowIndex(LoginRequiredMixin, ListView):
+class PostComments(FragmentValidatorsMixin, TemplateView):
+    """Следующая страница комментариев для подгрузки на странице поста."""
+    template_name = 'posts/includes/comment_list.html'
+
+    def get_fragment_scopes(self):
+        return (fragments.post_scope(self.kwargs['post_id']),)
+
+    def get(self, request, *args, **kwargs):
+        after = request.GET.get('after')
+        if after is not None:
+            try:
+                decode_cursor(after)
+            except InvalidPage as e:
+                raise Http404(f'Неверная страница: {e}')
+        get_object_or_404(Post.objects.only('id'), id=kwargs['post_id'])
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        post_id = self.kwargs['post_id']
+        context['post_id'] = post_id
+        context['comments'] = comments_page(
+            post_id, self.request.GET.get('after')
+        )
+        context.update(fragments.fragment_context(
+            self.request, fragments.post_scope(post_id)
+        ))
+        return context
+
+
+class FollowIndex(LoginRequiredMixin, IdentityMapMixin, CursorPaginationMixin,
+                  ListView):
     template_name = 'posts/follow.html'
     paginate_by = OBJ_PER_PAGE
+    identity_related = ('author', 'group')
+    cursor_ordering = timeline.TIMELINE_ORDERING
+    # У ленты нет поколений фрагментов, свежесть реплики для нее не
+    # проверить: читается из основной базы
+    read_from_replica = False
 
     def get_queryset(self):
-        user = self.request.user
-        post_list = Post.objects.filter(author__following__user=user)
-        return post_list
+        return timeline.entries_for(self.request.user.id)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, entries, is_paginated = super().paginate_queryset(
+            queryset, page_size
+        )
+        page.object_list = [entry.post for entry in entries]
+        self.identity_map.load_related(page.object_list, 'author', 'group')
+        return paginator, page, page.object_list, is_paginated
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data()
@@ -185,3 +351,36 @@ class ProfileUnfollow(LoginRequiredMixin, View):
         author = get_object_or_404(User, username=username)
         Follow.objects.filter(user=user, author=author).delete()
         return redirect('posts:profile', username)
+
+
+class Search(TemplateView):
+    template_name = 'posts/search.html'
+    # Авторов и группы результатов догружает {% load_related %} шаблона
+    search_kinds = {
+        'posts': Post.objects.all(),
+        'comments': Comment.objects.all(),
+    }
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        kind = self.request.GET.get('type')
+        if kind not in self.search_kinds:
+            kind = 'posts'
+
+        page_obj = None
+        if query:
+            try:
+                page_obj = search.search_page(
+                    self.search_kinds[kind].all(),
+                    query,
+                    OBJ_PER_PAGE,
+                    self.request.GET.get('after')
+                )
+            except InvalidPage as e:
+                raise Http404(f'Неверная страница: {e}')
+
+        context['query'] = query
+        context['kind'] = kind
+        context['page_obj'] = page_obj
+        return context
@@ -48,11 +48,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryBudgetMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -72,6 +75,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'posts.context_processors.following',
             ],
         },
     },
@@ -79,18 +83,40 @@ TEMPLATES = [
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Файлы из MEDIA_ROOT отдает core.media.serve. Миниатюры sorl-thumbnail
+# (THUMBNAIL_PREFIX) по одному имени не меняются и кэшируются навсегда
+MEDIA_IMMUTABLE_PREFIXES = ('cache/',)
+MEDIA_MAX_AGE = 60 * 60 * 24
+# 'x-accel-redirect' (nginx, internal location MEDIA_ACCEL_PREFIX
+# с alias на MEDIA_ROOT) или 'x-sendfile' (Apache, lighttpd): тогда файл
+# отдает фронтовой сервер, а не воркер Python
+MEDIA_OFFLOAD = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Соединение живет CONN_MAX_AGE секунд, а не один запрос: PRAGMA из
+# core.sqlite и кэш страниц SQLite не теряются между запросами
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 60,
+    },
+    # Реплика только для чтения; локально - копия основной базы, которую
+    # обновляет python manage.py sync_replicas
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db-replica.sqlite3'),
+        'CONN_MAX_AGE': 60,
+    },
 }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи браузер читает из основной базы
+REPLICA_PIN_SECONDS = 10
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -127,6 +153,7 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -136,8 +163,28 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Тесты заменяют статику, реплики и кэш через core.testing.TestRunner
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# collectstatic пишет копии с хешем в имени, манифест и .gz/.br рядом;
+# отдает их core.staticfiles.StaticFilesApplication в wsgi.py
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+
+# Ленты читают с реплик из этого списка (core.routers). Реплика
+# включается, когда sync_replicas записал ее позицию в кэш
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+# Общий для всех воркеров кэш в файле SQLite (core.cache.SQLiteCache)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'default.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_FREQUENCY': 10,
+        },
     }
 }
+
+# Процессы фоновой генерации миниатюр; 0 - строить сразу после коммита
+THUMBNAIL_WORKERS = os.cpu_count()
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Собранная collectstatic статика отдается до Django, из памяти
+from core.staticfiles import StaticFilesApplication  # noqa: E402
+
+application = StaticFilesApplication(application)